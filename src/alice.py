@@ -14,16 +14,14 @@ from PyQt5.QtCore import (
 )
 from PyQt5.QtGui import QIcon, QPixmap, QColor, QCloseEvent
 import resources # required
-import tempfile
 import time
 import platform
-import shutil
 import math
 import datetime
 from alice_settings import AliceSettings
 from conversion import ConversionWorker
-
-import atexit
+from qt_bridge import ConversionSignalBridge
+from scratch_space import setUpScratchDir
 
 # CONFIG_FILE = "alice_config.json"
 # cfg_input_folder_key = "input_folder"
@@ -78,7 +76,7 @@ class MainWindow(QWidget):
 
         self.setAttribute(Qt.WA_TranslucentBackground)
 
-        self.move(self.settings.window_position)
+        self.move(self.settings.window_position if self.settings.window_position is not None else QPoint(200, 200))
 
 
         border = QWidget(self)
@@ -217,11 +215,13 @@ class MainWindow(QWidget):
         if len(self.selected_files) > 0 and self.settings.output_folder:
             self.showProgressDialog()
             self.worker = ConversionWorker(self.selected_files, self.settings)
-            self.worker.curr_file_progress_updated.connect(self.updateProgressDialogBar)
-            self.worker.total_progress_updated.connect(self.updateProgressDialogText)
-            self.worker.current_task_updated.connect(self.updateProgressDialogTask)
-            self.worker.time_remaining_updated.connect(self.updateProgressDialogTime)
-            self.worker.finished.connect(self.onFinished)
+            # the worker emits from its own threads, the bridge gets the signals to the GUI thread
+            self.worker_signals = ConversionSignalBridge(self.worker)
+            self.worker_signals.curr_file_progress_updated.connect(self.updateProgressDialogBar)
+            self.worker_signals.total_progress_updated.connect(self.updateProgressDialogText)
+            self.worker_signals.current_task_updated.connect(self.updateProgressDialogTask)
+            self.worker_signals.time_remaining_updated.connect(self.updateProgressDialogTime)
+            self.worker_signals.finished.connect(self.onFinished)
             self.worker_thread = WorkerThread(self.worker)
             self.worker_thread.start()
 
@@ -256,7 +256,11 @@ class MainWindow(QWidget):
 
     @pyqtSlot()
     def onFinished(self):
-        if self.progress_dialog is not None:
+        if self.progress_dialog is not None and self.worker.error_message is not None:
+            # task text shows the reason
+            self.progress_dialog.setLabelText("Conversion failed.")
+            self.progress_dialog.setFinishButton()
+        elif self.progress_dialog is not None:
             self.progress_dialog.setLabelText("Conversion completed.")
             # self.progress_dialog.setAutoReset(False)
             self.progress_dialog.setValue(100)
@@ -596,14 +600,9 @@ class WorkerThread(QThread):
 
     def quit(self):
         self.worker.stopConverting()
-        self.worker.deleteLater()
         super().quit()
 
 
-def delete_temp_dir(path):
-    if os.path.isdir(path):
-        shutil.rmtree(path)
-
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -631,14 +630,9 @@ if __name__ == '__main__':
     #     tempfile.tempdir = dir
     # os.makedirs(dir, exist_ok=True)
     
-    # Create a subdirectory for temporary files within the executable directory
-    temp_dir = os.path.join(".", "alice_temp")
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-    tempfile.tempdir = temp_dir
-
-    # delete temp dir on exit
-    atexit.register(delete_temp_dir, temp_dir)
+    # Create a subdirectory for this run's temporary files (alice_temp within the executable directory by default),
+    # it's deleted on exit and temp files of runs that crashed are deleted here
+    setUpScratchDir(window.settings.scratch_dir)
     # ------------
 
     sys.exit(app.exec_())
@@ -0,0 +1,324 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from alice_settings import AliceSettings
+from conversion import ConversionWorker
+from output_profiles import OUTPUT_PROFILES
+from scratch_space import setUpScratchDir
+
+# Converts files without the GUI (and without importing Qt), e.g.
+#   python src/alice_cli.py book/*.mp3 -o converted --jobs 4
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".aiff", ".aif", ".aifc", ".m4a", ".m4b", ".mp4", ".ogg", ".opus")
+
+
+class ConsoleProgress():
+    """Prints the worker's signals as one status line on stderr (a line per task when not a terminal)."""
+
+    def __init__(self, stream=sys.stderr, min_interval=0.5):
+        self.stream = stream
+        self.min_interval = min_interval
+        self.is_terminal = stream.isatty()
+        self.total_text = ""
+        self.task_text = ""
+        self.progress = 0
+        self.time_remaining = None
+        self.last_print_time = 0.0
+        self.last_line_length = 0
+
+    def connect(self, worker):
+        worker.total_progress_updated.connect(self.onTotalProgress)
+        worker.current_task_updated.connect(self.onTask)
+        worker.curr_file_progress_updated.connect(self.onProgress)
+        worker.time_remaining_updated.connect(self.onTimeRemaining)
+
+    def onTotalProgress(self, text):
+        self.total_text = text
+        self.printStatus()
+
+    def onTask(self, text):
+        task_changed = text != self.task_text
+        self.task_text = text
+        self.printStatus(force=task_changed and not self.is_terminal)
+
+    def onProgress(self, progress):
+        self.progress = progress
+        self.printStatus()
+
+    def onTimeRemaining(self, secs):
+        self.time_remaining = secs
+        self.printStatus()
+
+    def getStatusText(self):
+        status_parts = [part for part in (self.total_text, self.task_text) if part]
+        status_parts.append(f"{self.progress}%")
+        if self.time_remaining is not None:
+            status_parts.append(f"{datetime.timedelta(seconds=int(self.time_remaining))} left")
+        return " | ".join(status_parts)
+
+    def printStatus(self, force=False):
+        curr_time = time.time()
+        if not force and (not self.is_terminal or curr_time - self.last_print_time < self.min_interval):
+            return
+        self.last_print_time = curr_time
+        status_text = self.getStatusText()
+        if self.is_terminal:
+            # rewrite the same line
+            self.stream.write("\r" + status_text.ljust(self.last_line_length))
+            self.last_line_length = len(status_text)
+        else:
+            self.stream.write(status_text + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.is_terminal and self.last_line_length > 0:
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+class JsonProgress():
+    """Writes one JSON object per line for every change of the worker's progress, for other programs to read:
+    {"event": "progress", "file_index": 2, "file_count": 5, "files_done": 1, "task": "Applying effects...",
+    "percent": 40, "eta_sec": 568}, and {"event": "finished", "status": "done"/"failed"/"interrupted"} at the end."""
+
+    def __init__(self, stream, file_count):
+        self.stream = stream
+        self.file_count = file_count
+        self.files_done = 0
+        self.task_text = ""
+        self.progress = 0
+        self.time_remaining = None
+        self.last_record = None
+        self.lock = threading.Lock() # the worker emits from several threads
+
+    def connect(self, worker):
+        worker.files_done_updated.connect(self.onFilesDone)
+        worker.current_task_updated.connect(self.onTask)
+        worker.curr_file_progress_updated.connect(self.onProgress)
+        worker.time_remaining_updated.connect(self.onTimeRemaining)
+
+    def onFilesDone(self, files_done):
+        with self.lock:
+            self.files_done = files_done
+            self.writeProgress()
+
+    def onTask(self, text):
+        with self.lock:
+            self.task_text = text
+            self.writeProgress()
+
+    def onProgress(self, progress):
+        with self.lock:
+            self.progress = progress
+            self.writeProgress()
+
+    def onTimeRemaining(self, secs):
+        with self.lock:
+            self.time_remaining = secs
+            self.writeProgress()
+
+    def writeProgress(self):
+        record = {
+            "event": "progress",
+            "file_index": min(self.files_done + 1, self.file_count),
+            "file_count": self.file_count,
+            "files_done": self.files_done,
+            "task": self.task_text,
+            "percent": self.progress,
+            "eta_sec": int(self.time_remaining) if self.time_remaining is not None else None,
+        }
+        if record == self.last_record:
+            return
+        self.last_record = record
+        self.writeRecord(record)
+
+    def finish(self, status):
+        with self.lock:
+            self.writeRecord({"event": "finished", "status": status})
+
+    def writeRecord(self, record):
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+def collectInputFiles(paths):
+    input_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            dir_files = [os.path.join(path, filename) for filename in os.listdir(path)
+                if filename.lower().endswith(AUDIO_EXTENSIONS) and os.path.isfile(os.path.join(path, filename))]
+            input_files.extend(sorted(dir_files))
+        else:
+            input_files.append(path)
+    return input_files
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(prog="alice", description="Convert audiobooks with Alice without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="audio files, or folders to convert every audio file in (sorted by name)")
+    parser.add_argument("--progress", choices=["auto", "text", "json"], default="auto",
+        help="json: one JSON object per progress event on stdout (everything else goes to stderr), "
+        "text: only the status line on stderr, auto: json when stdout is not a terminal")
+    addSettingsArguments(parser)
+    return parser.parse_args(argv)
+
+
+# flags for every AliceSettings option, read back with getSettings (also used by alice_watch.py)
+def addSettingsArguments(parser):
+    defaults = AliceSettings()
+    parser.add_argument("-o", "--output", required=True, help="folder the converted files are saved in")
+    parser.add_argument("--frequency", type=float, default=defaults.frequency,
+        help=f"tremolo frequency in Hz ({AliceSettings.MIN_FREQ}-{AliceSettings.MAX_FREQ}, default {defaults.frequency})")
+    parser.add_argument("--no-noise", action="store_true", help="don't add brown noise")
+    parser.add_argument("--no-compressor", action="store_true", help="don't compress the dynamic range")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=defaults.output_profile,
+        help="how the outputs are encoded: " + ", ".join(f"{name} ({profile.description})" for name, profile in OUTPUT_PROFILES.items())
+        + " (opus/m4b need ffmpeg)")
+    parser.add_argument("--no-chunks", action="store_true", help="save one output file per input file instead of 60 min chunks")
+    parser.add_argument("--streaming-chunks", action="store_true", help="cut exact 60 min chunks across file boundaries")
+    parser.add_argument("-j", "--jobs", type=int, default=defaults.max_parallel_jobs,
+        help="files converted at the same time (0 = one per CPU core)")
+    parser.add_argument("--multi-pass", action="store_true", help="render noise and DC fix to temp files first (old way)")
+    parser.add_argument("--no-segments", action="store_true", help="don't render long files in parallel time segments")
+    parser.add_argument("--analysis", choices=["full", "sampled", "none"], default=defaults.analysis_mode,
+        help="volume/DC offset pass: sampled only analyses windows of the file, "
+        "none skips it (decodes every file once less) and sets the level while rendering")
+    parser.add_argument("--analysis-windows", type=int, default=defaults.analysis_windows,
+        help=f"windows analysed with --analysis sampled (default {defaults.analysis_windows})")
+    parser.add_argument("--analysis-window-sec", type=float, default=defaults.analysis_window_sec,
+        help=f"length of every window (default {defaults.analysis_window_sec})")
+    parser.add_argument("--engine", choices=["sox", "numpy"], default=defaults.dsp_engine,
+        help="what applies the effects (numpy: sox only decodes and encodes, needs numpy: pip install -r requirements-optional.txt)")
+    parser.add_argument("--frame-merge", action="store_true",
+        help="try to merge chunks by joining mp3 frames instead of re-encoding (falls back to sox when the joins wouldn't be gapless)")
+    parser.add_argument("--intermediate-format", choices=["flac", "wav", "mp3"], default=defaults.intermediate_format,
+        help="format of files that get merged later (only without frame merging)")
+    parser.add_argument("--max-scratch-gb", type=float, default=defaults.max_scratch_gb, help="limit for lossless intermediate files")
+    parser.add_argument("--scratch-dir", default=defaults.scratch_dir,
+        help="folder Alice keeps its temp files in, in an alice_temp subfolder (default: the working directory)")
+    parser.add_argument("--ram-scratch-gb", type=float, default=defaults.ram_scratch_gb,
+        help="batches needing less temp space than this use the RAM disk (/dev/shm) if there is one (0 = never)")
+    parser.add_argument("--no-resume", action="store_true",
+        help="don't keep a journal to continue a stopped batch from where it was (starts over every time)")
+    parser.add_argument("--no-trace", action="store_true", help="don't write a trace of the conversion's stages")
+    parser.add_argument("--python-profiler", choices=["cprofile", "sampling"], default=defaults.python_profiler,
+        help="profile the conversion's Python code (cprofile: the batch thread, sampling: every thread)")
+    parser.add_argument("--cache-size", type=int, default=defaults.analysis_cache_size,
+        help="how many files' analysis results are remembered (0 = no cache)")
+
+
+def getSettings(args):
+    return AliceSettings(
+        output_folder=os.path.abspath(args.output),
+        noise=not args.no_noise,
+        compressor=not args.no_compressor,
+        frequency=args.frequency,
+        save_as_60_min_chunks=not args.no_chunks,
+        single_pass=not args.multi_pass,
+        max_parallel_jobs=args.jobs,
+        analysis_cache_size=args.cache_size,
+        frame_merge=args.frame_merge,
+        intermediate_format=args.intermediate_format,
+        max_scratch_gb=args.max_scratch_gb,
+        streaming_chunks=args.streaming_chunks,
+        segment_rendering=not args.no_segments,
+        resumable_batches=not args.no_resume,
+        dsp_engine=args.engine,
+        analysis_mode=args.analysis,
+        analysis_windows=args.analysis_windows,
+        analysis_window_sec=args.analysis_window_sec,
+        output_profile=args.profile,
+        scratch_dir=args.scratch_dir,
+        ram_scratch_gb=args.ram_scratch_gb,
+        trace_spans=not args.no_trace,
+        python_profiler=args.python_profiler,
+    )
+
+
+# For --progress json: yields a stream on a copy of stdout for the JSON lines, and points stdout itself (fd 1) at
+# stderr until the end, so the worker's prints and sox's output can't end up between them. sys.stdout isn't rebound.
+@contextlib.contextmanager
+def openJsonStream():
+    try:
+        stdout_fd = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        yield sys.stdout # not a real file (e.g. captured), nothing else is written to it
+        return
+    sys.stdout.flush()
+    json_stream = os.fdopen(os.dup(stdout_fd), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), stdout_fd)
+    try:
+        yield json_stream
+    finally:
+        sys.stdout.flush()
+        json_stream.flush()
+        os.dup2(json_stream.fileno(), stdout_fd)
+        json_stream.close()
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    input_files = collectInputFiles(args.inputs)
+    if len(input_files) == 0:
+        print("No audio files to convert.", file=sys.stderr)
+        return 2
+    missing_files = [input_file for input_file in input_files if not os.path.isfile(input_file)]
+    if len(missing_files) > 0:
+        print(f"Not a file: {', '.join(missing_files)}", file=sys.stderr)
+        return 2
+    os.makedirs(args.output, exist_ok=True)
+
+    # same as the GUI: a dir for this run in the alice_temp folder of the scratch root, dead runs' temp files are deleted
+    setUpScratchDir(args.scratch_dir)
+
+    if args.progress == "json" or (args.progress == "auto" and not sys.stdout.isatty()):
+        with openJsonStream() as json_stream:
+            return convertWithProgress(args, input_files, JsonProgress(json_stream, len(input_files)))
+    return convertWithProgress(args, input_files)
+
+
+# json_progress is a JsonProgress or None, returns the exit code
+def convertWithProgress(args, input_files, json_progress=None):
+    worker = ConversionWorker(input_files, getSettings(args))
+    console_progress = ConsoleProgress()
+    console_progress.connect(worker)
+    if json_progress is not None:
+        json_progress.connect(worker)
+
+    interrupted = False
+    def onInterrupt(signum, frame):
+        nonlocal interrupted
+        interrupted = True
+        print("\nStopping...", file=sys.stderr)
+        worker.stopConverting()
+    signal.signal(signal.SIGINT, onInterrupt)
+
+    start_time = time.time()
+    worker.convertFiles()
+    console_progress.finish()
+
+    status = "done"
+    if worker.error_message is not None:
+        print(worker.error_message, file=sys.stderr)
+        status = "failed"
+    elif interrupted:
+        status = "interrupted"
+    elif worker.stopped:
+        print("Conversion failed.", file=sys.stderr)
+        status = "failed"
+    else:
+        print(f"Converted {len(input_files)} files in {datetime.timedelta(seconds=int(time.time() - start_time))}", file=sys.stderr)
+    if json_progress is not None:
+        json_progress.finish(status)
+    return {"done": 0, "failed": 1, "interrupted": 130}[status]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
-from PyQt5.QtCore import QPoint, QSettings
+import os
+import platform
 
 class AliceSettings():
     ORG_NAME = "Alice Converter"
@@ -8,7 +9,8 @@ class AliceSettings():
     MIN_FREQ = 30.0
     MAX_FREQ = 50.0
 
-    def __init__(self, window_position = QPoint(200, 200), input_folder=None, output_folder=None, noise=True, compressor=True, frequency=40.0, save_as_60_min_chunks=True):
+    def __init__(self, window_position=None, input_folder=None, output_folder=None, noise=True, compressor=True, frequency=40.0, save_as_60_min_chunks=True, single_pass=True, max_parallel_jobs=0, analysis_cache_size=1000, frame_merge=False, intermediate_format="flac", max_scratch_gb=20.0, streaming_chunks=False, segment_rendering=True, resumable_batches=True, dsp_engine="sox", analysis_mode="full", analysis_windows=40, analysis_window_sec=5.0, output_profile="mp3_stereo", scratch_dir=None, ram_scratch_gb=0.0, trace_spans=True, python_profiler=None):
+        # QPoint, only used by the GUI (None = default position)
         self.window_position = window_position
 
         self.input_folder = input_folder
@@ -20,14 +22,74 @@ class AliceSettings():
 
         self.save_as_60_min_chunks = save_as_60_min_chunks
 
+        # render each file with one sox call (noise and DC fix inside the effects chain)
+        self.single_pass = single_pass
+
+        # how many files get converted at the same time (0 = one per CPU core)
+        self.max_parallel_jobs = max_parallel_jobs
+
+        # how many files' DC offset/volume analysis results are remembered (0 = no cache)
+        self.analysis_cache_size = analysis_cache_size
+
+        # merge mp3 chunks by joining their frames instead of re-encoding with sox. Only works for mp3s whose encoder
+        # delay and padding are whole frames (not sox's, LAME always has 576 samples of delay), others merge with sox
+        self.frame_merge = frame_merge
+
+        # format of files that get merged later ("flac", "wav" or "mp3"), used unless the merges are joining mp3 frames
+        self.intermediate_format = intermediate_format
+        # lossless intermediate files stop being used when they would take more space than this
+        self.max_scratch_gb = max_scratch_gb
+
+        # with 1 hour chunks: run all files through one sox call and cut exact 60 min chunks across file boundaries
+        self.streaming_chunks = streaming_chunks
+
+        # when converting in parallel: cut files longer than 60 min into time segments and render those in parallel
+        self.segment_rendering = segment_rendering
+
+        # keep a journal so a stopped or crashed batch continues where it was when it's started again
+        self.resumable_batches = resumable_batches
+
+        # "sox" or "numpy": what runs the effects of the single pass command (numpy only decodes/encodes with sox)
+        self.dsp_engine = dsp_engine
+
+        # "full": a stat pass per file finds the DC offset and volume, "none": no extra pass,
+        # DC is filtered out and the level is set by a look-ahead limiter while rendering,
+        # "sampled": stat of analysis_windows windows of analysis_window_sec each (full pass if they disagree)
+        self.analysis_mode = analysis_mode
+        self.analysis_windows = analysis_windows
+        self.analysis_window_sec = analysis_window_sec
+
+        # name of the output_profiles.OutputProfile the outputs are encoded with (channels, rate, codec)
+        self.output_profile = output_profile
+
+        # folder the alice_temp folder with the temp files goes in (None = the working directory), read at startup
+        self.scratch_dir = scratch_dir
+        # batches whose temp files need less than this use the RAM disk (/dev/shm) if there is one (0 = never)
+        self.ram_scratch_gb = ram_scratch_gb
+
+        # write the timing of every stage of a conversion to a JSON lines file in the cache dir's traces
+        self.trace_spans = trace_spans
+        # "cprofile" or "sampling": profile the Python side of every conversion, saved in the cache dir's profiles
+        self.python_profiler = python_profiler
+
+    @classmethod
+    def getCacheDir(cls):
+        if platform.system() == "Windows":
+            base_dir = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+            return os.path.join(base_dir, cls.ORG_NAME, cls.APP_NAME)
+        base_dir = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+        return os.path.join(base_dir, cls.APP_NAME.lower())
+
     def _to_diccy(self):
         return self.__dict__
 
     def copy(self):
         return AliceSettings(**self._to_diccy())
     
+    # QSettings is only imported here so the engine and CLI don't need Qt
     def save(self):
         try:
+            from PyQt5.QtCore import QSettings
             qsett = QSettings(self.ORG_NAME, self.APP_NAME)
             qsett.setValue(self.QSETTINGS_KEY, self._to_diccy())
         except Exception:
@@ -37,6 +99,7 @@ class AliceSettings():
     def load(cls):
         diccy = None
         try:
+            from PyQt5.QtCore import QSettings
             qsett = QSettings(cls.ORG_NAME, cls.APP_NAME)
             diccy = qsett.value(cls.QSETTINGS_KEY, None)
         except Exception:
@@ -0,0 +1,161 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from alice_cli import AUDIO_EXTENSIONS, addSettingsArguments, getSettings
+from alice_settings import AliceSettings
+from conversion import ConversionWorker
+from folder_watcher import FolderWatcher
+from job_queue import JobQueue
+from scratch_space import getJournalRootDir, setUpScratchDir
+
+# Converts every audiobook dropped into a folder, e.g.
+#   python src/alice_watch.py dropbox -o converted
+# Files dropped into the same folder at the same time are converted as one batch (60 min chunks span the batch),
+# outputs go into the same subfolder of the output folder. Queued batches survive restarts.
+
+
+class WatchDaemon():
+    """Feeds the batches FolderWatcher finds through a JobQueue to ConversionWorkers, max_batches at a time."""
+
+    def __init__(self, watch_dir, settings: AliceSettings, job_queue: JobQueue, stable_seconds=10, poll_interval=2, max_batches=1, ignore_dirs=()):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.settings = settings
+        self.job_queue = job_queue
+        self.poll_interval = poll_interval
+        self.max_batches = max_batches
+        self.watcher = FolderWatcher(self.watch_dir, AUDIO_EXTENSIONS, job_queue.isKnownFile, stable_seconds, ignore_dirs)
+
+        self.stopping = False
+        self.queue_changed = threading.Event() # wakes up idle batch threads
+        self.running_workers = {} # batch id -> ConversionWorker
+        self.workers_lock = threading.Lock()
+
+    def run(self):
+        num_requeued = self.job_queue.requeueInterrupted()
+        if num_requeued > 0:
+            print(f"Converting {num_requeued} batches again that were interrupted last time")
+        print(f"Watching {self.watch_dir}, saving to {self.settings.output_folder}")
+
+        batch_threads = [threading.Thread(target=self.runBatches, daemon=True) for _ in range(self.max_batches)]
+        for batch_thread in batch_threads:
+            batch_thread.start()
+
+        while not self.stopping:
+            try:
+                for source_dir, batch_files in self.watcher.scan():
+                    batch_id = self.job_queue.addBatch(source_dir, batch_files)
+                    print(f"Queued batch {batch_id}: {len(batch_files)} files from {source_dir}")
+                    self.queue_changed.set()
+            except Exception as e:
+                print(f"Failed scanning {self.watch_dir}: {type(e)} ({e})")
+            time.sleep(self.poll_interval)
+
+        self.queue_changed.set()
+        for batch_thread in batch_threads:
+            batch_thread.join()
+
+    # Runs on its own thread, converts queued batches one after another
+    def runBatches(self):
+        while not self.stopping:
+            batch = self.job_queue.claimNextBatch()
+            if batch is None:
+                self.queue_changed.wait(self.poll_interval)
+                self.queue_changed.clear()
+                continue
+            self.convertBatch(*batch)
+
+    def convertBatch(self, batch_id, source_dir, paths):
+        input_files = [path for path in paths if os.path.isfile(path)]
+        if len(input_files) == 0:
+            self.job_queue.finishBatch(batch_id, "files were deleted before converting")
+            return
+
+        batch_settings = self.settings.copy()
+        relative_dir = os.path.relpath(source_dir, self.watch_dir)
+        if relative_dir != ".":
+            batch_settings.output_folder = os.path.join(self.settings.output_folder, relative_dir)
+        os.makedirs(batch_settings.output_folder, exist_ok=True)
+
+        print(f"Converting batch {batch_id} ({len(input_files)} files)")
+        start_time = time.time()
+        error = None
+        try:
+            worker = ConversionWorker(input_files, batch_settings)
+            with self.workers_lock:
+                if self.stopping:
+                    self.job_queue.requeueBatch(batch_id)
+                    return
+                self.running_workers[batch_id] = worker
+            worker.convertFiles()
+            if worker.error_message is not None:
+                error = worker.error_message
+            elif worker.stopped and not self.stopping:
+                error = "conversion failed"
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e)} ({e})"
+        finally:
+            with self.workers_lock:
+                self.running_workers.pop(batch_id, None)
+
+        if self.stopping and error is None:
+            # stopped part way through, convert it again next time
+            self.job_queue.requeueBatch(batch_id)
+            print(f"Batch {batch_id} will be converted again on the next start")
+        else:
+            self.job_queue.finishBatch(batch_id, error)
+            print(f"Batch {batch_id} {'failed: ' + error if error is not None else 'done'} in {time.time() - start_time:.0f} sec")
+
+    # Doesn't block, run() returns once the running batches have stopped
+    def stop(self):
+        with self.workers_lock:
+            self.stopping = True
+            running_workers = list(self.running_workers.values())
+        for worker in running_workers:
+            worker.stopConverting()
+        self.queue_changed.set()
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(prog="alice-watch", description="Convert every audiobook dropped into a folder.")
+    parser.add_argument("watch_dir", help="folder to watch (subfolders too)")
+    addSettingsArguments(parser)
+    parser.add_argument("--queue", default=os.path.join(AliceSettings.getCacheDir(), "watch_queue.sqlite3"),
+        help="job queue database (default: in the cache dir)")
+    parser.add_argument("--stable-seconds", type=float, default=10,
+        help="how long dropped files must stay unchanged before they are converted")
+    parser.add_argument("--poll-interval", type=float, default=2, help="seconds between folder scans")
+    parser.add_argument("--max-batches", type=int, default=1,
+        help="batches converted at the same time (every batch already uses --jobs files at a time)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    if not os.path.isdir(args.watch_dir):
+        print(f"Not a folder: {args.watch_dir}", file=sys.stderr)
+        return 2
+    os.makedirs(args.output, exist_ok=True)
+    temp_dir = setUpScratchDir(args.scratch_dir)
+
+    job_queue = JobQueue(args.queue)
+    daemon = WatchDaemon(args.watch_dir, getSettings(args), job_queue, stable_seconds=args.stable_seconds,
+        poll_interval=args.poll_interval, max_batches=max(1, args.max_batches), ignore_dirs=[args.output, temp_dir, getJournalRootDir(temp_dir)])
+
+    def onStopSignal(signum, frame):
+        print("\nStopping...", file=sys.stderr)
+        daemon.stop()
+    signal.signal(signal.SIGINT, onStopSignal)
+    signal.signal(signal.SIGTERM, onStopSignal)
+
+    daemon.run()
+    job_queue.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
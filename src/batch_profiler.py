@@ -0,0 +1,91 @@
+import cProfile
+import collections
+import datetime
+import os
+import sys
+import threading
+
+# Profiles the Python side of a conversion (settings.python_profiler), one result file per batch:
+#   "cprofile": cProfile of the thread that runs the batch (job handling, merging, journal), saved as .prof
+#               (python -m pstats <file>, or snakeviz)
+#   "sampling": the stacks of every thread, sampled SAMPLE_INTERVAL_SEC apart (worker threads, feeders,
+#               the numpy engine, finalizers), saved as collapsed stacks (flamegraph.pl, speedscope)
+
+PROFILERS = ("cprofile", "sampling")
+
+
+class CProfileProfiler():
+
+    EXTENSION = ".prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self, path):
+        self.profile.disable()
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler():
+    """Counts how often every stack is seen in a thread that reads the stacks of all other threads.
+    Python code only, time spent waiting (e.g. for sox) shows up as the line that waits."""
+
+    EXTENSION = ".collapsed.txt"
+    SAMPLE_INTERVAL_SEC = 0.005
+    MAX_DEPTH = 100
+
+    def __init__(self):
+        self.stack_counts = collections.Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="SamplingProfiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        own_thread_id = threading.get_ident()
+        while not self.stop_event.wait(self.SAMPLE_INTERVAL_SEC):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self.stack_counts[";".join(reversed(stack))] += 1
+
+    def stop(self, path):
+        self.stop_event.set()
+        self.thread.join()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stack_counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class BatchProfiler():
+    """Profiles from start() to stop(), stop() saves the result in profile_dir and returns its path."""
+
+    def __init__(self, kind, profile_dir):
+        self.kind = kind
+        self.profile_dir = profile_dir
+        self.profiler = CProfileProfiler() if kind == "cprofile" else SamplingProfiler()
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.profile_dir, f"profile_{timestamp}_{os.getpid()}{self.profiler.EXTENSION}")
+            self.profiler.stop(path)
+            return path
+        except Exception as e:
+            print(f"Failed to save the {self.kind} profile: {type(e)} ({e})")
+        return None
@@ -1,5 +1,21 @@
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from worker_signals import Signal
 from alice_settings import AliceSettings
+from persistent_cache import openSharedCache, getFileKey
+from staging import stageFile, moveFile
+from mp3_concat import concatMp3Files, Mp3ConcatError
+from split_chunks import SplitChunkTracker
+from process_supervisor import ProcessSupervisor
+from sox_progress import parseSoxStatus, ProgressRateLimiter
+from throughput_model import ThroughputModel
+from duration_probe import probeDuration, AudioProbeError
+from conversion_journal import ConversionJournal
+from segments import SegmentedRender, planTimeSegments, getTremoloPhase, combineSegmentStats
+import dsp_engine
+from sampled_analysis import planAnalysisWindows, estimateFromWindows
+from output_profiles import getOutputProfile, findFfmpeg, DEFAULT_PROFILE_NAME
+from scratch_space import ScratchAdmission, getRamScratchDir, getFreeBytes, getJournalRootDir
+from tracing import Tracer, getFileBytes
+from batch_profiler import BatchProfiler, PROFILERS
 import os
 import time
 import subprocess
@@ -8,7 +24,10 @@ import shutil
 import tempfile
 import platform
 from mutagen.mp3 import MP3
+import mutagen
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import traceback
 
@@ -19,25 +38,53 @@ class AliceStoppingException(Exception):
     def __str__(self):
         return f"AliceStoppingException: {self.message}"
 
-class ConversionWorker(QObject):
-    finished = pyqtSignal()
-    curr_file_progress_updated = pyqtSignal(int)  # Signal to update progress modal
-    total_progress_updated = pyqtSignal(str)
-    current_task_updated = pyqtSignal(str)
-    time_remaining_updated = pyqtSignal(int)
+# Doesn't use Qt, the GUI connects to the signals through qt_bridge.ConversionSignalBridge
+class ConversionWorker():
     
     MAX_CHARS = 20
     CHUNK_DURATION = 3600 # 1 hour in seconds
 
-    OUTPUT_EXTENSION = ".mp3"
+    # rate of the raw audio passed between sox calls (STREAM_FORMAT_ARGS) and of the numpy effect chain,
+    # the output rate comes from the output profile
+    PROCESSING_RATE = 44100
+
+    # segment rendering: extra audio read around each segment (trimmed off after the effects)
+    SEGMENT_PADDING_SEC = 5
+    # without 60 min chunks long files are cut into one segment per worker, but not shorter than this
+    MIN_SEGMENT_DURATION = 600
+
+    # rough size of lossless intermediate files (44.1 kHz, stereo, 24 bit)
+    INTERMEDIATE_BYTES_PER_SEC = {
+        "wav": 44100 * 2 * 3,
+        "flac": 44100 * 2 * 3 * 0.6,
+    }
+    # upper bound for the size of encoded outputs (320 kbps)
+    ENCODED_BYTES_PER_SEC = 320 * 1000 / 8
+
+    SOX_PATH = 'sox-14-4-2/sox'
+
+    # durations are read from file headers, this many files at a time
+    PROBE_WORKERS = 8
+    # sampled analysis: this many windows of a file are analysed at a time
+    ANALYSIS_WINDOW_WORKERS = 8
+    # finished outputs get their tags fixed and moved to the output folder this many at a time
+    FINALIZE_WORKERS = 4
+
+    # raw audio passed between sox calls when streaming
+    STREAM_FORMAT_ARGS = ['-t', 'raw', '-e', 'signed-integer', '-b', '32', '-r', '44100', '-c', '2']
 
     def __init__(self, input_files: list, settings: AliceSettings):
-        super().__init__()
+        self.finished = Signal()
+        self.curr_file_progress_updated = Signal() # int, to update progress modal
+        self.total_progress_updated = Signal() # str
+        self.files_done_updated = Signal() # int, input files finished so far (total_progress_updated is the text)
+        self.current_task_updated = Signal() # str
+        self.time_remaining_updated = Signal() # int, seconds
+        self.span_finished = Signal() # dict, a stage that finished (tracing.Span.toRecord)
+
         self.input_files = input_files
         self.settings = settings
 
-        self.process = None
-        
         # So subprocess doesn't open a CMD windowif platform.system() == "Windows":
         self.startupinfo = None
         if platform.system() == "Windows":
@@ -45,6 +92,9 @@ class ConversionWorker(QObject):
             self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
             self.startupinfo.wShowWindow = subprocess.SW_HIDE
 
+        # every running sox process (more than one when converting files in parallel)
+        self.supervisor = ProcessSupervisor(self.startupinfo)
+
         self.file_durations = []
         self.estimated_times = []
 
@@ -64,25 +114,400 @@ class ConversionWorker(QObject):
         self.merged_out_path = ""
 
         self.split_files = []
+        self.chunk_groups = []
+
+        # lossless intermediate files in the temp dir (path -> bytes)
+        self.scratch_files = {}
+        self.scratch_bytes = 0
+        self.scratch_bytes_peak = 0
+        self.scratch_lock = threading.Lock()
+        self.pending_scratch_bytes = {} # thread -> bytes reserved for the file it is rendering
+        self.scratch_dir = tempfile.gettempdir() # can move to the RAM disk in preflightScratchSpace
+        self.disk_scratch_dir = self.scratch_dir # the journal stays on disk (it has to survive a reboot)
+        self.scratch_admission = ScratchAdmission(self.scratch_dir)
+
+        self.analysis_cache = None
+        if self.settings.analysis_cache_size > 0:
+            cache_path = os.path.join(AliceSettings.getCacheDir(), "analysis_cache.json")
+            self.analysis_cache = openSharedCache(cache_path, max_entries=self.settings.analysis_cache_size)
+        self.duration_cache = None
+        if self.settings.analysis_cache_size > 0:
+            cache_path = os.path.join(AliceSettings.getCacheDir(), "duration_cache.json")
+            self.duration_cache = openSharedCache(cache_path, max_entries=self.settings.analysis_cache_size)
+        self.unreadable_files = [] # (input file, reason)
+        self.journal = None # ConversionJournal when batches are resumable
+        self.frame_join_failed = False # a frame merge of this batch fell back to sox, the next ones would too
+        self.error_message = None # why nothing was converted
+        self.output_profile = getOutputProfile(self.settings.output_profile)
+        self.ffmpeg_path = findFfmpeg() if self.output_profile.isEncodedByFfmpeg() else None
+        if self.settings.dsp_engine == "numpy" and not dsp_engine.isAvailable():
+            print("numpy isn't installed (pip install -r requirements-optional.txt), rendering with sox instead")
+
+        # every stage is traced as a span (JSON lines in the cache dir's traces, and span_finished)
+        trace_path = Tracer.getNewTracePath(os.path.join(AliceSettings.getCacheDir(), "traces")) if self.settings.trace_spans else None
+        self.tracer = Tracer(trace_path)
+        self.tracer.span_finished.connect(self.span_finished.emit)
+        self.batch_span = None
+        self.batch_cpu_times = None
+        self.profiler = None # BatchProfiler when settings.python_profiler is set
+
+        # measured speed of each stage, seeds the time estimates of the next runs
+        self.throughput_model = ThroughputModel.openShared(os.path.join(AliceSettings.getCacheDir(), "throughput_model.json"))
+
+        self.num_workers = 1
+        self.parallel = False
+        self.job_context = threading.local() # which input file the current thread is working on
+        self.job_progress = {}
+        self.segment_durations = {} # (input file index, segment number) -> duration
+        self.num_files_done = 0
+        self.progress_lock = threading.Lock()
+
+        # outputs are finalized (finalizeOutput) on their own threads so rendering doesn't wait for the disk
+        self.finalizer = ThreadPoolExecutor(max_workers=self.FINALIZE_WORKERS)
+        self.finalize_futures = []
+        self.finalize_lock = threading.Lock()
+        # input index -> finalize futures of the 60 min parts saved while the file was still rendering
+        self.early_chunk_futures = {}
 
-    @pyqtSlot()
     def convertFiles(self):
+        if self.settings.python_profiler in PROFILERS:
+            self.profiler = BatchProfiler(self.settings.python_profiler, os.path.join(AliceSettings.getCacheDir(), "profiles"))
+            self.profiler.start()
+        self.batch_cpu_times = os.times()
+        self.batch_span = self.tracer.start("batch", files=len(self.input_files), profile=self.output_profile.name)
         self.current_task_updated.emit("Initializing...")
+        if self.output_profile.isEncodedByFfmpeg() and self.ffmpeg_path is None:
+            # fail now instead of after rendering everything
+            self.error_message = f"ffmpeg is needed for {self.output_profile.extension} outputs"
+            self.current_task_updated.emit(self.error_message)
+            self.finishBatch()
+            return
         self.fetchFileDurations()
+        if len(self.unreadable_files) > 0:
+            # fail now instead of when sox gets to the file
+            for unreadable_file, reason in self.unreadable_files:
+                print(f"Can't read {unreadable_file}: {reason}")
+            filename = os.path.basename(self.unreadable_files[0][0])
+            self.error_message = f"Can't read {filename[:self.MAX_CHARS]}{'...' if len(filename) > self.MAX_CHARS else ''}"
+            if len(self.unreadable_files) > 1:
+                self.error_message += f" (+{len(self.unreadable_files) - 1} files)"
+            self.current_task_updated.emit(self.error_message)
+            self.finishBatch()
+            return
+        if self.settings.save_as_60_min_chunks:
+            self.chunk_groups = self.planChunkGroups()
+        self.num_workers = self.getNumWorkers()
+        self.parallel = self.num_workers > 1
+        if self.settings.save_as_60_min_chunks and self.settings.streaming_chunks:
+            self.parallel = False
+        if not self.preflightScratchSpace():
+            self.current_task_updated.emit(self.error_message)
+            self.finishBatch()
+            return
         self.initEstimationMultiplier()
         self.initEstimatedMergingTimes()
         self.initEstimatedTimes()
 
+        if self.settings.save_as_60_min_chunks and self.settings.streaming_chunks:
+            self.convertFilesStreaming()
+        elif self.parallel or self.settings.resumable_batches:
+            # journaling is done where rendered files get handed over, so one file at a time goes through here too
+            self.journal = self.openJournal()
+            self.convertFilesParallel()
+            self.waitForFinalizing() # an output that fails to save fails the batch, the journal is kept for it
+            # a stopped batch keeps its journal to resume from, unless nothing got recorded yet
+            if self.journal is not None and (not self.stopped or not self.journal.hasProgress()):
+                self.journal.remove()
+        else:
+            self.convertFilesSequentially()
+
+        if self.analysis_cache is not None:
+            print(f"Analysis cache: {self.analysis_cache.getStatsText()}")
+        if self.scratch_bytes_peak > 0:
+            print(f"Intermediate files used at most {self.scratch_bytes_peak / 1e6:.0f} MB of scratch space")
+        if not self.stopped:
+            self.throughput_model.save()
+        self.waitForFinalizing()
+        self.finalizer.shutdown()
+
+        # cancelling doesn't wait for sox to exit, so wait here (not on the GUI thread) before temp files get deleted
+        self.supervisor.waitForAll(timeout=10)
+
+        self.finishBatch()
+
+    # ends the batch span, then tells the GUI/CLI that the conversion is over
+    def finishBatch(self):
+        self.batch_span.audio_sec = sum(self.file_durations)
+        self.batch_span.error = self.error_message
+        self.batch_span.attributes["stopped"] = self.stopped
+        # CPU time of this process (orchestration, numpy engine) vs. every process it waited for (sox, ffmpeg),
+        # compared to the wall time this tells if the batch is CPU, I/O or orchestration bound
+        cpu_times = os.times()
+        python_cpu_sec = cpu_times.user + cpu_times.system - self.batch_cpu_times.user - self.batch_cpu_times.system
+        children_cpu_sec = (cpu_times.children_user + cpu_times.children_system
+            - self.batch_cpu_times.children_user - self.batch_cpu_times.children_system)
+        self.batch_span.attributes["python_cpu_sec"] = python_cpu_sec
+        self.batch_span.attributes["children_cpu_sec"] = children_cpu_sec
+        self.tracer.end(self.batch_span)
+        self.tracer.close()
+        print(f"CPU time: {python_cpu_sec:.1f} sec in Alice, {children_cpu_sec:.1f} sec in sox/ffmpeg, "
+            f"{self.batch_span.end_time - self.batch_span.start_time:.1f} sec wall time")
+        if self.tracer.trace_path is not None:
+            print(f"Trace of this conversion: {self.tracer.trace_path}")
+        if self.profiler is not None:
+            profile_path = self.profiler.stop()
+            if profile_path is not None:
+                print(f"Python profile of this conversion: {profile_path}")
+        self.finished.emit()
+
+    # span of a stage (tracing.Tracer.span), tagged with the input file (or segment) the current thread works on
+    def traceSpan(self, name, **attributes):
+        job_index = getattr(self.job_context, "index", None)
+        if job_index is not None:
+            attributes["job"] = job_index
+        return self.tracer.span(name, **attributes)
+
+    # All input files go through one sox call that saves exact 60 min chunks (trim + newfile) across file boundaries.
+    # Each chunk is saved as soon as sox starts on the next one, no merging needed.
+    def convertFilesStreaming(self):
+        self.estimated_merging_times = []
+        first_filename, _ = os.path.splitext(os.path.basename(self.input_files[0]))
+        output_file = self.generateDestinationPath(first_filename)
+        self.total_progress_updated.emit(f"{first_filename[:self.MAX_CHARS]}{'...' if len(first_filename) > self.MAX_CHARS else ''} (+{len(self.input_files) - 1} files)")
+        self.files_done_updated.emit(0)
+        self.estimateRemainingTime(0)
+        self.time_remaining = math.ceil(sum(self.estimated_times) * self.dynamic_multi)
+        self.time_remaining_updated.emit(self.time_remaining)
+
+        staged_paths = []
+        stream_inputs = []
+        out_tmp_file_path = None
+        feeder_thread = None
+        stream_span = None
+        try:
+            # analysis still needs its own pass per file
+            for index, input_file in enumerate(self.input_files):
+                if self.stopped:
+                    raise AliceStoppingException()
+                filename, extension = os.path.splitext(os.path.basename(input_file))
+                self.current_task_updated.emit(f"Analyzing {filename[:self.MAX_CHARS]}{'...' if len(filename) > self.MAX_CHARS else ''}")
+                in_tmp_file_path = self.getTempFile(extension)
+                staged_paths.append(in_tmp_file_path)
+                self.stageInputFile(input_file, in_tmp_file_path)
+                audio_info = self.getAudioInfo(in_tmp_file_path)
+                if audio_info is None:
+                    raise Exception(f"Can't read audio info of {input_file}")
+                dc_offset, vol_multi = self.getSinglePassAnalysis(in_tmp_file_path, input_file, self.file_durations[index])
+                stream_inputs.append((in_tmp_file_path, dc_offset, vol_multi, audio_info))
+
+            self.current_task_updated.emit("Applying effects...")
+            self.curr_file_progress_updated.emit(0)
+            out_tmp_file_path = self.getTempFile(self.output_profile.getRenderExtension())
+            self.delTempFile(out_tmp_file_path) # sox only writes the numbered chunk files
+            chunk_tracker = SplitChunkTracker(out_tmp_file_path)
+
+            sox_command = [self.SOX_PATH]
+            sox_command.extend(self.STREAM_FORMAT_ARGS + ['-'])
+            sox_command.extend(self.getOutputArgs(out_tmp_file_path))
+            sox_command.extend(self.getEffectsChain(split=True))
+            stream_span = self.tracer.start("render", stage="stream")
+            stream_span.audio_sec = sum(self.file_durations)
+            process = self.startProcess(sox_command, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+            self.stream_seconds_fed = 0
+            feeder_thread = threading.Thread(target=self.feedStream, args=(process, stream_inputs), daemon=True)
+            feeder_thread.start()
+
+            total_duration = max(sum(self.file_durations), 1)
+            sox_finished = False
+            start_time = time.time()
+            stream_start_time = start_time
+            while not sox_finished:
+                sox_finished = process.poll() is not None
+                if self.stopped:
+                    raise AliceStoppingException()
+                for chunk_path in chunk_tracker.popReadyChunks(sox_finished):
+                    chunk_output_path, _ = self.getSplitOutputPaths(chunk_path, output_file)
+                    self.current_task_updated.emit(f"Saving {os.path.basename(chunk_output_path)}")
+                    self.finalizeOutput(chunk_path, chunk_output_path)
+                    self.current_task_updated.emit("Applying effects...")
+                self.curr_file_progress_updated.emit(min(int(self.stream_seconds_fed / total_duration * 100), 99))
+                if not sox_finished:
+                    process.wait(0.5) # returns right away when sox exits
+                self.updateTimeRemaining(time.time() - start_time)
+                start_time = time.time()
+            stream_span.exit_code = process.returncode
+            if process.returncode != 0 and not self.stopped:
+                raise Exception(f"sox exited with {process.returncode}")
+            self.recordStageTime("stream", sum(self.file_durations), time.time() - stream_start_time)
+
+        except AliceStoppingException:
+            pass
+        except Exception as e:
+            print(f"Exception in convertFilesStreaming, deleting temp files: {type(e)} ({e})")
+            traceback.print_exc()
+            self.stopConverting()
+        finally:
+            if feeder_thread is not None:
+                feeder_thread.join()
+            if stream_span is not None:
+                self.tracer.end(stream_span)
+            self.waitForFinalizing() # chunks that are still being moved would look like leftovers
+            for in_tmp_file_path in staged_paths:
+                self.delTempFile(in_tmp_file_path)
+            if out_tmp_file_path is not None:
+                for chunk_path in SplitChunkTracker(out_tmp_file_path).popReadyChunks(sox_finished=True):
+                    self.delTempFile(chunk_path)
+            self.current_task_updated.emit("")
+
+    # Runs on its own thread, decodes the input files one after another into the stdin of the chunking sox
+    def feedStream(self, process, stream_inputs):
+        bytes_per_sec = self.PROCESSING_RATE * 2 * 4
+        try:
+            for in_tmp_file_path, dc_offset, vol_multi, audio_info in stream_inputs:
+                decode_command = [self.SOX_PATH]
+                decode_command.extend(self.getSinglePassInputArgs(in_tmp_file_path, vol_multi, audio_info))
+                decode_command.extend(self.STREAM_FORMAT_ARGS + ['-'])
+                decode_command.extend(self.getDCShiftEffect(dc_offset, vol_multi))
+                decode_command.extend(['rate', '-v', str(self.PROCESSING_RATE), 'channels', '2'])
+                decoder = self.startProcess(decode_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                while True:
+                    buffer = decoder.stdout.read(1024 * 1024)
+                    if not buffer:
+                        break
+                    process.stdin.write(buffer)
+                    self.stream_seconds_fed += len(buffer) / bytes_per_sec
+                decoder.wait()
+                if self.stopped or decoder.returncode != 0:
+                    raise Exception(f"Decoding {in_tmp_file_path} failed ({decoder.returncode})")
+        except Exception as e:
+            if not self.stopped:
+                print(f"Failed feedStream: {type(e)} ({e})")
+                self.stopConverting()
+        finally:
+            try:
+                process.stdin.close() # lets sox finish the last chunk
+            except Exception:
+                pass
+
+    # saves self.files_to_seq_merge as one output file
+    def saveChunk(self, output_file):
+        if len(self.files_to_seq_merge) == 1 and self.files_to_seq_merge[0].endswith(self.output_profile.getRenderExtension()): # no need to call merge cus just 1 file
+            self.finalizeOutput(self.files_to_seq_merge[0], output_file) # move temp output file to destination file
+            self.files_to_seq_merge = []
+        else:
+            if len(self.files_to_seq_merge) == 1: # lossless intermediate file, still has to be encoded
+                self.merged_out_path = output_file
+            self.mergeFiles()
+
+    # Files that get merged with others are rendered to a lossless format and encoded once when merging,
+    # unless the merges are joining mp3 frames without re-encoding (then rendering straight to mp3 is better).
+    # Once a frame join has failed the renders go back to lossless, so they aren't encoded twice.
+    def getRenderExtension(self, index):
+        intermediate_format = self.settings.intermediate_format
+        if (not self.settings.save_as_60_min_chunks or self.isFrameMergePlanned()
+        or intermediate_format not in self.INTERMEDIATE_BYTES_PER_SEC):
+            return self.output_profile.getRenderExtension()
+
+        chunk_group = next((chunk_group for chunk_group in self.chunk_groups if index in chunk_group), [index])
+        if len(chunk_group) < 2 or any(self.file_durations[group_index] > self.CHUNK_DURATION for group_index in chunk_group):
+            # split files are saved as mp3 so the merge will decode anyway
+            return self.output_profile.getRenderExtension()
+
+        estimated_bytes = int(self.file_durations[index] * self.INTERMEDIATE_BYTES_PER_SEC[intermediate_format])
+        with self.scratch_lock:
+            max_scratch_bytes = self.settings.max_scratch_gb * 1e9
+            if self.scratch_bytes + estimated_bytes > max_scratch_bytes:
+                print(f"Scratch space limit ({self.settings.max_scratch_gb} GB) reached, rendering straight to {self.output_profile.getRenderExtension()}")
+                return self.output_profile.getRenderExtension()
+            # reserved now so parallel jobs don't go over the limit, real size is set in updateScratchFile
+            self.scratch_bytes += estimated_bytes
+            self.scratch_bytes_peak = max(self.scratch_bytes_peak, self.scratch_bytes)
+            extension = f".{intermediate_format}"
+            self.pending_scratch_bytes[threading.get_ident()] = estimated_bytes
+        return extension
+
+    def updateScratchFile(self, path):
+        with self.scratch_lock:
+            reserved_bytes = self.pending_scratch_bytes.pop(threading.get_ident(), 0)
+            self.scratch_bytes -= reserved_bytes
+            if reserved_bytes == 0 or self.stopped or not os.path.isfile(path):
+                return
+            file_bytes = os.path.getsize(path)
+            self.scratch_files[path] = file_bytes
+            self.scratch_bytes += file_bytes
+            self.scratch_bytes_peak = max(self.scratch_bytes_peak, self.scratch_bytes)
+            print(f"Scratch space used by intermediate files: {self.scratch_bytes / 1e6:.0f} MB")
+
+    # Estimates the temp space the batch needs from the durations before anything is rendered.
+    # Fails if a single file can't fit, puts small batches on the RAM disk (ram_scratch_gb).
+    # When the files running at the same time don't fit, ScratchAdmission holds jobs back instead.
+    def preflightScratchSpace(self):
+        file_bytes = [self.estimateScratchBytes(index) for index in range(len(self.input_files))]
+        if self.settings.save_as_60_min_chunks and self.settings.streaming_chunks:
+            peak_bytes = sum(file_bytes) # every input is staged before the one sox call starts
+        else:
+            peak_bytes = sum(sorted(file_bytes, reverse=True)[:self.num_workers if self.parallel else 1])
+
+        if 0 < peak_bytes <= self.settings.ram_scratch_gb * 1e9:
+            ram_scratch_dir = getRamScratchDir()
+            if ram_scratch_dir is not None and getFreeBytes(ram_scratch_dir) >= peak_bytes:
+                print(f"Temp files ({peak_bytes / 1e6:.0f} MB) go to the RAM disk {ram_scratch_dir}")
+                self.scratch_dir = ram_scratch_dir
+                self.scratch_admission = ScratchAdmission(self.scratch_dir)
+
+        try:
+            free_bytes = getFreeBytes(self.scratch_dir)
+        except OSError as e:
+            print(f"Can't check the free space of {self.scratch_dir}: {type(e)} ({e})")
+            return True
+        needed_bytes = max(file_bytes, default=0)
+        if self.settings.save_as_60_min_chunks and self.settings.streaming_chunks:
+            needed_bytes = peak_bytes
+        if needed_bytes > free_bytes:
+            self.error_message = f"Not enough space for temp files ({needed_bytes / 1e9:.1f} GB needed, {max(free_bytes, 0) / 1e9:.1f} GB free)"
+            return False
+        print(f"Temp files need up to {peak_bytes / 1e9:.1f} GB, {free_bytes / 1e9:.1f} GB free in {self.scratch_dir}")
+        return True
+
+    # Rough upper bound of the temp space converting input file number index takes at once:
+    # staged input (a copy if it can't be linked), the multi pass noise and DC fixed files, and the rendered output
+    def estimateScratchBytes(self, index):
+        try:
+            input_bytes = os.path.getsize(self.input_files[index])
+        except OSError:
+            input_bytes = 0
+        pass_bytes = 0 if self.settings.single_pass else 2 * input_bytes
+        return input_bytes + pass_bytes + self.estimateRenderBytes(self.file_durations[index])
+
+    def estimateRenderBytes(self, duration):
+        if self.output_profile.isEncodedByFfmpeg():
+            return duration * self.INTERMEDIATE_BYTES_PER_SEC["flac"]
+        if (self.settings.save_as_60_min_chunks and not self.isFrameMergePlanned()
+        and self.settings.intermediate_format in self.INTERMEDIATE_BYTES_PER_SEC):
+            return duration * self.INTERMEDIATE_BYTES_PER_SEC[self.settings.intermediate_format]
+        return duration * self.ENCODED_BYTES_PER_SEC
+
+    def getNumWorkers(self):
+        max_jobs = self.settings.max_parallel_jobs
+        if not max_jobs or max_jobs < 1:
+            max_jobs = os.cpu_count() or 1
+        return max(1, min(max_jobs, len(self.input_files)))
+
+    def convertFilesSequentially(self):
         for index, input_file in enumerate(self.input_files):
             if self.stopped:
                 break
 
             self.estimateRemainingTime(index)
+            self.job_context.index = index
             curr_file_duration = self.file_durations[index]
 
             filename, extension = os.path.splitext(os.path.basename(input_file))
             
             self.total_progress_updated.emit(f"{filename[:self.MAX_CHARS]}{'...' if len(filename) > self.MAX_CHARS else ''} ({index}/{len(self.input_files)})")
+            self.files_done_updated.emit(index)
             self.current_task_updated.emit("Preparing file...")
             self.curr_file_progress_updated.emit(0)
 
@@ -95,7 +520,7 @@ class ConversionWorker(QObject):
                 # input file:
                 in_tmp_file_path = self.getTempFile(extension) # create temp file
                 # remember to call self.delTempFile(tmp_file) when done using it
-                self.copyFile(input_file, in_tmp_file_path) # copy input file to temp file
+                self.stageInputFile(input_file, in_tmp_file_path) # link (or copy) input file to temp file
 
                 if self.settings.save_as_60_min_chunks and len(self.files_to_seq_merge) == 0:
                     # final output path for merged files
@@ -104,7 +529,7 @@ class ConversionWorker(QObject):
                 # final output path for non-merged files
                 output_file = self.generateDestinationPath(filename)
 
-                out_tmp_file_path = self.getTempFile(self.OUTPUT_EXTENSION) # create temp file
+                out_tmp_file_path = self.getTempFile(self.getRenderExtension(index)) # create temp file
 
                 # self.estimateTotalTime(curr_file_duration, len(self.input_files) - index)
 
@@ -112,47 +537,44 @@ class ConversionWorker(QObject):
                     # if longer than 60 min: split into 60 min chunks then append remainder to to-merge list
                     if curr_file_duration > self.CHUNK_DURATION:
                         self.did_split = True
-                        self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension, split=True)
-                        
-                        # sleep a little to wait for the files to be ready (just to be safe)
-                        time.sleep(max(2, curr_file_duration * 0.00001))
+                        # the full 60 min parts are saved while sox is still encoding the next one
+                        chunk_tracker = SplitChunkTracker(out_tmp_file_path)
+                        def finalizeSplitFile(split_file, output_file=output_file):
+                            split_file_output_path, _ = self.getSplitOutputPaths(split_file, output_file)
+                            self.finalizeOutput(split_file, split_file_output_path)
+                        self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension, split=True, source_file=input_file,
+                            chunk_tracker=chunk_tracker, on_chunk_ready=finalizeSplitFile)
 
                         # split file gets saved with diff name than original so this is empty file
                         self.delTempFile(out_tmp_file_path)
 
-                        tmp_parent_dir = os.path.dirname(out_tmp_file_path)
-                        tmp_filename = os.path.splitext(os.path.basename(out_tmp_file_path))
-                        self.split_files = []
-                        for file_in_tmp_dir in os.listdir(tmp_parent_dir):
-                            file_in_tmp_dir_path = os.path.join(tmp_parent_dir, file_in_tmp_dir)
-                            if os.path.isfile(file_in_tmp_dir_path):
-                                if file_in_tmp_dir.startswith(tmp_filename):
-                                    self.split_files.append(file_in_tmp_dir_path)
-
-                        self.split_files.sort()
-
-                        output_file_path_without_extension, output_file_extension = os.path.splitext(output_file)
-                        for sf_idx, split_file in enumerate(self.split_files):
-                            split_file_without_extension, _ = os.path.splitext(split_file)
-                            split_file_number = split_file_without_extension[-3:]
-                            split_file_output_path = f"{output_file_path_without_extension}{split_file_number}{output_file_extension}"
-                            if sf_idx < len(self.split_files) - 1: # not last split file
-                                self.copyFileAndFixMetadata(split_file, split_file_output_path)
-                            else: # last split file
-                                # the last split file after splitting will prob be shorter than 60 min
-                                # so we include it in the merge array for next input files (it gets saved below if this is the last input file)
-                                last_split_file = self.split_files.pop()
-                                self.files_to_seq_merge.append(last_split_file)
-                                self.total_dur_seq_merge += self.getFileDuration(last_split_file)
-                                self.merged_out_path = f"{output_file_path_without_extension}{split_file_number}(Merged){output_file_extension}"
-                                output_file = split_file_output_path
+                        # sox has exited, so the parts it wrote since the last check are complete too
+                        self.split_files = chunk_tracker.popReadyChunks(sox_finished=True)
+                        if self.stopped:
+                            raise AliceStoppingException()
+                        if len(self.split_files) == 0:
+                            raise self.getNoSplitPartsError(input_file)
+
+                        # the last split file after splitting will prob be shorter than 60 min
+                        # so we include it in the merge array for next input files (it gets saved below if this is the last input file)
+                        last_split_file = self.split_files.pop()
+                        while len(self.split_files) > 0:
+                            # taken off the list first, the finalizer moves (deletes) it
+                            split_file = self.split_files.pop(0)
+                            split_file_output_path, _ = self.getSplitOutputPaths(split_file, output_file)
+                            self.finalizeOutput(split_file, split_file_output_path)
+                        self.files_to_seq_merge.append(last_split_file)
+                        self.total_dur_seq_merge += self.getFileDuration(last_split_file)
+                        output_file, self.merged_out_path = self.getSplitOutputPaths(last_split_file, output_file)
                     else:
-                        self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension)
+                        self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension, source_file=input_file)
+                        self.updateScratchFile(out_tmp_file_path)
                         self.files_to_seq_merge.append(out_tmp_file_path)
                         self.total_dur_seq_merge += curr_file_duration
                 else:
-                    self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension)
-                    self.copyFileAndFixMetadata(out_tmp_file_path, output_file) # copy temp output file to destination file
+                    self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension, source_file=input_file)
+                    self.finalizeOutput(out_tmp_file_path, output_file) # move temp output file to destination file
+                    out_tmp_file_path = None
 
                 # not last file
                 if index + 1 < len(self.input_files):
@@ -168,18 +590,10 @@ class ConversionWorker(QObject):
                         or curr_chunk_diff <= next_chunk_diff
                         or next_file_duration > self.CHUNK_DURATION):
                             # save/merge what we have now
-                            if len(self.files_to_seq_merge) == 1: # no need to call merge cus just 1 file
-                                self.copyFileAndFixMetadata(self.files_to_seq_merge[0], output_file) # copy temp output file to destination file
-                                self.delTempChunkFiles()
-                            else:
-                                self.mergeFiles()
+                            self.saveChunk(output_file)
                 else: # if last file
                     if self.settings.save_as_60_min_chunks:
-                        if len(self.files_to_seq_merge) == 1: # no need to call merge cus just 1 file
-                            self.copyFileAndFixMetadata(self.files_to_seq_merge[0], output_file) # copy temp output file to destination file
-                            self.delTempChunkFiles()
-                        else:
-                            self.mergeFiles()
+                        self.saveChunk(output_file)
 
             except AliceStoppingException as e:
                 self.delTempFile(out_tmp_file_path)
@@ -199,8 +613,476 @@ class ConversionWorker(QObject):
         
         if len(self.files_to_seq_merge) > 0:
             self.delTempChunkFiles()
-            
-        self.finished.emit()
+
+    # Renders up to self.num_workers files at once (longest first).
+    # Chunk groups are planned ahead from the durations so the outputs are the same as convertFilesSequentially.
+    # Jobs can submit follow-up jobs (segment rendering), their results are handled here on the worker thread.
+    def convertFilesParallel(self):
+        if self.settings.save_as_60_min_chunks:
+            self.parallel_groups = self.chunk_groups
+        else:
+            self.parallel_groups = [[index] for index in range(len(self.input_files))]
+        self.next_group_idx = 0
+        self.rendered_files = {} # input index -> (temp output, output path, merged output path)
+        self.segmented_renders = []
+        self.early_chunk_futures = {}
+
+        self.executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        self.pending_jobs = {} # future -> function that handles its result
+        try:
+            resumed_files = self.resumeFromJournal()
+
+            self.time_remaining = math.ceil((sum(self.estimated_times) + sum(self.estimated_merging_times)) / self.num_workers)
+            self.time_remaining_updated.emit(self.time_remaining)
+            self.curr_file_progress_updated.emit(0)
+            self.updateParallelProgressText()
+
+            job_order = sorted(range(len(self.input_files)), key=lambda index: self.file_durations[index], reverse=True)
+            for index in job_order:
+                if index in resumed_files:
+                    continue
+                if self.canRenderInSegments(index):
+                    self.submitJob(self.onSegmentedRenderPrepared, self.prepareSegmentedRenderJob, index)
+                else:
+                    self.submitJob(lambda result, index=index: self.onFileRendered(index, *result), self.renderFileJob, index)
+
+            while self.pending_jobs and not self.stopped:
+                done_jobs, _ = wait(self.pending_jobs, return_when=FIRST_COMPLETED)
+                for future in done_jobs:
+                    on_done = self.pending_jobs.pop(future)
+                    try:
+                        on_done(future.result())
+                    except AliceStoppingException:
+                        continue
+                    except Exception as e:
+                        print(f"Exception in convertFilesParallel, deleting temp files: {type(e)} ({e})")
+                        traceback.print_exc()
+                        self.stopConverting()
+                        break
+        finally:
+            for future in self.pending_jobs:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.pending_jobs = {}
+            for tmp_file, _, _ in self.rendered_files.values():
+                if self.journal is None or not self.journal.isKeptFile(tmp_file):
+                    self.delTempFile(tmp_file)
+            for segmented_render in self.segmented_renders:
+                self.delSegmentedRenderTempFiles(segmented_render)
+
+    def submitJob(self, on_done, job, *args):
+        self.pending_jobs[self.executor.submit(job, *args)] = on_done
+
+    def onFileRendered(self, index, split, tmp_outputs):
+        with self.finalize_lock:
+            early_chunk_futures = self.early_chunk_futures.pop(index, [])
+        if self.journal is not None:
+            # the parts saved while rendering aren't in the journal, they have to be saved before it says rendered
+            if not self.waitForOutputs(early_chunk_futures):
+                return
+            tmp_outputs = self.keepInJournal(tmp_outputs)
+            self.journal.recordRendered(index, split, tmp_outputs)
+        self.rendered_files[index] = self.finishRenderedFile(index, split, tmp_outputs)
+        if self.journal is not None and not self.stopped:
+            self.journal.recordFinishedFile(index, *self.rendered_files[index])
+        self.onFileFinished()
+
+    def onFileFinished(self):
+        self.num_files_done += 1
+        self.updateParallelProgressText()
+
+        # groups have to be finished in order, so wait until every file in the next group is done
+        while (self.next_group_idx < len(self.parallel_groups)
+        and all(group_index in self.rendered_files for group_index in self.parallel_groups[self.next_group_idx])):
+            self.finishChunkGroup(self.parallel_groups[self.next_group_idx], self.rendered_files)
+            if self.journal is not None and not self.stopped and self.waitForFinalizing():
+                self.journal.recordGroupDone(self.next_group_idx)
+            self.next_group_idx += 1
+            self.current_task_updated.emit("")
+
+    # The journal is kept for the same input files and the settings that change the outputs
+    def openJournal(self):
+        if not self.settings.resumable_batches:
+            return None
+        settings_values = {key: value for key, value in self.settings.__dict__.items()
+            if key not in ("window_position", "input_folder", "max_parallel_jobs", "analysis_cache_size", "max_scratch_gb", "scratch_dir", "ram_scratch_gb", "trace_spans", "python_profiler")}
+        try:
+            # same place for every run of the batch, RAM disk batches copy their renders into it
+            return ConversionJournal.openForBatch(getJournalRootDir(self.disk_scratch_dir), self.input_files, settings_values)
+        except Exception as e:
+            print(f"Failed to open the conversion journal, can't resume this batch later: {type(e)} ({e})")
+        return None
+
+    # Skips what a stopped run of the same batch already did, returns the input indices that don't need rendering
+    def resumeFromJournal(self):
+        if self.journal is None or not self.journal.hasProgress():
+            return set()
+        resumed_files = set()
+        # groups are finished in order
+        while self.next_group_idx in self.journal.done_groups:
+            for index in self.parallel_groups[self.next_group_idx]:
+                resumed_files.add(index)
+                self.num_files_done += 1
+            self.next_group_idx += 1
+
+        for group in self.parallel_groups[self.next_group_idx:]:
+            for index in group:
+                if index in self.journal.finished_files:
+                    self.rendered_files[index] = self.journal.finished_files[index]
+                elif index in self.journal.rendered:
+                    self.rendered_files[index] = self.finishRenderedFile(index, *self.journal.rendered[index])
+                    if self.stopped:
+                        break
+                    self.journal.recordFinishedFile(index, *self.rendered_files[index])
+                else:
+                    continue
+                resumed_files.add(index)
+                self.num_files_done += 1 # onFileFinished counts the last one
+
+        print(f"Resuming batch: {len(resumed_files)}/{len(self.input_files)} files were already converted")
+        for index in resumed_files:
+            self.estimated_times[index] = 0
+        num_merges_left = len([group for group in self.parallel_groups[self.next_group_idx:] if len(group) > 1])
+        self.estimated_merging_times = self.estimated_merging_times[:num_merges_left]
+        if len(resumed_files) > 0 and self.next_group_idx < len(self.parallel_groups):
+            self.num_files_done -= 1
+            self.onFileFinished() # finishes the groups that only had resumed files
+        return resumed_files
+
+    # rendered files move out of the temp dir (deleted on exit) into the journal's dir
+    def keepInJournal(self, paths):
+        kept_paths = self.journal.keepFiles(paths)
+        with self.scratch_lock:
+            for path, kept_path in zip(paths, kept_paths):
+                if path in self.scratch_files:
+                    self.scratch_files[kept_path] = self.scratch_files.pop(path)
+        return kept_paths
+
+    def updateParallelProgressText(self):
+        self.files_done_updated.emit(self.num_files_done)
+        if self.num_workers == 1:
+            self.total_progress_updated.emit(f"File {min(self.num_files_done + 1, len(self.input_files))}/{len(self.input_files)}")
+            return
+        self.total_progress_updated.emit(f"{self.num_workers} files at a time ({self.num_files_done}/{len(self.input_files)})")
+
+    # Runs on a worker thread, returns the temp output file(s) of input file number index
+    def renderFileJob(self, index):
+        if self.stopped:
+            raise AliceStoppingException()
+        self.job_context.index = index
+        input_file = self.input_files[index]
+        _, extension = os.path.splitext(os.path.basename(input_file))
+        split = self.settings.save_as_60_min_chunks and self.file_durations[index] > self.CHUNK_DURATION
+
+        scratch_bytes = self.estimateScratchBytes(index)
+        if not self.scratch_admission.reserve(scratch_bytes, lambda: self.stopped):
+            raise AliceStoppingException()
+        in_tmp_file_path = self.getTempFile(extension)
+        out_tmp_file_path = self.getTempFile(self.getRenderExtension(index))
+        chunk_tracker = SplitChunkTracker(out_tmp_file_path) if split else None
+        try:
+            self.stageInputFile(input_file, in_tmp_file_path)
+            self.applyTremolo(in_tmp_file_path, out_tmp_file_path, extension, split=split, source_file=input_file,
+                chunk_tracker=chunk_tracker, on_chunk_ready=lambda split_file: self.finalizeChunkEarly(index, split_file))
+        finally:
+            self.delTempFile(in_tmp_file_path)
+            self.updateScratchFile(out_tmp_file_path)
+            self.scratch_admission.release(scratch_bytes)
+
+        if self.stopped:
+            self.delTempFile(out_tmp_file_path)
+            if split:
+                for split_file in chunk_tracker.popReadyChunks(sox_finished=True):
+                    self.delTempFile(split_file)
+            raise AliceStoppingException()
+
+        if split:
+            # split file gets saved with diff name than original so this is empty file
+            self.delTempFile(out_tmp_file_path)
+            # the parts that weren't saved while rendering (at least the last one, which goes to the chunk group)
+            split_files = chunk_tracker.popReadyChunks(sox_finished=True)
+            if len(split_files) == 0:
+                raise self.getNoSplitPartsError(input_file)
+            return True, split_files
+        return False, [out_tmp_file_path]
+
+    # sox exited without writing any part of a file that was probed as longer than 60 min (it can't decode it).
+    # The batch is stopped by the caller's exception handling, error_message says why.
+    def getNoSplitPartsError(self, input_file):
+        filename = os.path.basename(input_file)
+        if self.error_message is None:
+            self.error_message = f"Rendering {filename[:self.MAX_CHARS]}{'...' if len(filename) > self.MAX_CHARS else ''} failed"
+            self.current_task_updated.emit(self.error_message)
+        return Exception(f"sox didn't write any 60 min parts of {input_file}")
+
+    # Saves a full 60 min part of input file number index while the rest of the file is still being rendered.
+    # Called on worker threads and by the orchestrator (segments).
+    def finalizeChunkEarly(self, index, split_file):
+        filename, _ = os.path.splitext(os.path.basename(self.input_files[index]))
+        split_file_output_path, _ = self.getSplitOutputPaths(split_file, self.generateDestinationPath(filename))
+        future = self.finalizeOutput(split_file, split_file_output_path)
+        with self.finalize_lock:
+            self.early_chunk_futures.setdefault(index, []).append(future)
+
+    # Saves the full 60 min parts of a split file, returns what is left for the chunk group
+    def finishRenderedFile(self, index, split, tmp_outputs):
+        filename, _ = os.path.splitext(os.path.basename(self.input_files[index]))
+        output_file = self.generateDestinationPath(filename)
+        merged_out_path = self.generateDestinationPath(f"{filename}(Merged)")
+        if split:
+            finalize_futures = []
+            for split_file in tmp_outputs[:-1]:
+                split_file_output_path, _ = self.getSplitOutputPaths(split_file, output_file)
+                finalize_futures.append(self.finalizeOutput(split_file, split_file_output_path))
+            if self.journal is not None:
+                self.waitForOutputs(finalize_futures) # the journal can only say they're saved once they are
+            output_file, merged_out_path = self.getSplitOutputPaths(tmp_outputs[-1], output_file)
+        return tmp_outputs[-1], output_file, merged_out_path
+
+    def finishChunkGroup(self, chunk_group, rendered_files):
+        _, output_file, self.merged_out_path = rendered_files[chunk_group[0]]
+        self.files_to_seq_merge = [rendered_files.pop(index)[0] for index in chunk_group]
+        self.total_dur_seq_merge = sum(self.getChunkPartDuration(index) for index in chunk_group)
+        self.saveChunk(output_file)
+
+    # how much of input file number index ends up in its chunk group (only the last part of a split file)
+    def getChunkPartDuration(self, index):
+        if self.settings.save_as_60_min_chunks and self.file_durations[index] > self.CHUNK_DURATION:
+            return self.getSplitRemainderDuration(self.file_durations[index])
+        return self.file_durations[index]
+
+    # Long files can be rendered as time segments on several workers (only with the single pass command)
+    def canRenderInSegments(self, index):
+        if not (self.settings.segment_rendering and self.parallel and self.settings.single_pass):
+            return False
+        if self.useNumpyEngine():
+            return False # segments are rendered by sox, every file of a batch should go through the same effects
+        if self.settings.analysis_mode == "none":
+            return False # the adaptive level of each segment would start from scratch
+        if self.file_durations[index] <= self.CHUNK_DURATION:
+            return False
+        if self.settings.save_as_60_min_chunks:
+            return True
+        # without chunks the segments get stitched together from lossless files
+        stitch_bytes = self.file_durations[index] * self.INTERMEDIATE_BYTES_PER_SEC[self.getStitchFormat()]
+        return stitch_bytes <= self.settings.max_scratch_gb * 1e9
+
+    def getStitchFormat(self):
+        if self.settings.intermediate_format in self.INTERMEDIATE_BYTES_PER_SEC:
+            return self.settings.intermediate_format
+        return "flac"
+
+    # With 60 min chunks every chunk is a segment (nothing to stitch), otherwise the file is spread over the workers
+    def getSegmentDuration(self, index):
+        if self.settings.save_as_60_min_chunks:
+            return self.CHUNK_DURATION
+        return max(self.MIN_SEGMENT_DURATION, math.ceil(self.file_durations[index] / self.num_workers))
+
+    # Runs on a worker thread: stages the input and plans its segments (audio_info stays None if that's not possible)
+    def prepareSegmentedRenderJob(self, index):
+        if self.stopped:
+            raise AliceStoppingException()
+        input_file = self.input_files[index]
+        _, extension = os.path.splitext(os.path.basename(input_file))
+        segmented_render = SegmentedRender(index, self.getTempFile(extension), None, [])
+        self.segmented_renders.append(segmented_render) # so the temp files get deleted if the conversion stops
+        self.stageInputFile(input_file, segmented_render.in_tmp_file_path)
+
+        audio_info = self.getAudioInfo(segmented_render.in_tmp_file_path)
+        if audio_info is None:
+            return segmented_render
+        rate, _, samples = audio_info
+        segmented_render.segments = planTimeSegments(samples, rate, self.getSegmentDuration(index), self.output_profile.rate, self.SEGMENT_PADDING_SEC)
+        segmented_render.out_tmp_file_path = self.getTempFile(self.output_profile.getRenderExtension())
+        segmented_render.cache_key = self.getAnalysisCacheKey(input_file)
+        cached_analysis = self.getCachedAnalysis(segmented_render.cache_key, input_file)
+        if cached_analysis is not None:
+            segmented_render.dc_offset, segmented_render.vol_multi = cached_analysis
+        segmented_render.audio_info = audio_info
+        return segmented_render
+
+    def onSegmentedRenderPrepared(self, segmented_render):
+        if segmented_render.audio_info is None:
+            # sox can't tell the length, render the whole file instead
+            self.segmented_renders.remove(segmented_render)
+            self.delSegmentedRenderTempFiles(segmented_render)
+            index = segmented_render.index
+            self.submitJob(lambda result: self.onFileRendered(index, *result), self.renderFileJob, index)
+            return
+        if segmented_render.dc_offset is not None:
+            self.submitSegmentRenders(segmented_render)
+            return
+        if self.settings.analysis_mode == "sampled":
+            self.submitJob(lambda analysis: self.onSegmentedRenderSampled(segmented_render, analysis),
+                self.runSampledStat, segmented_render.in_tmp_file_path, segmented_render.audio_info)
+            return
+        self.submitSegmentAnalyses(segmented_render)
+
+    def onSegmentedRenderSampled(self, segmented_render, analysis):
+        if analysis is None:
+            self.submitSegmentAnalyses(segmented_render)
+            return
+        segmented_render.dc_offset, segmented_render.vol_multi = analysis
+        self.cacheAnalysis(segmented_render.cache_key, *analysis, sampled=True)
+        self.submitSegmentRenders(segmented_render)
+
+    def submitSegmentAnalyses(self, segmented_render):
+        # "stat" of every segment adds up to the "stat" of the whole file, so the analysis runs in parallel too
+        for segment in segmented_render.segments:
+            self.submitJob(lambda result, segment=segment: self.onSegmentAnalysed(segmented_render, segment, *result),
+                self.analyseSegmentJob, segmented_render, segment)
+
+    # Runs on a worker thread
+    def analyseSegmentJob(self, segmented_render, segment):
+        if self.stopped:
+            raise AliceStoppingException()
+        self.current_task_updated.emit("Analyzing...")
+        dc_offset, vol_multi, succeeded = self.runStat(segmented_render.in_tmp_file_path, ['trim', f"{segment.start}s", f"{segment.length}s"],
+            audio_sec=segment.getDuration())
+        return (segment.length, dc_offset, vol_multi), succeeded
+
+    def onSegmentAnalysed(self, segmented_render, segment, segment_stats, succeeded):
+        segmented_render.segment_stats[segment.number] = segment_stats
+        if not succeeded:
+            segmented_render.cache_key = None # don't remember a partial analysis
+        if not segmented_render.isAnalysed():
+            return
+        dc_offset, vol_multi = combineSegmentStats(list(segmented_render.segment_stats.values()))
+        segmented_render.dc_offset = dc_offset
+        segmented_render.vol_multi = vol_multi
+        self.cacheAnalysis(segmented_render.cache_key, dc_offset, vol_multi)
+        self.submitSegmentRenders(segmented_render)
+
+    def submitSegmentRenders(self, segmented_render):
+        # with chunks the segments are named like the parts sox saves with newfile, so they are handled the same way
+        chunk_tracker = SplitChunkTracker(segmented_render.out_tmp_file_path)
+        for segment in segmented_render.segments:
+            if self.settings.save_as_60_min_chunks:
+                segmented_render.segment_outputs[segment.number] = chunk_tracker.getChunkPath(segment.number)
+            else:
+                segmented_render.segment_outputs[segment.number] = self.getTempFile(f".{self.getStitchFormat()}")
+            self.segment_durations[(segmented_render.index, segment.number)] = segment.getDuration()
+            self.submitJob(lambda _, segment=segment: self.onSegmentRendered(segmented_render, segment),
+                self.renderSegmentJob, segmented_render, segment)
+
+    # Runs on a worker thread
+    def renderSegmentJob(self, segmented_render, segment):
+        if self.stopped:
+            raise AliceStoppingException()
+        self.job_context.index = (segmented_render.index, segment.number)
+        scratch_bytes = segment.getDuration() * self.INTERMEDIATE_BYTES_PER_SEC[self.getStitchFormat()]
+        if not self.scratch_admission.reserve(scratch_bytes, lambda: self.stopped):
+            raise AliceStoppingException()
+        self.current_task_updated.emit("Applying effects...")
+        try:
+            process = self.runRenderCommand(self.buildSegmentCommand(segmented_render, segment), self.getRenderStage(segment=True),
+                out_file=segmented_render.segment_outputs[segment.number])
+        finally:
+            self.scratch_admission.release(scratch_bytes)
+        if self.stopped:
+            raise AliceStoppingException()
+        if process.returncode != 0:
+            raise Exception(f"sox exited with {process.returncode} rendering segment {segment.number}")
+
+    # Single pass command for one segment: the input is read by a piped sox call that starts with trim
+    # (so sox seeks to the segment instead of decoding everything before it), noise is as long as what gets read
+    def buildSegmentCommand(self, segmented_render, segment):
+        rate, channels, _ = segmented_render.audio_info
+        segment_input = self.soxPipeInput([segmented_render.in_tmp_file_path, '-p', 'trim', f"{segment.getReadStart()}s", f"{segment.getReadLength()}s"])
+        sox_command = [self.SOX_PATH, '-S']
+        sox_command.extend(self.getSinglePassInputArgs(segment_input, segmented_render.vol_multi, (rate, channels, segment.getReadLength()), ['-t', 'sox']))
+        sox_command.extend(self.getOutputArgs(segmented_render.segment_outputs[segment.number]))
+        sox_command.extend(self.getDCShiftEffect(segmented_render.dc_offset, segmented_render.vol_multi))
+        sox_command.extend(self.getEffectsChain(segment=segment))
+        return sox_command
+
+    def onSegmentRendered(self, segmented_render, segment):
+        segmented_render.rendered_segments.add(segment.number)
+        if self.settings.save_as_60_min_chunks and segment is not segmented_render.segments[-1]:
+            # a full 60 min part, saved right away while the other segments render
+            self.finalizeChunkEarly(segmented_render.index, segmented_render.segment_outputs.pop(segment.number))
+        if not segmented_render.isRendered():
+            return
+        index = segmented_render.index
+        self.delTempFile(segmented_render.in_tmp_file_path)
+        segmented_render.in_tmp_file_path = None
+        if self.settings.save_as_60_min_chunks:
+            self.segmented_renders.remove(segmented_render)
+            self.delTempFile(segmented_render.out_tmp_file_path) # the parts are named after it, it's empty
+            self.onFileRendered(index, True, list(segmented_render.segment_outputs.values())) # only the last part is left
+        else:
+            self.submitJob(lambda _: self.onSegmentsStitched(segmented_render), self.stitchSegmentsJob, segmented_render)
+
+    # Runs on a worker thread: joins the lossless segments and encodes them once (boundaries stay sample exact)
+    def stitchSegmentsJob(self, segmented_render):
+        if self.stopped:
+            raise AliceStoppingException()
+        self.current_task_updated.emit("Joining segments...")
+        stitch_command = [self.SOX_PATH] + segmented_render.getSegmentOutputs() + self.getOutputArgs(segmented_render.out_tmp_file_path)
+        start_time = time.time()
+        with self.traceSpan("stitch", segments=len(segmented_render.segments)) as span:
+            span.audio_sec = self.file_durations[segmented_render.index]
+            span.bytes_read = sum(getFileBytes(segment_output) or 0 for segment_output in segmented_render.getSegmentOutputs())
+            process = self.startProcess(stitch_command)
+            self.waitForProcess(process, unestimated=True)
+            span.exit_code = process.returncode
+            span.bytes_written = getFileBytes(segmented_render.out_tmp_file_path)
+        if self.stopped:
+            raise AliceStoppingException()
+        if process.returncode != 0:
+            raise Exception(f"sox exited with {process.returncode} joining segments")
+        self.recordStageTime("stitch", self.file_durations[segmented_render.index], time.time() - start_time)
+
+    def onSegmentsStitched(self, segmented_render):
+        self.segmented_renders.remove(segmented_render)
+        for segment_output in segmented_render.getSegmentOutputs():
+            self.delTempFile(segment_output)
+        self.onFileRendered(segmented_render.index, False, [segmented_render.out_tmp_file_path])
+
+    def delSegmentedRenderTempFiles(self, segmented_render):
+        for tmp_file in segmented_render.getTempFiles():
+            if tmp_file is not None and os.path.isfile(tmp_file):
+                self.delTempFile(tmp_file)
+
+    def getSplitOutputPaths(self, split_file, output_file):
+        output_file_path_without_extension, output_file_extension = os.path.splitext(output_file)
+        split_file_without_extension, _ = os.path.splitext(split_file)
+        split_file_number = split_file_without_extension[-3:]
+        split_file_output_path = f"{output_file_path_without_extension}{split_file_number}{output_file_extension}"
+        merged_out_path = f"{output_file_path_without_extension}{split_file_number}(Merged){output_file_extension}"
+        return split_file_output_path, merged_out_path
+
+    def getSplitRemainderDuration(self, duration):
+        # duration of the last part after splitting into 60 min parts
+        num_parts = math.ceil(duration / self.CHUNK_DURATION)
+        return duration - self.CHUNK_DURATION * (num_parts - 1)
+
+    # Same merge decisions as convertFilesSequentially makes while going through the files,
+    # returns the input file indices of each output chunk
+    def planChunkGroups(self):
+        chunk_groups = []
+        curr_group = []
+        curr_group_dur = 0
+        for index, file_dur in enumerate(self.file_durations):
+            curr_group.append(index)
+            if file_dur > self.CHUNK_DURATION:
+                curr_group_dur += self.getSplitRemainderDuration(file_dur)
+            else:
+                curr_group_dur += file_dur
+
+            if index + 1 < len(self.file_durations):
+                next_file_duration = self.file_durations[index + 1]
+                curr_chunk_diff = abs(curr_group_dur - self.CHUNK_DURATION)
+                next_chunk_diff = abs(curr_group_dur + next_file_duration - self.CHUNK_DURATION)
+                if (curr_group_dur >= self.CHUNK_DURATION
+                or curr_chunk_diff <= next_chunk_diff
+                or next_file_duration > self.CHUNK_DURATION):
+                    chunk_groups.append(curr_group)
+                    curr_group = []
+                    curr_group_dur = 0
+            else:
+                chunk_groups.append(curr_group)
+        return chunk_groups
 
     def copyFile(self, src, dst):
         try:
@@ -213,7 +1095,101 @@ class ConversionWorker(QObject):
                 print(f"Failed copyFile: {type(e)} ({e})")
         return False
     
-    def copyFileAndFixMetadata(self, src, dst):
+    # sox only reads the input, so a link to it works as well as a copy
+    def stageInputFile(self, src, dst):
+        with self.traceSpan("stage_input") as span:
+            try:
+                start_time = time.time()
+                staging_method = stageFile(src, dst)
+                span.attributes["method"] = staging_method
+                if staging_method in ("copy_file_range", "copy"):
+                    span.bytes_read = span.bytes_written = getFileBytes(src)
+                print(f"Staged {os.path.basename(src)} with {staging_method} in {time.time() - start_time:.2f} sec")
+                return True
+            except Exception as e:
+                print(f"Failed stageInputFile: {type(e)} ({e})")
+            span.attributes["method"] = "shutil.copy"
+            span.bytes_read = span.bytes_written = getFileBytes(src)
+            return self.copyFile(src, dst)
+
+    # Hands a finished temp output over to the finalizer, which fixes its tags and moves it to dst.
+    # Callers must not delete src afterwards. Returns the future of the finalize job.
+    def finalizeOutput(self, src, dst):
+        future = self.finalizer.submit(self.finalizeOutputJob, src, dst)
+        with self.finalize_lock:
+            # failed ones are kept for waitForFinalizing
+            self.finalize_futures = [pending for pending in self.finalize_futures
+                if not pending.done() or (not pending.cancelled() and pending.exception() is not None)]
+            self.finalize_futures.append(future)
+        return future
+
+    # Runs on a finalizer thread: the tags are rewritten in the temp file (once), then it's moved, not copied
+    # Profiles encoded by ffmpeg get encoded here, straight into the output folder
+    def finalizeOutputJob(self, src, dst):
+        try:
+            start_time = time.time()
+            if self.output_profile.isEncodedByFfmpeg():
+                self.encodeWithFfmpeg(src, dst)
+                print(f"Encoded {os.path.basename(dst)} with ffmpeg in {time.time() - start_time:.2f} sec")
+                return
+            with self.traceSpan("metadata_fix", output=os.path.basename(dst)):
+                self.fixMetadata(src)
+            with self.traceSpan("save_output", output=os.path.basename(dst)) as span:
+                span.bytes_read = getFileBytes(src)
+                move_method = moveFile(src, dst)
+                span.attributes["method"] = move_method
+                if move_method != "rename":
+                    span.bytes_written = span.bytes_read
+            print(f"Saved {os.path.basename(dst)} with {move_method} in {time.time() - start_time:.2f} sec")
+        except Exception as e:
+            print(f"Failed finalizeOutputJob: {type(e)} ({e})")
+            raise Exception(f"Failed to save {os.path.basename(dst)} ({e})") from e # the future keeps it, see waitForOutputs
+        finally:
+            self.forgetTempFile(src)
+
+    # src is the lossless render, its tags (copied from the input by sox) are kept.
+    # ffmpeg writes to a .partial file next to dst first, so dst is never a half written file
+    def encodeWithFfmpeg(self, src, dst):
+        partial_path = dst + ".partial"
+        ffmpeg_command = [self.ffmpeg_path, '-hide_banner', '-nostdin', '-y', '-i', src, '-map_metadata', '0', '-vn']
+        ffmpeg_command.extend(self.output_profile.ffmpeg_args)
+        ffmpeg_command.extend(['-f', self.output_profile.ffmpeg_format, partial_path])
+        try:
+            with self.traceSpan("encode", output=os.path.basename(dst), codec=self.output_profile.codec) as span:
+                span.bytes_read = getFileBytes(src)
+                process = self.startProcess(ffmpeg_command, stderr=subprocess.DEVNULL)
+                process.wait()
+                span.exit_code = process.returncode
+                span.bytes_written = getFileBytes(partial_path)
+            if process.returncode != 0:
+                raise Exception(f"ffmpeg exited with {process.returncode}")
+            os.replace(partial_path, dst)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            self.delTempFile(src)
+
+    # blocks until every output handed to finalizeOutput so far is saved, False if one of them failed
+    def waitForFinalizing(self):
+        with self.finalize_lock:
+            pending_futures = self.finalize_futures
+            self.finalize_futures = []
+        return self.waitForOutputs(pending_futures)
+
+    # Waits for finalize jobs. If one failed the batch fails (stopped, error_message), so nothing records it as saved.
+    def waitForOutputs(self, finalize_futures):
+        wait(finalize_futures)
+        for future in finalize_futures:
+            if future.cancelled() or future.exception() is None:
+                continue
+            if self.error_message is None:
+                self.error_message = str(future.exception())
+                self.current_task_updated.emit(self.error_message)
+            self.stopConverting()
+            return False
+        return True
+
+    def fixMetadata(self, src):
         if src.endswith(".mp3"):
             try:
                 mutagen_data = MP3(src)
@@ -231,23 +1207,29 @@ class ConversionWorker(QObject):
 
                 mutagen_data.save()
             except Exception as e:
-                print(f"Error in copyFileAndFixMetadata: {type(e)} ({e})")
-        self.copyFile(src, dst)
+                print(f"Error in fixMetadata: {type(e)} ({e})")
 
     def getTempFile(self, extension):
         temp_file_path = None
         try:
             # Create a temporary file
-            temp_file_fd, temp_file_path = tempfile.mkstemp(suffix=extension)
+            temp_file_fd, temp_file_path = tempfile.mkstemp(suffix=extension, dir=self.scratch_dir)
             # Close the file descriptor as we won't be using it
             os.close(temp_file_fd)
-            return os.path.join(tempfile.tempdir, os.path.basename(temp_file_path))
+            return os.path.join(self.scratch_dir, os.path.basename(temp_file_path))
         except Exception as e:
             print(f"Failed getTempFile: {type(e)} ({e})")
         return None
 
 
+    # stops counting tmp_file as scratch space (it was deleted or moved away)
+    def forgetTempFile(self, tmp_file):
+        with self.scratch_lock:
+            if tmp_file in self.scratch_files:
+                self.scratch_bytes -= self.scratch_files.pop(tmp_file)
+
     def delTempFile(self, tmp_file):
+        self.forgetTempFile(tmp_file)
         if tmp_file is not None and tmp_file != "":
             try:
                 os.remove(tmp_file)
@@ -268,15 +1250,56 @@ class ConversionWorker(QObject):
 
     def getFileDuration(self, file):
         try:
-            if file.endswith('.mp3'):
-                return MP3(file).info.length
+            return self.probeFileDuration(file)
         except Exception as e:
             print(f"Failed getFileDuration: {type(e)} ({e})")
         return 1
 
+    # Reads the duration from the file headers (no decoding), raises AudioProbeError if the file is broken
+    def probeFileDuration(self, file):
+        duration = probeDuration(file)
+        if duration is None:
+            # format the header reader doesn't know
+            try:
+                duration = mutagen.File(file).info.length
+            except Exception:
+                audio_info = self.getAudioInfo(file)
+                if audio_info is not None:
+                    rate, _, samples = audio_info
+                    duration = samples / rate
+        if not duration:
+            raise AudioProbeError("unknown format")
+        return duration
+
+    # Probes all input files at once, remembers files that can't be read in self.unreadable_files
     def fetchFileDurations(self):
-        for inp_file in self.input_files:
-            self.file_durations.append(self.getFileDuration(inp_file))
+        def fetchFileDuration(inp_file):
+            cache_key = None
+            try:
+                if self.duration_cache is not None:
+                    cache_key = getFileKey(inp_file)
+                    cached_duration = self.duration_cache.get(cache_key)
+                    if cached_duration is not None:
+                        return cached_duration
+                duration = self.probeFileDuration(inp_file)
+            except AudioProbeError as e:
+                self.unreadable_files.append((inp_file, str(e)))
+                return 1
+            except Exception as e:
+                self.unreadable_files.append((inp_file, f"{type(e)} ({e})"))
+                return 1
+            if cache_key is not None:
+                self.duration_cache.put(cache_key, duration, save=False)
+            return duration
+
+        start_time = time.time()
+        with self.traceSpan("probe_durations", files=len(self.input_files)) as span:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.PROBE_WORKERS, len(self.input_files)))) as executor:
+                self.file_durations = list(executor.map(fetchFileDuration, self.input_files))
+            span.audio_sec = sum(self.file_durations)
+        if self.duration_cache is not None:
+            self.duration_cache.save()
+        print(f"Read durations of {len(self.input_files)} files in {time.time() - start_time:.2f} sec")
     
     def initEstimationMultiplier(self):
         # 11 min mp3 file stats:
@@ -297,35 +1320,94 @@ class ConversionWorker(QObject):
         # merge 1 hour total -> 35 sec
 
         num_merges = 0
-        curr_durations = []
-        for dur_idx, file_dur in enumerate(self.file_durations):
-            curr_durations.append(file_dur)
-            if dur_idx < len(self.file_durations) - 1:
-                next_dur = self.file_durations[dur_idx + 1]
-                curr_dur_sum = sum(curr_durations)
-
-                curr_chunk_diff = abs(curr_dur_sum - self.CHUNK_DURATION)
-                next_chunk_diff = abs(curr_dur_sum + next_dur - self.CHUNK_DURATION)
-
-                if (curr_dur_sum >= self.CHUNK_DURATION
-                or curr_chunk_diff <= next_chunk_diff
-                or next_dur > self.CHUNK_DURATION):
-                    if len(curr_durations) > 1:
-                        num_merges += 1
-                        curr_durations = []
-            else:
-                if len(curr_durations) > 1:
-                    num_merges += 1
+        if self.settings.save_as_60_min_chunks:
+            num_merges = len([chunk_group for chunk_group in self.planChunkGroups() if len(chunk_group) > 1])
         
-        self.estimated_merging_times =  num_merges * [35]
+        self.estimated_merging_times =  num_merges * [self.getEstimatedMergeTime()]
+
+    # estimated with the method the next merge is going to use (see isFrameMergePlanned)
+    def getEstimatedMergeTime(self):
+        merge_stage = "merge_frames" if self.isFrameMergePlanned() else "merge_sox"
+        measured_time = self.throughput_model.predict(self.getStageKey(merge_stage), self.CHUNK_DURATION)
+        if measured_time is not None:
+            return measured_time
+        if merge_stage == "merge_frames":
+            return 2 # just copying, depends on disk speed
+        return 35
 
     def initEstimatedTimes(self):
-        for file_dur in self.file_durations:
-            # time taken seems to be 2x normal estimate for 10h file
-            # so assume it linearly increases by 2x per 10h
-            self.estimated_times.append(self.estimation_base_multi * file_dur * (1.0 + (float(file_dur) / 36000.0)))
+        for index, file_dur in enumerate(self.file_durations):
+            # segments are rendered by separate sox calls, so the cost curve is per segment then
+            segmented = self.canRenderInSegments(index)
+            sox_call_dur = min(file_dur, self.getSegmentDuration(index)) if segmented else file_dur
+            estimated_time = self.predictFileTime(index, sox_call_dur, segmented)
+            if estimated_time is None:
+                # time taken seems to be 2x normal estimate for 10h file
+                # so assume it linearly increases by 2x per 10h
+                estimated_time = self.estimation_base_multi * file_dur * (1.0 + (float(sox_call_dur) / 36000.0))
+            self.estimated_times.append(estimated_time)
+
+    # Estimate from the throughput measured in earlier runs, None if a stage hasn't been measured with these settings yet
+    def predictFileTime(self, index, sox_call_dur, segmented=False):
+        file_dur = self.file_durations[index]
+        stages = []
+        if self.needsFullAnalysis(index):
+            stages.append("stat")
+        if self.settings.save_as_60_min_chunks and self.settings.streaming_chunks:
+            stages.append("stream")
+        else:
+            if not self.settings.single_pass and self.settings.noise:
+                stages.append("noise")
+            stages.append(self.getRenderStage(split=self.settings.save_as_60_min_chunks and file_dur > self.CHUNK_DURATION, segment=segmented))
+            if segmented and not self.settings.save_as_60_min_chunks:
+                stages.append("stitch")
+
+        estimated_time = 0
+        for stage in stages:
+            # the whole file is stitched at once
+            stage_dur = file_dur if stage in ["stitch", "stream"] else max(sox_call_dur, 1)
+            stage_time = self.throughput_model.predict(self.getStageKey(stage), stage_dur)
+            if stage_time is None:
+                return None
+            estimated_time += stage_time * file_dur / stage_dur
+        return estimated_time
+
+    # whether the estimate should include a "stat" pass over the whole of input file number index
+    def needsFullAnalysis(self, index):
+        if self.skipsAnalysisPass() or self.hasCachedAnalysis(self.input_files[index]):
+            return False
+        if self.settings.analysis_mode == "sampled":
+            # a few seconds, unless the file is too short to sample (or the windows don't agree, can't know that yet)
+            return self.file_durations[index] <= 2 * self.settings.analysis_windows * self.settings.analysis_window_sec
+        return True
+
+    def hasCachedAnalysis(self, source_file):
+        try:
+            return self.analysis_cache is not None and self.analysis_cache.contains(getFileKey(source_file))
+        except Exception:
+            return False
+
+    # the render stage name includes the settings that change how long it takes
+    def getRenderStage(self, split=False, segment=False):
+        render_mode = "segment" if segment else ("split" if split else "file")
+        passes = "single" if self.settings.single_pass else "multi"
+        stage = f"render|{render_mode}|{passes}|noise={int(self.settings.noise)}|compressor={int(self.settings.compressor)}"
+        if self.useNumpyEngine() and not segment:
+            stage += "|engine=numpy"
+        if self.skipsAnalysisPass():
+            stage += "|analysis=none"
+        if self.output_profile.name != DEFAULT_PROFILE_NAME:
+            stage += f"|profile={self.output_profile.name}"
+        return stage
+
+    # files converted at the same time share the CPU, so they are measured separately for every number of workers
+    def getStageKey(self, stage):
+        return f"{stage}|jobs={self.num_workers if self.parallel else 1}"
+
+    def recordStageTime(self, stage, audio_sec, wall_sec):
+        if audio_sec:
+            self.throughput_model.record(self.getStageKey(stage), audio_sec, wall_sec)
 
-    @pyqtSlot()
     def estimateRemainingTime(self, idx):
         # to adjust to slower/faster computers
         if self.time_started_last_file is not None and self.time_finished_last_file is not None and self.est_time_for_last_file is not None:
@@ -345,12 +1427,34 @@ class ConversionWorker(QObject):
 
 
     def updateTimeRemaining(self, time_passed):
-        new_time_remaining = max(0, self.time_remaining - time_passed)
-        if math.ceil(new_time_remaining) != math.ceil(self.time_remaining): # no more than 1 update per sec
-            self.time_remaining_updated.emit(math.floor(new_time_remaining))
-        self.time_remaining = new_time_remaining
+        with self.progress_lock:
+            if self.parallel:
+                # every running file reports its own time passed
+                time_passed /= self.num_workers
+            new_time_remaining = max(0, self.time_remaining - time_passed)
+            if math.ceil(new_time_remaining) != math.ceil(self.time_remaining): # no more than 1 update per sec
+                self.time_remaining_updated.emit(math.floor(new_time_remaining))
+            self.time_remaining = new_time_remaining
+
+    def updateFileProgress(self, progress, job_index=None):
+        if not self.parallel:
+            self.curr_file_progress_updated.emit(progress)
+            return
+        if job_index is None:
+            job_index = self.job_context.index
+        # progress of the whole batch, weighted by file duration
+        with self.progress_lock:
+            self.job_progress[job_index] = progress
+            total_duration = max(sum(self.file_durations), 1)
+            batch_progress = sum(self.getJobDuration(job) * job_progress for job, job_progress in self.job_progress.items()) / total_duration
+        self.curr_file_progress_updated.emit(int(batch_progress))
+
+    # a job is an input file index, or (input file index, segment number) when the file is rendered in segments
+    def getJobDuration(self, job_index):
+        if isinstance(job_index, tuple):
+            return self.segment_durations.get(job_index, 0)
+        return self.file_durations[job_index]
 
-    @pyqtSlot()
     def mergeFiles(self):
         if len(self.files_to_seq_merge) > 0:
             try:
@@ -361,24 +1465,34 @@ class ConversionWorker(QObject):
             self.current_task_updated.emit("Merging previous files...")
             try:
 
-                merged_fd, merged_path = tempfile.mkstemp(suffix=self.OUTPUT_EXTENSION) # Create a temporary file to store the output
+                merged_fd, merged_path = tempfile.mkstemp(suffix=self.output_profile.getRenderExtension(), dir=self.scratch_dir) # Create a temporary file to store the output
                 os.close(merged_fd) # Close the file descriptor as we won't be using it
 
-                merge_command = ['sox-14-4-2/sox']
-                for file_to_merge in self.files_to_seq_merge:
-                    merge_command.append(file_to_merge)
-                merge_command.append(merged_path)
-
-                self.process = subprocess.Popen(merge_command, startupinfo=self.startupinfo)
-                while not self.stopped and self.process.poll() is None:  # Check if the process is still running
-                    time.sleep(0.1)
-                    self.updateTimeRemaining(0.1)
+                with self.traceSpan("merge", files=len(self.files_to_seq_merge)) as span:
+                    span.audio_sec = self.total_dur_seq_merge
+                    span.bytes_read = sum(getFileBytes(file_to_merge) or 0 for file_to_merge in self.files_to_seq_merge)
+                    span.attributes["method"] = "frames"
+                    if not (self.canFrameMerge() and self.frameMergeFiles(merged_path)):
+                        span.attributes["method"] = "sox"
+                        merge_command = [self.SOX_PATH]
+                        for file_to_merge in self.files_to_seq_merge:
+                            merge_command.append(file_to_merge)
+                        merge_command.extend(self.getOutputArgs(merged_path))
+
+                        start_time = time.time()
+                        process = self.startProcess(merge_command)
+                        self.waitForProcess(process)
+                        span.exit_code = process.returncode
+                        if process.returncode == 0:
+                            self.recordStageTime("merge_sox", self.total_dur_seq_merge, time.time() - start_time)
+                    span.bytes_written = getFileBytes(merged_path)
                 # check if user wants to cancel before proceeding further
                 if self.stopped:
                     self.delTempFile(merged_path)
                     raise AliceStoppingException()
                 
-                self.copyFileAndFixMetadata(merged_path, self.merged_out_path) # copy temp output file to destination file
+                self.finalizeOutput(merged_path, self.merged_out_path) # move temp output file to destination file
+                merged_path = None
 
             except Exception as e:
                 print(f"Error encountered: {e}")
@@ -388,130 +1502,439 @@ class ConversionWorker(QObject):
 
         self.delTempChunkFiles()
 
-    def createTempNoiseFile(self, in_file, extension):
+    # merges are expected to join mp3 frames until one of them can't
+    def isFrameMergePlanned(self):
+        return self.settings.frame_merge and self.output_profile.getRenderExtension() == ".mp3" and not self.frame_join_failed
+
+    def canFrameMerge(self):
+        return self.isFrameMergePlanned() and all(file_to_merge.endswith(".mp3") for file_to_merge in self.files_to_seq_merge)
+
+    # Joins the mp3 frames directly, no decoding/re-encoding (falls back to sox if it returns False)
+    def frameMergeFiles(self, merged_path):
+        start_time = time.time()
+        try:
+            concatMp3Files(self.files_to_seq_merge, merged_path)
+            self.recordStageTime("merge_frames", self.total_dur_seq_merge, time.time() - start_time)
+            return True
+        except Mp3ConcatError as e:
+            print(f"Can't merge mp3 frames, merging with sox instead (for the rest of the batch too): {e}")
+            # the renders all come from the same encoder, so the other merges would fail the same way
+            self.frame_join_failed = True
+            self.estimated_merging_times = [self.getEstimatedMergeTime()] * len(self.estimated_merging_times)
+        except Exception as e:
+            print(f"Failed frameMergeFiles, merging with sox instead: {type(e)} ({e})")
+        finally:
+            self.updateTimeRemaining(time.time() - start_time)
+        return False
+
+    def createTempNoiseFile(self, in_file, extension, audio_sec=None):
         noise_path = self.getTempFile(extension)
 
         self.current_task_updated.emit("Generating noise...")
 
-        noise_command = ['sox-14-4-2/sox',in_file,noise_path,'synth','brownnoise','vol','0.05']
-        self.process = subprocess.Popen(noise_command, startupinfo=self.startupinfo)
-        while not self.stopped and self.process.poll() is None:  # Check if the process is still running
-            time.sleep(0.1)
-            self.updateTimeRemaining(0.1)
+        noise_command = [self.SOX_PATH,in_file,noise_path,'synth','brownnoise','vol','0.05']
+        start_time = time.time()
+        with self.traceSpan("noise") as span:
+            span.audio_sec = audio_sec
+            process = self.startProcess(noise_command)
+            self.waitForProcess(process)
+            span.exit_code = process.returncode
+            span.bytes_written = getFileBytes(noise_path)
         # check if user wants to cancel before proceeding further
         if self.stopped:
             self.delTempFile(noise_path)
             raise AliceStoppingException()
+        self.recordStageTime("noise", audio_sec, time.time() - start_time)
         
         return noise_path
 
     # Check if file has DC Offset and fix it (bad quality files like Wuthering Heights chapter 1)
-    def fixDCOffsetAndGetVolumeMulti(self, in_file, extension):
-        stats_command = ['sox-14-4-2/sox',in_file, '-n', 'stat']
-        self.process = subprocess.Popen(stats_command, stderr=subprocess.PIPE, text=True, encoding='utf-8', startupinfo=self.startupinfo)
-        while not self.stopped and self.process.poll() is None:  # Check if the process is still running
-            time.sleep(0.1)
-            self.updateTimeRemaining(0.1)
-        if self.stopped:
-            raise AliceStoppingException()
-        dc_offset = 0
-        vol_multi = 1
-        try:
-            for std_err_line in self.process.stderr.readlines():
-                if isinstance(std_err_line, str):
-                    if std_err_line.startswith("Mean") and "amplitude" in std_err_line:
-                        dc_offset = float(std_err_line.strip().split(":")[-1].strip())
-                    if std_err_line.startswith("Volume") and "adjustment" in std_err_line:
-                        vol_multi = float(std_err_line.strip().split(":")[-1].strip())
-        except Exception as e:
-            print(f"Error encountered: fixDCOffsetAndGetVolumeMulti :: reading/castng mean amplitude stat :: {e}")
+    def fixDCOffsetAndGetVolumeMulti(self, in_file, extension, source_file=None, audio_sec=None):
+        dc_offset, vol_multi = self.getDCOffsetAndVolumeMulti(in_file, source_file, audio_sec)
 
         # Check if dc offset is so large that we need to fix it
-        if round(dc_offset, 2) != 0.0:
+        if self.hasSignificantDCOffset(dc_offset):
             print(f"Found significant DC Offset of {dc_offset}, fixing...")
 
-            fixed_dc_fd, fixed_dc_path = tempfile.mkstemp(suffix=extension) # Create a temporary file to store the output
+            fixed_dc_fd, fixed_dc_path = tempfile.mkstemp(suffix=extension, dir=self.scratch_dir) # Create a temporary file to store the output
             os.close(fixed_dc_fd) # Close the file descriptor as we won't be using it
 
             self.current_task_updated.emit("Bad DC offset, fixing it... (takes extra time)")
 
-            fix_dc_command = ['sox-14-4-2/sox',in_file,fixed_dc_path, 'dcshift', f"{-dc_offset}"]
-            self.process = subprocess.Popen(fix_dc_command, startupinfo=self.startupinfo)
-            while not self.stopped and self.process.poll() is None:  # Check if the process is still running
-                time.sleep(0.1)
-                self.updateTimeRemaining(-0.1) # add to time est cus this wasnt included in estimate
+            fix_dc_command = [self.SOX_PATH, in_file,fixed_dc_path, 'dcshift', f"{-dc_offset}"]
+            start_time = time.time()
+            with self.traceSpan("dc_fix") as span:
+                span.audio_sec = audio_sec
+                span.bytes_read = getFileBytes(in_file)
+                process = self.startProcess(fix_dc_command)
+                self.waitForProcess(process, unestimated=True) # add to time est cus this wasnt included in estimate
+                span.exit_code = process.returncode
+                span.bytes_written = getFileBytes(fixed_dc_path)
             # check if user wants to cancel before proceeding further
             if self.stopped:
                 self.delTempFile(fixed_dc_path)
                 raise AliceStoppingException()
+            self.recordStageTime("dc_fix", audio_sec, time.time() - start_time)
             
             return fixed_dc_path, vol_multi
         
         return None, vol_multi
 
-    @pyqtSlot()
-    def applyTremolo(self, in_file, out_file, extension, split=False):
-        fixed_dc_path = None
-        noise_path = None
-        self.time_started_last_file = time.time()
+    # analysis_mode "none" only applies where the single pass input args are used (not the old multi pass way)
+    def skipsAnalysisPass(self):
+        streaming = self.settings.save_as_60_min_chunks and self.settings.streaming_chunks
+        return self.settings.analysis_mode == "none" and (self.settings.single_pass or streaming)
+
+    # (dc offset, volume multiplier) for getSinglePassInputArgs, (None, None) when there is no analysis pass:
+    # DC and level get fixed while rendering then (see getAdaptiveLevelEffects)
+    def getSinglePassAnalysis(self, in_file, source_file=None, audio_sec=None):
+        if self.settings.analysis_mode == "none":
+            return None, None
+        return self.getDCOffsetAndVolumeMulti(in_file, source_file, audio_sec)
+
+    # source_file is the original input file (in_file is a temp copy), used as the analysis cache key
+    # audio_sec is the length of in_file, for the throughput model
+    def getDCOffsetAndVolumeMulti(self, in_file, source_file=None, audio_sec=None):
+        cache_key = self.getAnalysisCacheKey(source_file)
+        cached_analysis = self.getCachedAnalysis(cache_key, source_file)
+        if cached_analysis is not None:
+            return cached_analysis
+
+        if self.settings.analysis_mode == "sampled":
+            sampled_analysis = self.runSampledStat(in_file)
+            if sampled_analysis is not None:
+                self.cacheAnalysis(cache_key, *sampled_analysis, sampled=True)
+                return sampled_analysis
+
+        dc_offset, vol_multi, succeeded = self.runStat(in_file, audio_sec=audio_sec)
+        if succeeded:
+            self.cacheAnalysis(cache_key, dc_offset, vol_multi)
+        return dc_offset, vol_multi
+
+    def getAnalysisCacheKey(self, source_file):
+        if self.analysis_cache is None or source_file is None:
+            return None
         try:
-            fixed_dc_path, vol_multi = self.fixDCOffsetAndGetVolumeMulti(in_file, extension)
-            if fixed_dc_path != None:
-                in_file = fixed_dc_path
-
-            if (self.settings.noise):
-                noise_path = self.createTempNoiseFile(in_file, extension)
-
-            self.current_task_updated.emit("Applying effects...")
+            return getFileKey(source_file)
+        except Exception as e:
+            print(f"Failed reading analysis cache: {type(e)} ({e})")
+        return None
 
-            # puzzle together command based on settings
-            sox_command = ['sox-14-4-2/sox', '-S']
-            if self.settings.noise:
-                sox_command.append('-m')
-                sox_command.append(noise_path)
-            sox_command.extend(['-v', str(vol_multi), in_file])
-            sox_command.extend([
-                '-c', '2',
-                out_file
-            ])
-            if split: # SPLIT
-                sox_command.extend(['trim', '0', f"{self.CHUNK_DURATION}"])
-            sox_command.extend(['rate', '-v', '44100'])
-            if self.settings.compressor:
-                # sox_command.extend(['compand', '0.01,0.5', '-35,-20,0,-1', '0', '-20', '0.5'])
-                sox_command.extend(['compand', '0.01,1', '-30,-10,0,-1', '-1', '0', '0.02'])
-            sox_command.extend(['gain', '-1'])
-            sox_command.extend(['tremolo', str(self.settings.frequency), '100'])
-            if split: # SPLIT
-                sox_command.extend([':', 'newfile', ':', 'restart'])
+    # returns (dc offset, volume multiplier) or None
+    def getCachedAnalysis(self, cache_key, source_file):
+        if cache_key is None:
+            return None
+        cached_analysis = self.analysis_cache.get(cache_key)
+        if cached_analysis is None:
+            return None
+        if cached_analysis.get("sampled", False) and self.settings.analysis_mode == "full":
+            return None # only an estimate, analyse the whole file this time
+        print(f"Using cached analysis for {os.path.basename(source_file)}")
+        return cached_analysis["dc_offset"], cached_analysis["vol_multi"]
+
+    # sampled: estimated from windows (runSampledStat), not used when analysing whole files
+    def cacheAnalysis(self, cache_key, dc_offset, vol_multi, sampled=False):
+        if cache_key is not None:
+            self.analysis_cache.put(cache_key, {"dc_offset": dc_offset, "vol_multi": vol_multi, "sampled": sampled})
+
+    # "stat" of windows spread over in_file (trim first, so sox seeks to them), a few at a time.
+    # Returns (dc offset, volume multiplier), or None if the file is too short to sample or the windows disagree
+    def runSampledStat(self, in_file, audio_info=None):
+        if audio_info is None:
+            audio_info = self.getAudioInfo(in_file)
+        if audio_info is None:
+            return None
+        rate, _, samples = audio_info
+        windows = planAnalysisWindows(samples, self.settings.analysis_windows, round(self.settings.analysis_window_sec * rate))
+        if windows is None:
+            return None
+
+        self.current_task_updated.emit("Analyzing samples...")
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.ANALYSIS_WINDOW_WORKERS, len(windows))) as executor:
+            window_results = list(executor.map(
+                lambda window: self.runStat(in_file, ['trim', f"{window[0]}s", f"{window[1]}s"]), windows))
+        if not all(succeeded for _, _, succeeded in window_results):
+            return None
+        analysis = estimateFromWindows([(dc_offset, vol_multi) for dc_offset, vol_multi, _ in window_results])
+        if analysis is None:
+            print(f"Sampled analysis of {os.path.basename(in_file)} isn't conclusive, analysing the whole file")
+        else:
+            print(f"Sampled analysis of {len(windows)} windows in {time.time() - start_time:.1f} sec")
+        return analysis
+
+    # sox "stat" of in_file (effects can trim it first), returns (dc offset, volume multiplier, True if the stats were read)
+    def runStat(self, in_file, effects=[], audio_sec=None):
+        stats_command = [self.SOX_PATH, in_file, '-n'] + effects + ['stat']
+        start_time = time.time()
+        with self.traceSpan("stat", window=len(effects) > 0) as span:
+            span.audio_sec = audio_sec
+            if len(effects) == 0:
+                span.bytes_read = getFileBytes(in_file)
+            process = self.startProcess(stats_command, capture_stderr=True)
+            self.waitForProcess(process)
+            span.exit_code = process.returncode
+        if self.stopped:
+            raise AliceStoppingException()
+        if process.returncode == 0:
+            self.recordStageTime("stat", audio_sec, time.time() - start_time)
+        dc_offset = 0
+        vol_multi = 1
+        try:
+            for std_err_line in process.stderr_lines:
+                if isinstance(std_err_line, str):
+                    if std_err_line.startswith("Mean") and "amplitude" in std_err_line:
+                        dc_offset = float(std_err_line.strip().split(":")[-1].strip())
+                    if std_err_line.startswith("Volume") and "adjustment" in std_err_line:
+                        vol_multi = float(std_err_line.strip().split(":")[-1].strip())
+        except Exception as e:
+            print(f"Error encountered: runStat :: reading/castng mean amplitude stat :: {e}")
+            return dc_offset, vol_multi, False
+        return dc_offset, vol_multi, process.returncode == 0
+
+    def hasSignificantDCOffset(self, dc_offset):
+        return round(dc_offset, 2) != 0.0
+
+    # Reads rate, channels and length in samples from the file header (no decoding)
+    def getAudioInfo(self, in_file):
+        rate = None
+        channels = None
+        samples = None
+        try:
+            info_command = [self.SOX_PATH, '--i', in_file]
+            result = subprocess.run(info_command, capture_output=True, text=True, encoding='utf-8', startupinfo=self.startupinfo)
+            for info_line in result.stdout.splitlines():
+                key, _, value = info_line.partition(":")
+                key = key.strip()
+                if key == "Channels":
+                    channels = int(value.strip())
+                elif key == "Sample Rate":
+                    rate = int(float(value.strip()))
+                elif key == "Duration":
+                    samples_match = re.search(r"=\s*(\d+)\s+samples", value)
+                    if samples_match:
+                        samples = int(samples_match.group(1))
+        except Exception as e:
+            print(f"Failed getAudioInfo: {type(e)} ({e})")
+
+        if rate is None or channels is None or not samples:
+            return None
+        return rate, channels, samples
+
+    # sox input that reads the output of another sox call (sox runs it through the shell)
+    # the relative sox path is kept (sox can't handle non-ANSI characters, e.g. in the install folder),
+    # normpath only swaps the slash on Windows so the shell doesn't read it as a switch
+    def soxPipeInput(self, sox_args):
+        return "|" + subprocess.list2cmdline([os.path.normpath(self.SOX_PATH)] + sox_args)
+
+    # segment is a TimeSegment when rendering part of a file (see renderSegmentJob)
+    def getEffectsChain(self, split=False, segment=None):
+        effects = []
+        if split: # SPLIT
+            effects.extend(['trim', '0', f"{self.CHUNK_DURATION}"])
+        effects.extend(self.getOutputFormatEffects())
+        if self.settings.compressor:
+            # effects.extend(['compand', '0.01,0.5', '-35,-20,0,-1', '0', '-20', '0.5'])
+            effects.extend(['compand', '0.01,1', '-30,-10,0,-1', '-1', '0', '0.02'])
+        effects.extend(['gain', '-1'])
+        if segment is None:
+            effects.extend(['tremolo', str(self.settings.frequency), '100'])
+        else:
+            # drop the padding, then start the tremolo where it would be at this point of the whole file
+            effects.extend(['trim', f"{segment.out_pre_roll}s", f"{segment.out_length}s"])
+            tremolo_phase = getTremoloPhase(self.settings.frequency, segment.getOutStartSec())
+            effects.extend(['synth', 'sine', 'fmod', str(self.settings.frequency), '50', f"{tremolo_phase:.6f}"])
+        if split: # SPLIT
+            effects.extend([':', 'newfile', ':', 'restart'])
+        return effects
+
+    # Output file with the channels and mp3 settings of the output profile
+    # (flac for profiles encoded by ffmpeg, those only get their channels here)
+    def getOutputArgs(self, out_file):
+        output_args = ['-c', str(self.output_profile.channels)]
+        if self.output_profile.mp3_compression is not None and out_file.endswith(".mp3"):
+            output_args.extend(['-C', str(self.output_profile.mp3_compression)])
+        output_args.append(out_file)
+        return output_args
+
+    # Downmixing to mono comes first so every later effect (and the encoder) has half the samples,
+    # from_rate: skip the rate effect if the audio already has the output rate
+    def getOutputFormatEffects(self, from_rate=None):
+        effects = []
+        if self.output_profile.channels == 1:
+            effects.extend(['channels', '1'])
+        if from_rate != self.output_profile.rate:
+            effects.extend(['rate', '-v', str(self.output_profile.rate)])
+        return effects
+
+    # Old way: DC fix and noise are rendered to their own temp files before the main pass
+    def buildMultiPassCommand(self, in_file, out_file, noise_path, vol_multi, split=False):
+        sox_command = [self.SOX_PATH, '-S']
+        if noise_path is not None:
+            sox_command.append('-m')
+            sox_command.append(noise_path)
+        sox_command.extend(['-v', str(vol_multi), in_file])
+        sox_command.extend(self.getOutputArgs(out_file))
+        sox_command.extend(self.getEffectsChain(split))
+        return sox_command
+
+    # Input is decoded once: noise is synthesized in a piped sox call and mixed in,
+    # DC offset is removed with dcshift in the same effects chain
+    def buildSinglePassCommand(self, in_file, out_file, dc_offset, vol_multi, audio_info, split=False):
+        sox_command = [self.SOX_PATH, '-S']
+        sox_command.extend(self.getSinglePassInputArgs(in_file, vol_multi, audio_info))
+        sox_command.extend(self.getOutputArgs(out_file))
+        sox_command.extend(self.getDCShiftEffect(dc_offset, vol_multi))
+        sox_command.extend(self.getEffectsChain(split))
+        return sox_command
+
+    # the input file, mixed with noise of the same length if noise is enabled
+    # in_file_type_args go before in_file (e.g. ['-t', 'sox'] for a piped input)
+    # vol_multi None: not analysed, the input is piped through getAdaptiveLevelEffects first
+    def getSinglePassInputArgs(self, in_file, vol_multi, audio_info, in_file_type_args=[]):
+        rate, channels, samples = audio_info
+        input_args = []
+        if self.settings.noise:
+            input_args.append('-m')
+        # input file first so its metadata gets copied to the output
+        if vol_multi is None:
+            # level is set before the noise is mixed in, -v 1 so -m doesn't halve it (same as with -v vol_multi)
+            adaptive_input = self.soxPipeInput(in_file_type_args + [in_file, '-p'] + self.getAdaptiveLevelEffects())
+            input_args.extend(['-v', '1', '-t', 'sox', adaptive_input])
+        else:
+            input_args.extend(['-v', str(vol_multi)] + in_file_type_args + [in_file])
+        if self.settings.noise:
+            noise_args = ['-n', '-r', str(rate), '-c', str(channels), '-p', 'synth', f"{samples}s", 'brownnoise', 'vol', '0.05']
+            # -m scales inputs without -v by 1/2, so 0.5 keeps the same noise level as the old noise file
+            input_args.extend(['-v', '0.5', '-t', 'sox', self.soxPipeInput(noise_args)])
+        return input_args
+
+    def useNumpyEngine(self):
+        return self.settings.dsp_engine == "numpy" and self.settings.single_pass and dsp_engine.isAvailable()
+
+    # Same output as buildSinglePassCommand, but sox only decodes (-v, rate) and encodes,
+    # the effects in between run in dsp_engine.NumpyEffectChain. Returns the encoder command and its stdin feeder.
+    def buildNumpyRender(self, in_file, out_file, dc_offset, vol_multi, audio_info, comment_path=None, split=False):
+        _, channels, _ = audio_info
+        decode_command = [self.SOX_PATH]
+        if vol_multi is not None:
+            decode_command.extend(['-v', str(vol_multi)])
+        decode_command.append(in_file)
+        decode_command.extend(self.STREAM_FORMAT_ARGS + ['-'])
+        decode_command.extend(['rate', '-v', str(self.PROCESSING_RATE), 'channels', '2'])
+
+        encode_command = [self.SOX_PATH, '-S']
+        encode_command.extend(self.STREAM_FORMAT_ARGS + ['-'])
+        if comment_path is not None:
+            encode_command.extend(['--comment-file', comment_path])
+        encode_command.extend(self.getOutputArgs(out_file))
+        encode_command.extend(self.getOutputFormatEffects(self.PROCESSING_RATE))
+        if split: # SPLIT, same as getEffectsChain
+            encode_command.extend(['trim', '0', f"{self.CHUNK_DURATION}", ':', 'newfile', ':', 'restart'])
+
+        dc_shift = 0.0
+        if dc_offset is not None and self.hasSignificantDCOffset(dc_offset):
+            print(f"Found significant DC Offset of {dc_offset}, fixing in effects chain...")
+            dc_shift = -dc_offset * vol_multi
+        effect_chain = dsp_engine.NumpyEffectChain(self.PROCESSING_RATE, self.settings.frequency, self.settings.compressor,
+            self.settings.noise, dc_shift, noise_channels=min(channels, 2), adaptive_level=vol_multi is None)
+
+        def feedEncoder(encoder):
+            self.pumpThroughEffectChain(decode_command, encoder, effect_chain)
+        return encode_command, feedEncoder
+
+    # Runs on its own thread: decoder stdout -> effect chain -> encoder stdin, a block at a time
+    def pumpThroughEffectChain(self, decode_command, encoder, effect_chain):
+        try:
+            decoder = self.startProcess(decode_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            while True:
+                buffer = decoder.stdout.read(effect_chain.block_bytes)
+                if not buffer:
+                    break
+                encoder.stdin.write(effect_chain.process(buffer))
+            encoder.stdin.write(effect_chain.flush())
+            decoder.wait()
+            if self.stopped or decoder.returncode != 0:
+                raise Exception(f"Decoding failed ({decoder.returncode})")
+        except Exception as e:
+            if not self.stopped:
+                print(f"Failed pumpThroughEffectChain: {type(e)} ({e})")
+                self.stopConverting()
+        finally:
+            try:
+                encoder.stdin.close()
+            except Exception:
+                pass
 
-            
-            self.curr_file_progress_updated.emit(0)
+    # The encoder of the numpy engine only gets raw audio, so the input's tags are passed in a file
+    # (sox copies them from the input file otherwise). Returns None if there are none.
+    def writeCommentFile(self, in_file):
+        try:
+            result = subprocess.run([self.SOX_PATH, '--i', '-a', in_file], capture_output=True, startupinfo=self.startupinfo)
+            if result.returncode != 0 or not result.stdout.strip():
+                return None
+            comment_path = self.getTempFile(".txt")
+            with open(comment_path, "wb") as f:
+                f.write(result.stdout)
+            return comment_path
+        except Exception as e:
+            print(f"Failed writeCommentFile: {type(e)} ({e})")
+        return None
 
-            fake_progress_started_time = None
-            fake_progress = 0
+    # No analysis pass: DC-blocking highpass, then compand as a look-ahead limiter that also brings quieter parts up
+    # (a streaming stand-in for -v and dcshift, see dsp_engine for the numbers)
+    def getAdaptiveLevelEffects(self):
+        transfer_points = ",".join(f"{in_db},{out_db}" for in_db, out_db in dsp_engine.getNormalizerPoints())
+        return [
+            'highpass', '-1', str(dsp_engine.DC_BLOCK_HZ),
+            'compand', f"{dsp_engine.NORMALIZE_ATTACK_SEC},{dsp_engine.NORMALIZE_RELEASE_SEC}", transfer_points,
+            '0', str(dsp_engine.NORMALIZE_INITIAL_DB), str(dsp_engine.NORMALIZE_LOOKAHEAD_SEC),
+        ]
+
+    def getDCShiftEffect(self, dc_offset, vol_multi):
+        if dc_offset is None:
+            return []
+        if self.hasSignificantDCOffset(dc_offset):
+            print(f"Found significant DC Offset of {dc_offset}, fixing in effects chain...")
+            # -v is applied while reading so the offset got scaled by it
+            return ['dcshift', f"{-dc_offset * vol_multi}"]
+        return []
+
+    # With split, on_chunk_ready(chunk_path) is called for every 60 min part that is complete while sox
+    # is still working on the next one (chunk_tracker of out_file); the parts left at the end are the caller's
+    def applyTremolo(self, in_file, out_file, extension, split=False, source_file=None, chunk_tracker=None, on_chunk_ready=None):
+        fixed_dc_path = None
+        noise_path = None
+        comment_path = None
+        self.time_started_last_file = time.time()
+        job_index = getattr(self.job_context, "index", None)
+        audio_sec = self.getJobDuration(job_index) if job_index is not None else None
+        try:
+            audio_info = None
+            if self.settings.single_pass:
+                audio_info = self.getAudioInfo(in_file)
+
+            feeder = None
+            if audio_info is not None:
+                dc_offset, vol_multi = self.getSinglePassAnalysis(in_file, source_file, audio_sec)
+                if self.useNumpyEngine():
+                    comment_path = self.writeCommentFile(in_file)
+                    sox_command, feeder = self.buildNumpyRender(in_file, out_file, dc_offset, vol_multi, audio_info, comment_path, split)
+                else:
+                    sox_command = self.buildSinglePassCommand(in_file, out_file, dc_offset, vol_multi, audio_info, split)
+            else:
+                fixed_dc_path, vol_multi = self.fixDCOffsetAndGetVolumeMulti(in_file, extension, source_file, audio_sec)
+                if fixed_dc_path != None:
+                    in_file = fixed_dc_path
 
-            self.process = subprocess.Popen(sox_command, stderr=subprocess.PIPE, text=True, encoding='utf-8', startupinfo=self.startupinfo)
-            while not self.stopped and self.process.poll() is None:  # Check if the process is still running
-                start_time = time.time()
+                if (self.settings.noise):
+                    noise_path = self.createTempNoiseFile(in_file, extension, audio_sec)
 
-                std_output = self.process.stderr.readline() # Read lines from stdout (blocking until something is ready)
-                if std_output:  # Check if the line is not empty
-                    progress = self.parseProgress(std_output)  # Parse the progress information
-                    if progress is not None:  # Check if progress is valid
-                        if progress >= 90: # (stuck at 100% (multiplied by 0.9 in parseProgress))
-                            if fake_progress_started_time is None:
-                                fake_progress_started_time = int(time.time())
-                            if (int(time.time()) - fake_progress_started_time) % 3 == 0:
-                                fake_progress += 1 # Show a lil movement on the progress bar every 3 sec
-                        else:
-                            fake_progress = progress
-                        self.curr_file_progress_updated.emit(min(fake_progress, 99))  # Emit signal with progress value
-                
-                time_elapsed = time.time() - start_time
-                self.updateTimeRemaining(time_elapsed)
+                sox_command = self.buildMultiPassCommand(in_file, out_file, noise_path, vol_multi, split)
 
-            self.curr_file_progress_updated.emit(99)
+            self.current_task_updated.emit("Applying effects...")
+            self.runRenderCommand(sox_command, self.getRenderStage(split=split), feeder, in_file, None if split else out_file,
+                chunk_tracker=chunk_tracker, on_chunk_ready=on_chunk_ready)
 
         except Exception as e:
             print(f"Error encountered: {e}")
@@ -522,27 +1945,102 @@ class ConversionWorker(QObject):
                 self.delTempFile(noise_path)
             if fixed_dc_path is not None:
                 self.delTempFile(fixed_dc_path)
+            if comment_path is not None:
+                self.delTempFile(comment_path)
         
         self.time_finished_last_file = time.time()
         
         self.current_task_updated.emit("Finishing file...")
 
+    # Runs the main sox pass and reports its progress for the current job
+    # feeder(process) runs on its own thread and writes the input to the process' stdin (numpy engine)
+    # in_file and out_file are only used for the bytes read and written in the trace
+    # chunk_tracker is checked whenever the wait wakes up, on_chunk_ready(chunk_path) gets the completed parts
+    def runRenderCommand(self, sox_command, stage, feeder=None, in_file=None, out_file=None, chunk_tracker=None, on_chunk_ready=None):
+        self.updateFileProgress(0)
+
+        job_index = getattr(self.job_context, "index", None)
+        duration = self.getJobDuration(job_index) if job_index is not None else None
+        rate_limiter = ProgressRateLimiter()
+        def onRenderOutput(std_output):
+            # runs on the stderr reader thread
+            self.handleRenderOutput(std_output, rate_limiter, job_index, duration)
+
+        chunks_ready_early = []
+        def onWake():
+            for chunk_path in chunk_tracker.popReadyChunks():
+                chunks_ready_early.append(chunk_path)
+                on_chunk_ready(chunk_path)
+
+        start_time = time.time()
+        popen_kwargs = {}
+        if feeder is not None:
+            popen_kwargs["stdin"] = subprocess.PIPE
+        with self.traceSpan("render", stage=stage) as span:
+            span.audio_sec = duration
+            span.bytes_read = getFileBytes(in_file)
+            process = self.startProcess(sox_command, on_stderr_line=onRenderOutput, **popen_kwargs)
+            feeder_thread = None
+            if feeder is not None:
+                feeder_thread = threading.Thread(target=feeder, args=(process,), daemon=True)
+                feeder_thread.start()
+            self.waitForProcess(process, on_wake=onWake if chunk_tracker is not None else None)
+            if feeder_thread is not None:
+                feeder_thread.join()
+            span.exit_code = process.returncode
+            span.bytes_written = getFileBytes(out_file)
+            if chunk_tracker is not None:
+                span.attributes["chunks_ready_early"] = len(chunks_ready_early)
+        if process.returncode == 0:
+            self.recordStageTime(stage, duration, time.time() - start_time)
+
+        self.updateFileProgress(99)
+        return process
+
+    def handleRenderOutput(self, std_output, rate_limiter, job_index, duration=None):
+        sox_progress = parseSoxStatus(std_output)
+        if sox_progress is None:
+            return
+        percent = sox_progress.percent
+        if (percent is None or percent == 0) and duration:
+            # sox doesn't know the length (piped input), use the position instead
+            percent = sox_progress.elapsed_sec / duration * 100
+        if percent is None:
+            return
+        # 100% only once sox has exited and the file is done
+        progress = min(int(percent), 99)
+        if rate_limiter.shouldSend(progress):
+            self.updateFileProgress(progress, job_index)
+
+    # the process' CPU time, memory and disk I/O are counted for the stage (span) that started it
+    def startProcess(self, command, **kwargs):
+        process = self.supervisor.start(command, **kwargs)
+        if process is None or self.stopped:
+            raise AliceStoppingException()
+        current_span = self.tracer.getCurrentSpan()
+        if current_span is not None:
+            current_span.attachProcess(process)
+        return process
+
+    # Sleeps until the process exits, waking up once a second to update the time remaining (and call on_wake)
+    def waitForProcess(self, process, unestimated=False, on_wake=None):
+        last_time = time.time()
+        while not self.stopped:
+            exited = process.wait(1.0)
+            curr_time = time.time()
+            time_passed = curr_time - last_time
+            self.updateTimeRemaining(-time_passed if unestimated else time_passed)
+            last_time = curr_time
+            if exited:
+                break
+            if on_wake is not None:
+                on_wake()
+
+    # Doesn't block: sox processes get terminated and reaped by their waiter threads
     def stopConverting(self):
         self.stopped = True  # Set the flag to stop processing
-        if self.process is not None:
-            self.process.terminate()
-            self.process.wait()
-            self.process = None
+        self.supervisor.terminateAll()
 
     def generateDestinationPath(self, filename):
-        destination_path = os.path.join(self.settings.output_folder, f"{filename}(Converted).mp3")
+        destination_path = os.path.join(self.settings.output_folder, f"{filename}(Converted){self.output_profile.extension}")
         return destination_path
-
-    def parseProgress(self, std_output: str):
-        if std_output.startswith("In:") and len(std_output) > 7:
-            try:
-                return int(float(std_output[3:7].replace("%", "")) * 0.9)
-            except Exception as e:
-                print(f"Error encountered: parseProgress :: {e}")
-        return None
-
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from persistent_cache import getFileKey
+
+
+class ConversionJournal():
+    """Write-ahead journal of one batch (same input files + same settings), so a stopped or crashed batch can resume.
+    Rendered files are moved into the journal's dir (it isn't deleted on exit like the temp dir) before they
+    are recorded, and every record is fsynced, so whatever the journal says is there is on disk.
+
+    Records (one JSON object per line):
+      rendered:      input file index was rendered to outputs (split parts not saved yet)
+      finished_file: the split parts are saved, tmp is what is left for the chunk group
+      group_done:    every output of chunk group number group is saved, its files aren't needed anymore"""
+
+    JOURNAL_FILE_NAME = "journal.jsonl"
+    MAX_AGE_DAYS = 7
+
+    def __init__(self, journal_dir):
+        self.journal_dir = journal_dir
+        self.journal_path = os.path.join(journal_dir, self.JOURNAL_FILE_NAME)
+        self.rendered = {} # input index -> (split, [outputs])
+        self.finished_files = {} # input index -> (tmp, output file, merged output path)
+        self.done_groups = set()
+        os.makedirs(journal_dir, exist_ok=True)
+        self.load()
+
+    # root_dir is next to the disk temp files (scratch_space.getJournalRootDir), so keepFiles renames (copies from a RAM disk)
+    @classmethod
+    def openForBatch(cls, root_dir, input_files, settings_values):
+        removeStaleJournals(root_dir, cls.MAX_AGE_DAYS)
+        return cls(os.path.join(root_dir, getBatchKey(input_files, settings_values)))
+
+    def load(self):
+        try:
+            with open(self.journal_path, "rb") as f:
+                journal_lines = f.readlines()
+        except FileNotFoundError:
+            return
+        good_bytes = 0
+        for journal_line in journal_lines:
+            try:
+                if not journal_line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                record = json.loads(journal_line.decode("utf-8"))
+            except ValueError:
+                # torn write at the end (crashed while appending), everything before it is fine
+                # cut it off so new records don't get appended to the broken line
+                with open(self.journal_path, "rb+") as f:
+                    f.truncate(good_bytes)
+                break
+            good_bytes += len(journal_line)
+            record_type = record.get("type")
+            if record_type == "rendered":
+                if all(os.path.isfile(output) for output in record["outputs"]):
+                    self.rendered[record["index"]] = (record["split"], record["outputs"])
+            elif record_type == "finished_file":
+                if os.path.isfile(record["tmp"]):
+                    self.finished_files[record["index"]] = (record["tmp"], record["output_file"], record["merged_out_path"])
+            elif record_type == "group_done":
+                self.done_groups.add(record["group"])
+
+    def hasProgress(self):
+        return len(self.rendered) > 0 or len(self.finished_files) > 0 or len(self.done_groups) > 0
+
+    def append(self, record):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # moves files into the journal dir (fsynced), returns their new paths
+    def keepFiles(self, paths):
+        kept_paths = []
+        for path in paths:
+            kept_path = path
+            if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.journal_dir):
+                kept_path = os.path.join(self.journal_dir, os.path.basename(path))
+                try:
+                    os.replace(path, kept_path)
+                except OSError:
+                    shutil.move(path, kept_path) # temp dir on another drive
+            with open(kept_path, "rb+") as f:
+                os.fsync(f.fileno())
+            kept_paths.append(kept_path)
+        return kept_paths
+
+    def isKeptFile(self, path):
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.journal_dir)
+
+    def recordRendered(self, index, split, outputs):
+        self.rendered[index] = (split, outputs)
+        self.append({"type": "rendered", "index": index, "split": split, "outputs": outputs})
+
+    def recordFinishedFile(self, index, tmp, output_file, merged_out_path):
+        self.finished_files[index] = (tmp, output_file, merged_out_path)
+        self.append({"type": "finished_file", "index": index, "tmp": tmp, "output_file": output_file, "merged_out_path": merged_out_path})
+
+    def recordGroupDone(self, group):
+        self.done_groups.add(group)
+        self.append({"type": "group_done", "group": group})
+
+    # the batch is done (or stopped before anything was recorded), nothing to resume
+    def remove(self):
+        shutil.rmtree(self.journal_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.journal_dir)) # the root too once no other batch has a journal
+        except OSError:
+            pass
+
+
+# same input files (path, size, mtime) and same settings -> same key
+def getBatchKey(input_files, settings_values):
+    batch_description = json.dumps({
+        "files": [getFileKey(input_file) for input_file in input_files],
+        "settings": settings_values,
+    }, sort_keys=True)
+    return hashlib.sha1(batch_description.encode("utf-8")).hexdigest()
+
+
+# journals of batches that were never resumed
+def removeStaleJournals(root_dir, max_age_days):
+    if not os.path.isdir(root_dir):
+        return
+    oldest_time = time.time() - max_age_days * 24 * 60 * 60
+    for journal_dir_name in os.listdir(root_dir):
+        journal_dir = os.path.join(root_dir, journal_dir_name)
+        try:
+            if os.path.isdir(journal_dir) and os.path.getmtime(journal_dir) < oldest_time:
+                print(f"Removing old conversion journal {journal_dir}")
+                shutil.rmtree(journal_dir, ignore_errors=True)
+        except OSError:
+            pass
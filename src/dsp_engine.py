@@ -0,0 +1,236 @@
+import math
+
+# numpy is optional, without it every file is rendered by sox
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# raw audio between the sox decoder/encoder and the effect chain (same as ConversionWorker.STREAM_FORMAT_ARGS)
+SAMPLE_SCALE = 2.0 ** 31
+CHANNELS = 2
+
+# Without an analysis pass (analysis_mode "none") DC is removed by a highpass at DC_BLOCK_HZ and a look-ahead
+# limiter keeps the peaks at NORMALIZE_CEILING_DB, raising quieter parts by up to NORMALIZE_MAX_GAIN_DB.
+# The gain follows the peaks of the last NORMALIZE_RELEASE_SEC or so. Used by both engines.
+DC_BLOCK_HZ = 5
+NORMALIZE_CEILING_DB = -1
+NORMALIZE_MAX_GAIN_DB = 24
+NORMALIZE_ATTACK_SEC = 0.001
+NORMALIZE_RELEASE_SEC = 10
+NORMALIZE_LOOKAHEAD_SEC = 0.005
+NORMALIZE_INITIAL_DB = -90 # starts at max gain, the look-ahead catches the first peaks
+
+
+# transfer function of the normalizing limiter as (in dB, out dB) points
+def getNormalizerPoints():
+    return [
+        (-90, -90 + NORMALIZE_MAX_GAIN_DB),
+        (NORMALIZE_CEILING_DB - NORMALIZE_MAX_GAIN_DB, NORMALIZE_CEILING_DB),
+        (0, NORMALIZE_CEILING_DB),
+    ]
+
+
+def isAvailable():
+    return np is not None
+
+
+class BrownNoise():
+    """Random walk with steps in [-1/16, 1/16) kept within [-1, 1], like sox synth brownnoise (times amplitude).
+    sox rejects steps that would leave the range, here the walk is folded back instead (same spectrum)."""
+
+    STEP = 1 / 16
+
+    def __init__(self, channels, amplitude, seed=None):
+        self.channels = channels
+        self.amplitude = amplitude
+        self.rng = np.random.default_rng(seed)
+        self.last = np.zeros(channels)
+
+    def generate(self, num_frames):
+        if num_frames == 0:
+            return np.zeros((0, self.channels))
+        steps = self.rng.uniform(-self.STEP, self.STEP, (num_frames, self.channels))
+        walk = self.last + np.cumsum(steps, axis=0)
+        # fold into [-1, 1]: period 4, mirrored
+        walk = np.mod(walk + 1, 4)
+        walk = np.where(walk > 2, 4 - walk, walk) - 1
+        self.last = walk[-1].copy()
+        return walk * self.amplitude
+
+
+class Compander():
+    """sox compand with one attack/decay pair for all channels: follows the loudest channel,
+    gain from the transfer function (points in dB), output delayed by delay_sec so the gain can react first.
+    The envelope is followed per hop of HOP_FRAMES (peak of the hop) instead of per sample, that keeps the
+    python loop short and is well below the attack time. Below the first point the gain of the first point is used."""
+
+    HOP_FRAMES = 128
+
+    def __init__(self, rate, attack_sec, decay_sec, points_db, gain_db=0.0, initial_db=0.0, delay_sec=0.0):
+        self.attack = self.getHopCoefficient(rate, attack_sec)
+        self.decay = self.getHopCoefficient(rate, decay_sec)
+        self.points_in = np.array([in_db for in_db, _ in points_db], dtype=np.float64)
+        self.points_out = np.array([out_db for _, out_db in points_db], dtype=np.float64) + gain_db
+        self.volume = 10 ** (initial_db / 20)
+        self.last_gain = self.getGain(np.array([self.volume]))[0]
+        self.delay_frames = int(round(delay_sec * rate))
+        self.delayed = np.zeros((0, CHANNELS))
+
+    # sox uses 1 - exp(-1 / (rate * time)) per sample, this is the same over a whole hop
+    def getHopCoefficient(self, rate, time_sec):
+        if time_sec <= 1 / rate:
+            return 1.0
+        return 1.0 - math.exp(-self.HOP_FRAMES / (rate * time_sec))
+
+    def getGain(self, volumes):
+        in_db = 20 * np.log10(np.maximum(volumes, 1e-10))
+        out_db = np.interp(in_db, self.points_in, self.points_out)
+        # slope 1 outside the points (same gain as the nearest point)
+        out_db = np.where(in_db < self.points_in[0], in_db + self.points_out[0] - self.points_in[0], out_db)
+        out_db = np.where(in_db > self.points_in[-1], in_db + self.points_out[-1] - self.points_in[-1], out_db)
+        return 10 ** ((out_db - in_db) / 20)
+
+    def process(self, block):
+        num_frames = len(block)
+        if num_frames == 0:
+            return block
+        levels = np.max(np.abs(block), axis=1)
+        hop_starts = np.arange(0, num_frames, self.HOP_FRAMES)
+        hop_peaks = np.maximum.reduceat(levels, hop_starts)
+
+        hop_volumes = np.empty(len(hop_peaks))
+        volume = self.volume
+        attack = self.attack
+        decay = self.decay
+        for hop_idx, peak in enumerate(hop_peaks.tolist()):
+            volume += (peak - volume) * (attack if peak > volume else decay)
+            hop_volumes[hop_idx] = volume
+        self.volume = volume
+
+        # gain changes smoothly from the end of the previous hop to the end of this one
+        hop_ends = np.minimum(hop_starts + self.HOP_FRAMES, num_frames) - 1
+        hop_gains = self.getGain(hop_volumes)
+        gains = np.interp(np.arange(num_frames), np.concatenate(([-1], hop_ends)), np.concatenate(([self.last_gain], hop_gains)))
+        self.last_gain = hop_gains[-1]
+
+        # the gain of sample t is applied to sample t - delay_frames (sox doesn't output anything for the first delay)
+        delayed = np.concatenate((self.delayed, block))
+        num_out = max(0, len(delayed) - self.delay_frames)
+        out = delayed[:num_out] * gains[num_frames - num_out:, None]
+        self.delayed = delayed[num_out:]
+        return out
+
+    # what is still in the delay line, with the last gain (like sox at the end of the file)
+    def flush(self):
+        out = self.delayed * self.last_gain
+        self.delayed = np.zeros((0, CHANNELS))
+        return out
+
+
+class Tremolo():
+    """sox tremolo speed depth: the volume follows a sine that starts at full volume (start_sec moves the start)."""
+
+    def __init__(self, rate, frequency, depth=100, start_sec=0.0):
+        self.phase_step = frequency / rate
+        self.depth = depth / 100
+        self.phase = math.fmod(frequency * start_sec, 1.0) # in periods, kept in [0, 1) so it doesn't lose precision
+
+    def process(self, block):
+        num_frames = len(block)
+        phases = self.phase + np.arange(num_frames) * self.phase_step
+        self.phase = math.fmod(self.phase + num_frames * self.phase_step, 1.0)
+        gains = 1 - self.depth * 0.5 * (1 - np.cos(2 * np.pi * phases))
+        return block * gains[:, None]
+
+
+class DCBlocker():
+    """Streaming DC removal: one pole highpass y[n] = x[n] - x[n-1] + r * y[n-1].
+    The recursion is solved in closed form per sub-block, short enough that r ** -n stays precise."""
+
+    SUB_BLOCK_FRAMES = 2048
+
+    def __init__(self, rate, cutoff_hz=DC_BLOCK_HZ):
+        self.r = math.exp(-2 * math.pi * cutoff_hz / rate)
+        self.last_in = np.zeros(CHANNELS)
+        self.last_out = np.zeros(CHANNELS)
+        powers = self.r ** np.arange(1, self.SUB_BLOCK_FRAMES + 1)
+        self.powers = powers[:, None] # r ** (n + 1)
+        self.inverse_powers = 1 / self.powers
+
+    def process(self, block):
+        out = np.empty_like(block)
+        for start in range(0, len(block), self.SUB_BLOCK_FRAMES):
+            sub_block = block[start:start + self.SUB_BLOCK_FRAMES]
+            num_frames = len(sub_block)
+            diffs = np.diff(sub_block, axis=0, prepend=self.last_in[None, :])
+            # y[n] = r ** (n + 1) * y[-1] + sum over k <= n of r ** (n - k) * d[k]
+            powers = self.powers[:num_frames]
+            out[start:start + num_frames] = powers * (self.last_out + np.cumsum(diffs * self.inverse_powers[:num_frames], axis=0))
+            self.last_in = sub_block[-1].copy()
+            self.last_out = out[start + num_frames - 1].copy()
+        return out
+
+
+class NumpyEffectChain():
+    """The single pass sox effects after decoding (ConversionWorker.buildSinglePassCommand) on raw stereo int32 blocks:
+    dcshift, noise mix, compand, gain -1, tremolo. Decoding, -v and rate -v are left to the sox decoder.
+    With adaptive_level (no analysis pass) a DCBlocker and the normalizing limiter replace dcshift and -v.
+    Memory use is a block (plus the compander delays) no matter how long the file is."""
+
+    BLOCK_FRAMES = 65536
+    NOISE_AMPLITUDE = 0.05 * 0.5 # synth brownnoise vol 0.05, mixed in with -v 0.5
+
+    def __init__(self, rate, frequency, compressor=True, noise=True, dc_shift=0.0, noise_channels=CHANNELS, start_sec=0.0, noise_seed=None, adaptive_level=False):
+        self.block_bytes = self.BLOCK_FRAMES * CHANNELS * 4
+        self.dc_shift = dc_shift
+        self.dc_blocker = None
+        self.normalizer = None
+        if adaptive_level:
+            self.dc_blocker = DCBlocker(rate)
+            self.normalizer = Compander(rate, NORMALIZE_ATTACK_SEC, NORMALIZE_RELEASE_SEC, getNormalizerPoints(),
+                initial_db=NORMALIZE_INITIAL_DB, delay_sec=NORMALIZE_LOOKAHEAD_SEC)
+        self.noise = BrownNoise(noise_channels, self.NOISE_AMPLITUDE, noise_seed) if noise else None
+        self.compander = None
+        if compressor:
+            # compand 0.01,1 -30,-10,0,-1 -1 0 0.02
+            self.compander = Compander(rate, 0.01, 1.0, [(-30, -10), (0, -1)], gain_db=-1, initial_db=0, delay_sec=0.02)
+        self.gain = 10 ** (-1 / 20)
+        self.tremolo = Tremolo(rate, frequency, 100, start_sec)
+
+    # raw int32 frames in, raw int32 frames out (fewer at the start while the compander delay fills up)
+    def process(self, buffer):
+        block = np.frombuffer(buffer, dtype=np.int32).reshape(-1, CHANNELS) / SAMPLE_SCALE
+        if self.dc_blocker is not None:
+            block = self.dc_blocker.process(block)
+        block = block + self.dc_shift
+        if self.normalizer is not None:
+            block = self.normalizer.process(block)
+        return self.applyMixedEffects(block)
+
+    # the rest of the compander delay lines, call once after the last block
+    def flush(self):
+        out = b""
+        if self.normalizer is not None:
+            out += self.applyMixedEffects(self.normalizer.flush())
+        if self.compander is not None:
+            out += self.applyOutputEffects(self.compander.flush())
+        return out
+
+    # noise is mixed in after the level is set, like sox -m with the -v'd input
+    def applyMixedEffects(self, block):
+        if self.noise is not None:
+            # mono noise for mono inputs, sox makes both channels the same
+            block = block + self.noise.generate(len(block))
+        block = np.clip(block, -1.0, 1.0)
+        if self.compander is not None:
+            block = self.compander.process(block)
+        return self.applyOutputEffects(block)
+
+    def applyOutputEffects(self, block):
+        block = self.tremolo.process(block * self.gain)
+        return toRawFrames(block)
+
+
+def toRawFrames(block):
+    return np.round(np.clip(block * SAMPLE_SCALE, -SAMPLE_SCALE, SAMPLE_SCALE - 1)).astype(np.int32).tobytes()
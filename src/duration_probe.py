@@ -0,0 +1,288 @@
+import os
+import struct
+from mp3_concat import Mp3FrameHeader, Mp3ConcatError, getId3v2Size, isFrameSync, scanMp3File
+
+# Reads the duration of an audio file from its headers, without decoding any audio.
+# probeDuration returns None for formats it doesn't know and raises AudioProbeError for broken files.
+
+HEAD_SIZE = 64 * 1024 # enough for ID3v2 tags without pictures, the first frames and most headers
+OGG_TAIL_SIZE = 64 * 1024 # the last Ogg page is at most ~64 KB
+MP3_SYNC_SEARCH_SIZE = 4096 # the first frame is usually right after the ID3v2 tag
+MP3_MIN_FRAME_RUN = 4 # consecutive valid frames needed to believe it's MPEG audio (random bytes have false syncs)
+MP3_MAX_FRAME_SIZE = 2881 # layer II/III at 8 kHz and 160 kbps / 320 kbps MPEG1 at 32 kHz with padding
+
+
+class AudioProbeError(Exception):
+    pass
+
+
+def probeDuration(path):
+    file_size = os.path.getsize(path)
+    if file_size == 0:
+        raise AudioProbeError("file is empty")
+    with open(path, "rb") as f:
+        head = f.read(HEAD_SIZE)
+        try:
+            duration = probeHeaders(path, f, head, file_size)
+        except struct.error:
+            raise AudioProbeError("truncated header")
+
+    if duration is not None and duration <= 0:
+        raise AudioProbeError("no audio")
+    return duration
+
+
+def probeHeaders(path, f, head, file_size):
+    if head[:4] in (b"RIFF", b"RF64") and head[8:12] == b"WAVE":
+        return probeWav(f, file_size)
+    elif head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return probeAiff(f, file_size)
+    elif head[4:8] == b"ftyp":
+        return probeMp4(f, file_size)
+    elif head[:4] == b"OggS":
+        return probeOgg(f, head, file_size)
+    elif head[getId3v2Size(head):][:4] == b"fLaC": # FLAC can start with an ID3v2 tag too
+        return probeFlac(f, getId3v2Size(head))
+    elif head[:3] == b"ID3" or (len(head) > 1 and isFrameSync(head, 0)) or path.lower().endswith(".mp3"):
+        return probeMp3(path, f, head, file_size)
+    return None
+
+
+# RIFF chunks: 4 byte id, 4 byte little endian size, data padded to an even size
+def iterRiffChunks(f, start, end, big_endian=False):
+    size_format = ">I" if big_endian else "<I"
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id = chunk_header[:4]
+        chunk_size = struct.unpack(size_format, chunk_header[4:])[0]
+        yield chunk_id, pos + 8, chunk_size
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+
+def probeWav(f, file_size):
+    byte_rate = None
+    data_size = None
+    ds64_data_size = None
+    for chunk_id, data_pos, chunk_size in iterRiffChunks(f, 12, file_size):
+        if chunk_id == b"ds64": # RF64: the real sizes are here, the RIFF sizes are 0xFFFFFFFF
+            f.seek(data_pos)
+            ds64_data_size = struct.unpack("<QQ", f.read(16))[1]
+        elif chunk_id == b"fmt ":
+            f.seek(data_pos)
+            fmt = f.read(16)
+            if len(fmt) < 16:
+                raise AudioProbeError("truncated fmt chunk")
+            byte_rate = struct.unpack("<I", fmt[8:12])[0]
+        elif chunk_id == b"data":
+            data_size = chunk_size
+            if ds64_data_size is not None and chunk_size == 0xFFFFFFFF:
+                data_size = ds64_data_size
+            available_size = file_size - data_pos
+            if data_size > available_size:
+                # sox reads what's there (or the size was never filled in by a streaming writer)
+                if data_size != 0xFFFFFFFF:
+                    print(f"WAV data chunk is {data_size - available_size} bytes shorter than its header says")
+                data_size = available_size
+            break
+
+    if byte_rate is None:
+        raise AudioProbeError("no fmt chunk")
+    if data_size is None:
+        raise AudioProbeError("no data chunk")
+    if byte_rate == 0:
+        raise AudioProbeError("byte rate is 0")
+    return data_size / byte_rate
+
+
+# 80 bit IEEE 754 extended precision float (AIFF sample rate)
+def readExtendedFloat(data):
+    exponent = struct.unpack(">H", data[:2])[0]
+    mantissa = struct.unpack(">Q", data[2:10])[0]
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+def probeAiff(f, file_size):
+    for chunk_id, data_pos, chunk_size in iterRiffChunks(f, 12, file_size, big_endian=True):
+        if chunk_id == b"COMM":
+            f.seek(data_pos)
+            comm = f.read(18)
+            if len(comm) < 18:
+                raise AudioProbeError("truncated COMM chunk")
+            num_frames = struct.unpack(">I", comm[2:6])[0]
+            sample_rate = readExtendedFloat(comm[8:18])
+            if sample_rate <= 0:
+                raise AudioProbeError("sample rate is 0")
+            return num_frames / sample_rate
+    raise AudioProbeError("no COMM chunk")
+
+
+def probeFlac(f, start):
+    f.seek(start + 4)
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        raise AudioProbeError("STREAMINFO is not the first metadata block")
+    stream_info = f.read(34)
+    if len(stream_info) < 34:
+        raise AudioProbeError("truncated STREAMINFO")
+    # 20 bits sample rate, 3 bits channels, 5 bits bits per sample, 36 bits total samples
+    packed = int.from_bytes(stream_info[10:18], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    if sample_rate == 0:
+        raise AudioProbeError("sample rate is 0")
+    if total_samples == 0:
+        return None # the encoder didn't know the length
+    return total_samples / sample_rate
+
+
+# MP4 boxes: 4 byte big endian size (1 = 64 bit size follows, 0 = until the end), 4 byte type
+def iterMp4Boxes(f, start, end):
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        box_header = f.read(8)
+        if len(box_header) < 8:
+            break
+        box_size, box_type = struct.unpack(">I4s", box_header)
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header_size:
+            raise AudioProbeError(f"invalid {box_type!r} box size")
+        yield box_type, pos + header_size, min(pos + box_size, end)
+        pos += box_size
+
+
+def probeMp4(f, file_size):
+    for box_type, moov_start, moov_end in iterMp4Boxes(f, 0, file_size):
+        if box_type != b"moov":
+            continue # mdat gets skipped over, not read
+        for child_type, mvhd_start, _ in iterMp4Boxes(f, moov_start, moov_end):
+            if child_type != b"mvhd":
+                continue
+            f.seek(mvhd_start)
+            version_and_flags = f.read(4)
+            if len(version_and_flags) < 4:
+                raise AudioProbeError("truncated mvhd box")
+            if version_and_flags[0] == 1:
+                timescale, duration = struct.unpack(">IQ", f.read(28)[16:28])
+            else:
+                timescale, duration = struct.unpack(">II", f.read(16)[8:16])
+            if timescale == 0:
+                raise AudioProbeError("mvhd timescale is 0")
+            return duration / timescale
+        raise AudioProbeError("no mvhd box")
+    raise AudioProbeError("no moov box (file is incomplete)")
+
+
+def probeOgg(f, head, file_size):
+    # the first page has the codec's identification header
+    if len(head) < 28:
+        raise AudioProbeError("truncated Ogg page")
+    num_segments = head[26]
+    serial = head[14:18]
+    packet = head[27 + num_segments:]
+    pre_skip = 0
+    if packet[:7] == b"\x01vorbis":
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+    elif packet[:8] == b"OpusHead":
+        sample_rate = 48000 # opus granule positions are always 48 kHz
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+    else:
+        return None
+    if sample_rate == 0:
+        raise AudioProbeError("sample rate is 0")
+
+    # the granule position of the last page is the number of samples in the stream
+    f.seek(max(0, file_size - OGG_TAIL_SIZE))
+    tail = f.read()
+    page_pos = tail.rfind(b"OggS")
+    while page_pos != -1:
+        page_header = tail[page_pos:page_pos + 27]
+        if len(page_header) == 27 and page_header[14:18] == serial:
+            granule_position = struct.unpack("<q", page_header[6:14])[0]
+            if granule_position >= 0:
+                return max(0, granule_position - pre_skip) / sample_rate
+        page_pos = tail.rfind(b"OggS", 0, page_pos)
+    raise AudioProbeError("no complete Ogg page at the end (file is truncated)")
+
+
+def probeMp3(path, f, head, file_size):
+    audio_start = getId3v2Size(head)
+    # tags with pictures are often bigger than the head, the frames after them are read from the file
+    window_size = MP3_SYNC_SEARCH_SIZE + (MP3_MIN_FRAME_RUN + 1) * MP3_MAX_FRAME_SIZE
+    if audio_start + window_size <= len(head) or len(head) == file_size:
+        window = head[audio_start:audio_start + window_size]
+    else:
+        f.seek(audio_start)
+        window = f.read(window_size)
+    reaches_end = audio_start + len(window) >= file_size
+
+    for frame_pos in range(0, min(len(window) - 4, MP3_SYNC_SEARCH_SIZE) + 1):
+        if not isFrameSync(window, frame_pos):
+            continue
+        try:
+            header = Mp3FrameHeader(window[frame_pos:frame_pos + 4])
+        except ValueError:
+            continue
+        if not hasFrameRun(window, frame_pos, header, reaches_end):
+            continue
+        num_frames = readVbrFrameCount(window, frame_pos, header)
+        if num_frames is not None:
+            return num_frames * header.getSamplesPerFrame() / header.sample_rate
+        break
+    else:
+        raise AudioProbeError("no MPEG audio frames at the start of the file")
+
+    # no Xing/VBRI header: count the frames (reads the file but doesn't decode it)
+    try:
+        info = scanMp3File(path)
+    except Mp3ConcatError as e:
+        raise AudioProbeError(str(e))
+    return len(info.frame_sizes) * info.first_header.getSamplesPerFrame() / info.first_header.sample_rate
+
+
+# True if MP3_MIN_FRAME_RUN frames follow each other from frame_pos (fewer if the file ends after them)
+def hasFrameRun(window, frame_pos, first_header, reaches_end):
+    pos = frame_pos
+    for _ in range(MP3_MIN_FRAME_RUN):
+        if not isFrameSync(window, pos):
+            return False
+        try:
+            header = Mp3FrameHeader(window[pos:pos + 4])
+        except ValueError:
+            return False
+        if not header.isCompatible(first_header):
+            return False
+        pos += header.frame_size
+        if pos + 4 > len(window):
+            # a short file: its frames have to end at the end of the file (or at an ID3v1/APE tag)
+            return reaches_end and (pos == len(window) or window[pos:pos + 3] in (b"TAG", b"APE"))
+        if window[pos:pos + 3] in (b"TAG", b"APE") and reaches_end:
+            return True
+    return True
+
+
+# number of audio frames from a Xing/Info or VBRI header, None if the frame doesn't have one
+def readVbrFrameCount(head, frame_pos, header):
+    xing_pos = frame_pos + header.getXingOffset()
+    if head[xing_pos:xing_pos + 4] in (b"Xing", b"Info") and len(head) >= xing_pos + 12:
+        flags = struct.unpack(">I", head[xing_pos + 4:xing_pos + 8])[0]
+        if flags & 1:
+            return struct.unpack(">I", head[xing_pos + 8:xing_pos + 12])[0]
+        return None
+    vbri_pos = frame_pos + 36
+    if head[vbri_pos:vbri_pos + 4] == b"VBRI" and len(head) >= vbri_pos + 18:
+        return struct.unpack(">I", head[vbri_pos + 14:vbri_pos + 18])[0]
+    return None
@@ -0,0 +1,104 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from scratch_space import setUpScratchDir
+from alice_settings import AliceSettings
+from conversion import ConversionWorker
+import dsp_engine
+
+# Renders the same synthesized file with both DSP engines and compares speed and output, e.g.
+#   python src/engine_benchmark.py --duration 1200
+# Noise is off by default so the outputs can be compared (it's random), --noise only compares speed.
+
+ENGINES = ("sox", "numpy")
+
+
+# speech-like test file: a slowly sweeping tone with pauses, plus some DC offset (sox -R is repeatable)
+def synthFixture(path, duration):
+    synth_command = [ConversionWorker.SOX_PATH, '-R', '-n', '-r', '44100', '-c', '2', path,
+        'synth', str(duration), 'sine', '150-900', 'sine', '220-440',
+        'tremolo', '0.3', '90', 'vol', '0.6', 'dcshift', '0.02']
+    subprocess.run(synth_command, check=True)
+
+
+def renderWithEngine(engine, input_file, output_folder, noise):
+    os.makedirs(output_folder, exist_ok=True)
+    settings = AliceSettings(output_folder=output_folder, noise=noise, save_as_60_min_chunks=False,
+        max_parallel_jobs=1, analysis_cache_size=0, resumable_batches=False, dsp_engine=engine)
+    worker = ConversionWorker([input_file], settings)
+    start_time = time.time()
+    worker.convertFiles()
+    wall_sec = time.time() - start_time
+    if worker.stopped or worker.error_message is not None:
+        raise Exception(f"{engine} render failed")
+    filename, _ = os.path.splitext(os.path.basename(input_file))
+    return worker.generateDestinationPath(filename), wall_sec
+
+
+def decodeSamples(path):
+    decode_command = [ConversionWorker.SOX_PATH, path] + ConversionWorker.STREAM_FORMAT_ARGS + ['-']
+    result = subprocess.run(decode_command, capture_output=True, check=True)
+    return dsp_engine.np.frombuffer(result.stdout, dtype=dsp_engine.np.int32).reshape(-1, 2) / dsp_engine.SAMPLE_SCALE
+
+
+# difference of the numpy engine's output to the sox output, in dB relative to the sox output
+def compareOutputs(sox_path, numpy_path):
+    np = dsp_engine.np
+    sox_samples = decodeSamples(sox_path)
+    numpy_samples = decodeSamples(numpy_path)
+    num_frames = min(len(sox_samples), len(numpy_samples))
+    difference = sox_samples[:num_frames] - numpy_samples[:num_frames]
+    signal_rms = max(np.sqrt(np.mean(sox_samples[:num_frames] ** 2)), 1e-12)
+    difference_rms = max(np.sqrt(np.mean(difference ** 2)), 1e-12)
+    return {
+        "length_difference_frames": len(sox_samples) - len(numpy_samples),
+        "difference_db": 20 * np.log10(difference_rms / signal_rms),
+        "max_difference": float(np.max(np.abs(difference))),
+    }
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(prog="engine-benchmark", description="Compare the sox and numpy DSP engines.")
+    parser.add_argument("--duration", type=float, default=600, help="length of the test file in seconds")
+    parser.add_argument("--input", help="use this file instead of a synthesized one")
+    parser.add_argument("--noise", action="store_true", help="add noise (outputs can't be compared then)")
+    parser.add_argument("--tolerance-db", type=float, default=-30,
+        help="fail if the outputs differ by more than this, relative to the sox output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    if not dsp_engine.isAvailable():
+        print("numpy isn't installed (pip install -r requirements-optional.txt)", file=sys.stderr)
+        return 2
+    temp_dir = setUpScratchDir()
+    output_dir = tempfile.mkdtemp(prefix="engine_benchmark_", dir=temp_dir)
+
+    input_file = args.input
+    if input_file is None:
+        input_file = os.path.join(output_dir, "fixture.wav")
+        synthFixture(input_file, args.duration)
+    duration = ConversionWorker([input_file], AliceSettings(analysis_cache_size=0)).probeFileDuration(input_file)
+
+    output_paths = {}
+    for engine in ENGINES:
+        output_paths[engine], wall_sec = renderWithEngine(engine, input_file, os.path.join(output_dir, engine), args.noise)
+        print(f"{engine:>6}: {wall_sec:.1f} sec, {duration / wall_sec:.1f}x realtime")
+
+    if args.noise:
+        return 0
+    comparison = compareOutputs(output_paths["sox"], output_paths["numpy"])
+    print(f"numpy output differs by {comparison['difference_db']:.1f} dB (max {comparison['max_difference']:.4f}, "
+        f"length differs by {comparison['length_difference_frames']} frames)")
+    if comparison["difference_db"] > args.tolerance_db:
+        print(f"More than the tolerance of {args.tolerance_db} dB", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import os
+import time
+
+
+class FolderWatcher():
+    """Finds audio files dropped into a folder (or its subfolders) once they are fully written.
+    Polls instead of using OS notifications so it works the same on Windows and on network shares.
+    A dropped batch is every new file in one folder: it's handed out once none of them has changed
+    (size, mtime, or new files showing up) for stable_seconds and all of them can be opened."""
+
+    def __init__(self, root, extensions, is_known_file, stable_seconds=10, ignore_dirs=()):
+        self.root = os.path.abspath(root)
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.is_known_file = is_known_file # (path, size, mtime_ns) -> True if it was queued before
+        self.stable_seconds = stable_seconds
+        self.ignore_dirs = set(os.path.abspath(ignore_dir) for ignore_dir in ignore_dirs)
+
+        self.pending = {} # dir -> {path: (size, mtime_ns)}
+        self.last_change = {} # dir -> time.monotonic() of the last change in it
+        self.known_files = set() # (path, size, mtime_ns) already queued, saves asking is_known_file every scan
+
+    # returns [(dir, [(path, size, mtime_ns), ...]), ...] for every batch that is ready, files sorted by name
+    def scan(self):
+        curr_time = time.monotonic()
+        seen_paths = set()
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            dir_names[:] = sorted(dir_name for dir_name in dir_names if not dir_name.startswith(".")
+                and os.path.abspath(os.path.join(dir_path, dir_name)) not in self.ignore_dirs)
+            for file_name in file_names:
+                if file_name.startswith(".") or not file_name.lower().endswith(self.extensions):
+                    continue
+                path = os.path.abspath(os.path.join(dir_path, file_name))
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    continue # deleted while scanning
+                file_state = (stat_result.st_size, stat_result.st_mtime_ns)
+                seen_paths.add(path)
+                dir_files = self.pending.get(dir_path, {})
+                if dir_files.get(path) == file_state:
+                    continue # not changed since the last scan
+                if path not in dir_files and self.isKnownFile(path, *file_state):
+                    continue
+                self.pending.setdefault(dir_path, {})[path] = file_state
+                self.last_change[dir_path] = curr_time
+
+        ready_batches = []
+        for dir_path, dir_files in list(self.pending.items()):
+            for path in [path for path in dir_files if path not in seen_paths]:
+                del dir_files[path] # deleted or renamed before it was queued
+                self.last_change[dir_path] = curr_time
+            if len(dir_files) == 0:
+                del self.pending[dir_path]
+                continue
+            if curr_time - self.last_change[dir_path] < self.stable_seconds:
+                continue
+            if not all(self.canOpen(path) for path in dir_files):
+                # still locked by whatever is writing it (Windows)
+                self.last_change[dir_path] = curr_time
+                continue
+            batch_files = [(path, size, mtime_ns) for path, (size, mtime_ns) in sorted(dir_files.items())]
+            self.known_files.update(batch_files)
+            ready_batches.append((dir_path, batch_files))
+            del self.pending[dir_path]
+        return ready_batches
+
+    def isKnownFile(self, path, size, mtime_ns):
+        if (path, size, mtime_ns) in self.known_files:
+            return True
+        if self.is_known_file(path, size, mtime_ns):
+            self.known_files.add((path, size, mtime_ns))
+            return True
+        return False
+
+    def canOpen(self, path):
+        try:
+            with open(path, "rb"):
+                return True
+        except OSError:
+            return False
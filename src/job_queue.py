@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+
+# States of a batch, its files share it
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue():
+    """Batches of input files waiting to be converted, in an sqlite file so nothing is lost if the watcher stops.
+    A file is known by path + size + mtime, so a file that gets replaced is queued again."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL") # commits survive crashes without blocking readers
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_dir TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                batch_id INTEGER NOT NULL REFERENCES batches(id),
+                position INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                PRIMARY KEY (batch_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS files_by_path ON files (path, size, mtime_ns);
+            CREATE INDEX IF NOT EXISTS batches_by_state ON batches (state, id);
+        """)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    # True if this version of the file was queued before (whatever happened to it)
+    def isKnownFile(self, path, size, mtime_ns):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM files WHERE path = ? AND size = ? AND mtime_ns = ? LIMIT 1",
+                (path, size, mtime_ns)).fetchone()
+        return row is not None
+
+    # files is a list of (path, size, mtime_ns) in conversion order, returns the batch id
+    def addBatch(self, source_dir, files):
+        curr_time = time.time()
+        with self.lock:
+            with self.transaction():
+                cursor = self.connection.execute(
+                    "INSERT INTO batches (source_dir, state, created, updated) VALUES (?, ?, ?, ?)",
+                    (source_dir, QUEUED, curr_time, curr_time))
+                batch_id = cursor.lastrowid
+                self.connection.executemany(
+                    "INSERT INTO files (batch_id, position, path, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                    [(batch_id, position, path, size, mtime_ns) for position, (path, size, mtime_ns) in enumerate(files)])
+        return batch_id
+
+    # marks the oldest queued batch as running, returns (batch id, source dir, [paths]) or None
+    def claimNextBatch(self):
+        with self.lock:
+            with self.transaction():
+                row = self.connection.execute(
+                    "SELECT id, source_dir FROM batches WHERE state = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+                if row is None:
+                    return None
+                batch_id, source_dir = row
+                self.connection.execute(
+                    "UPDATE batches SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (RUNNING, time.time(), batch_id))
+                paths = [path for (path,) in self.connection.execute(
+                    "SELECT path FROM files WHERE batch_id = ? ORDER BY position", (batch_id,))]
+        return batch_id, source_dir, paths
+
+    def finishBatch(self, batch_id, error=None):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE batches SET state = ?, error = ?, updated = ? WHERE id = ?",
+                (FAILED if error is not None else DONE, error, time.time(), batch_id))
+
+    # puts a running batch back in the queue (the watcher was stopped while converting it)
+    def requeueBatch(self, batch_id):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE batches SET state = ?, updated = ? WHERE id = ? AND state = ?",
+                (QUEUED, time.time(), batch_id, RUNNING))
+
+    # batches that were running when the watcher crashed get converted again, returns how many
+    def requeueInterrupted(self):
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE batches SET state = ?, updated = ? WHERE state = ?", (QUEUED, time.time(), RUNNING))
+        return cursor.rowcount
+
+    def getStateCounts(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT state, COUNT(*) FROM batches GROUP BY state").fetchall()
+        return dict(rows)
+
+    def transaction(self):
+        return Transaction(self.connection)
+
+
+class Transaction():
+    """BEGIN/COMMIT around a with block (ROLLBACK if it raises), the connection is in autocommit mode otherwise."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        return False
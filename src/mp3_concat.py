@@ -0,0 +1,345 @@
+import mmap
+import os
+import struct
+
+# Joins MP3 files by copying their frames (no decoding/re-encoding).
+# The per-file ID3/Xing/LAME headers are dropped and one new Xing/LAME header frame is written for the whole file.
+# Encoder delay and padding at the joins would be heard as gaps, so the frames that hold only delay/padding
+# are dropped; files whose delay/padding doesn't fill whole frames can't be joined this way (Mp3ConcatError).
+
+# [version][layer] -> kbps by bitrate index, version: 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5, layer: 3 = I, 2 = II, 1 = III
+BITRATES_V1 = {
+    3: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+}
+BITRATES_V2 = {
+    3: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    1: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+XING_TAG_SIZE = 120 # "Xing"/"Info" + flags + frames + bytes + TOC + quality
+LAME_TAG_SIZE = 36
+LAME_CRC_RANGE = 190 # the LAME tag CRC covers this many bytes from the start of the frame
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class Mp3ConcatError(Exception):
+    pass
+
+
+class Mp3FrameHeader():
+    def __init__(self, header_bytes):
+        b1, b2, b3 = header_bytes[1], header_bytes[2], header_bytes[3]
+        self.version = (b1 >> 3) & 3
+        self.layer = (b1 >> 1) & 3
+        self.has_crc = (b1 & 1) == 0
+        self.bitrate_idx = b2 >> 4
+        self.sample_rate_idx = (b2 >> 2) & 3
+        self.padding = (b2 >> 1) & 1
+        self.channel_mode = b3 >> 6
+        self.raw = bytes(header_bytes[:4])
+
+        if (self.version == 1 or self.layer == 0
+        or self.bitrate_idx in (0, 15) or self.sample_rate_idx == 3):
+            raise ValueError("not a valid frame header")
+
+        self.sample_rate = SAMPLE_RATES[self.version][self.sample_rate_idx]
+        self.bitrate = getBitrate(self.version, self.layer, self.bitrate_idx)
+        self.frame_size = getFrameSize(self.version, self.layer, self.bitrate, self.sample_rate, self.padding)
+
+    def isCompatible(self, other):
+        return (self.version == other.version and self.layer == other.layer
+        and self.sample_rate == other.sample_rate and (self.channel_mode == 3) == (other.channel_mode == 3))
+
+    def getSamplesPerFrame(self):
+        if self.layer == 3:
+            return 384
+        if self.layer == 1 and self.version != 3:
+            return 576
+        return 1152
+
+    # where the Xing/Info tag starts in a layer III frame
+    def getXingOffset(self):
+        if self.version == 3:
+            side_info_size = 17 if self.channel_mode == 3 else 32
+        else:
+            side_info_size = 9 if self.channel_mode == 3 else 17
+        return 4 + side_info_size
+
+
+class Mp3FileInfo():
+    def __init__(self, path):
+        self.path = path
+        self.id3v2 = b""
+        self.id3v1 = b""
+        self.audio_start = 0
+        self.audio_end = 0
+        self.first_header = None
+        self.frame_sizes = []
+        self.bitrates = set()
+        self.lame_tag = None
+        self.encoder_delay = None
+        self.encoder_padding = None
+        self.skip_start_frames = 0 # frames of encoder delay / padding that are left out when joining
+        self.skip_end_frames = 0
+
+    def getKeptFrameSizes(self):
+        return self.frame_sizes[self.skip_start_frames:len(self.frame_sizes) - self.skip_end_frames]
+
+    # byte range of the kept frames
+    def getKeptAudioRange(self):
+        start = self.audio_start + sum(self.frame_sizes[:self.skip_start_frames])
+        end = self.audio_end - sum(self.frame_sizes[len(self.frame_sizes) - self.skip_end_frames:])
+        return start, end
+
+
+def getBitrate(version, layer, bitrate_idx):
+    table = BITRATES_V1 if version == 3 else BITRATES_V2
+    return table[layer][bitrate_idx] * 1000
+
+
+def getFrameSize(version, layer, bitrate, sample_rate, padding):
+    if layer == 3: # layer I
+        return (12 * bitrate // sample_rate + padding) * 4
+    if layer == 1 and version != 3: # layer III, MPEG2/2.5
+        return 72 * bitrate // sample_rate + padding
+    return 144 * bitrate // sample_rate + padding
+
+
+def isFrameSync(data, pos):
+    return data[pos] == 0xFF and (data[pos + 1] & 0xE0) == 0xE0
+
+
+def getId3v2Size(data):
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        if data[5] & 0x10: # footer present
+            size += 10
+        return size + 10
+    return 0
+
+
+# size of ID3v1/APEv2 tags at the end of the file
+def getTrailingTagsSize(data, audio_start):
+    end = len(data)
+    id3v1_size = 0
+    if end - audio_start >= 128 and data[end - 128:end - 125] == b"TAG":
+        id3v1_size = 128
+        end -= 128
+    if end - audio_start >= 32 and data[end - 32:end - 24] == b"APETAGEX":
+        ape_size, ape_flags = struct.unpack("<II", data[end - 20:end - 12])
+        if ape_flags & 0x80000000: # header present
+            ape_size += 32
+        end -= min(ape_size, end - audio_start)
+    return len(data) - end, id3v1_size
+
+
+def readLameTag(info, data, frame_pos, header):
+    xing_pos = frame_pos + header.getXingOffset()
+    tag_id = data[xing_pos:xing_pos + 4]
+    if tag_id not in (b"Xing", b"Info"):
+        return tag_id == b"VBRI" or data[frame_pos + 36:frame_pos + 40] == b"VBRI"
+
+    flags = struct.unpack(">I", data[xing_pos + 4:xing_pos + 8])[0]
+    lame_pos = xing_pos + 8
+    lame_pos += 4 if flags & 1 else 0 # frames
+    lame_pos += 4 if flags & 2 else 0 # bytes
+    lame_pos += 100 if flags & 4 else 0 # TOC
+    lame_pos += 4 if flags & 8 else 0 # quality
+    lame_tag = bytes(data[lame_pos:lame_pos + LAME_TAG_SIZE])
+    if len(lame_tag) == LAME_TAG_SIZE and lame_tag[:4] in (b"LAME", b"Lavf", b"Lavc", b"L3.9"):
+        info.lame_tag = lame_tag
+        delay_padding = int.from_bytes(lame_tag[21:24], "big")
+        info.encoder_delay = delay_padding >> 12
+        info.encoder_padding = delay_padding & 0xFFF
+    return True
+
+
+def scanMp3File(path):
+    info = Mp3FileInfo(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise Mp3ConcatError(f"{path} is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = getId3v2Size(data[:10])
+            info.id3v2 = bytes(data[:pos])
+            trailing_size, id3v1_size = getTrailingTagsSize(data, pos)
+            end = len(data) - trailing_size
+            if id3v1_size:
+                info.id3v1 = bytes(data[len(data) - 128:])
+
+            first_frame = True
+            while pos + 4 <= end:
+                if not isFrameSync(data, pos):
+                    pos += 1 # garbage between frames, resync
+                    continue
+                try:
+                    header = Mp3FrameHeader(data[pos:pos + 4])
+                except ValueError:
+                    pos += 1
+                    continue
+                if pos + header.frame_size > end:
+                    break # truncated last frame
+
+                if info.first_header is None:
+                    info.first_header = header
+                elif not header.isCompatible(info.first_header):
+                    pos += 1 # false sync inside audio data
+                    continue
+
+                if first_frame:
+                    first_frame = False
+                    if readLameTag(info, data, pos, header):
+                        # Xing/Info/VBRI frame, has no audio
+                        pos += header.frame_size
+                        continue
+
+                if not info.frame_sizes:
+                    info.audio_start = pos
+                info.frame_sizes.append(header.frame_size)
+                info.bitrates.add(header.bitrate)
+                pos += header.frame_size
+                info.audio_end = pos
+
+    if not info.frame_sizes:
+        raise Mp3ConcatError(f"No MP3 frames found in {path}")
+    return info
+
+
+# main_data_begin of a layer III frame: how far back into earlier frames (bit reservoir) its audio data starts
+def getMainDataBegin(path, frame_pos, header):
+    with open(path, "rb") as f:
+        f.seek(frame_pos + (6 if header.has_crc else 4))
+        side_info = f.read(2)
+    if len(side_info) < 2:
+        return 0
+    if header.version == 3:
+        return ((side_info[0] << 8) | side_info[1]) >> 7
+    return side_info[0]
+
+
+# Sets the frames to skip at the inner joins, raises Mp3ConcatError if the delay/padding isn't whole frames
+def planGaplessJoins(infos):
+    samples_per_frame = infos[0].first_header.getSamplesPerFrame()
+    for info_idx, info in enumerate(infos):
+        if info_idx > 0:
+            if info.encoder_delay is None:
+                raise Mp3ConcatError(f"{info.path} has no LAME tag, its encoder delay is unknown")
+            if info.encoder_delay % samples_per_frame != 0:
+                raise Mp3ConcatError(f"encoder delay of {info.path} isn't whole frames, joining it would leave a gap")
+            info.skip_start_frames = info.encoder_delay // samples_per_frame
+            if info.skip_start_frames > 0:
+                kept_frame_pos, _ = info.getKeptAudioRange()
+                if info.first_header.layer == 1 and getMainDataBegin(info.path, kept_frame_pos, info.first_header) != 0:
+                    raise Mp3ConcatError(f"first audio frame of {info.path} uses data of the delay frames")
+        if info_idx < len(infos) - 1:
+            if info.encoder_padding is None:
+                raise Mp3ConcatError(f"{info.path} has no LAME tag, its encoder padding is unknown")
+            if info.encoder_padding % samples_per_frame != 0:
+                raise Mp3ConcatError(f"encoder padding of {info.path} isn't whole frames, joining it would leave a gap")
+            info.skip_end_frames = info.encoder_padding // samples_per_frame
+        if info.skip_start_frames + info.skip_end_frames >= len(info.frame_sizes):
+            raise Mp3ConcatError(f"{info.path} has no audio frames left after removing delay and padding")
+
+
+# LAME uses CRC-16/ARC for the tag checksum
+def crc16(data, crc=0):
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def buildXingFrame(infos):
+    first_header = infos[0].first_header
+    frame_sizes = [frame_size for info in infos for frame_size in info.getKeptFrameSizes()]
+    bitrates = set().union(*[info.bitrates for info in infos])
+
+    xing_offset = first_header.getXingOffset()
+    needed_size = max(xing_offset + XING_TAG_SIZE + LAME_TAG_SIZE, LAME_CRC_RANGE)
+
+    # smallest bitrate whose frame fits the tags
+    b1 = first_header.raw[1] | 1 # no CRC
+    frame_size = 0
+    for bitrate_idx in range(1, 15):
+        bitrate = getBitrate(first_header.version, first_header.layer, bitrate_idx)
+        frame_size = getFrameSize(first_header.version, first_header.layer, bitrate, first_header.sample_rate, 0)
+        if frame_size >= needed_size:
+            break
+    b2 = (bitrate_idx << 4) | (first_header.sample_rate_idx << 2) # no padding
+    b3 = first_header.raw[3] & 0xCF # mode extension 0
+    frame = bytearray(frame_size)
+    frame[0:4] = bytes([0xFF, b1, b2, b3])
+
+    num_frames = len(frame_sizes)
+    num_bytes = frame_size + sum(frame_sizes)
+
+    # TOC: byte position (in 1/256ths of the file) of every 1% of the duration
+    toc = bytearray(100)
+    frame_positions = []
+    curr_pos = frame_size
+    for size in frame_sizes:
+        frame_positions.append(curr_pos)
+        curr_pos += size
+    for percent in range(100):
+        frame_idx = min(int(percent / 100.0 * num_frames), num_frames - 1)
+        toc[percent] = min(255, int(frame_positions[frame_idx] * 256 / num_bytes))
+
+    pos = xing_offset
+    frame[pos:pos + 4] = b"Info" if len(bitrates) == 1 else b"Xing"
+    frame[pos + 4:pos + 8] = struct.pack(">I", 0x0F) # frames, bytes, TOC and quality present
+    frame[pos + 8:pos + 12] = struct.pack(">I", num_frames)
+    frame[pos + 12:pos + 16] = struct.pack(">I", num_bytes)
+    frame[pos + 16:pos + 116] = toc
+    frame[pos + 116:pos + 120] = struct.pack(">I", 0)
+
+    # LAME tag, keeps the encoder info of the first file
+    lame_tag = bytearray(infos[0].lame_tag or (b"LAME3.100" + bytes(LAME_TAG_SIZE - 9)))
+    lame_tag[11:19] = bytes(8) # peak and replay gain are for the first file only
+    encoder_delay = infos[0].encoder_delay or 0
+    encoder_padding = infos[-1].encoder_padding or 0
+    lame_tag[21:24] = ((encoder_delay << 12) | encoder_padding).to_bytes(3, "big")
+    lame_tag[28:32] = struct.pack(">I", num_bytes)
+    # music CRC isn't checked by players, computing it would mean another byte by byte pass over the audio
+    lame_tag[32:34] = bytes(2)
+    pos += XING_TAG_SIZE
+    frame[pos:pos + LAME_TAG_SIZE] = lame_tag
+    # the CRC field is still 0 here if it's among the covered bytes (MPEG2 and mono frames)
+    tag_crc = crc16(frame[:LAME_CRC_RANGE])
+    frame[pos + LAME_TAG_SIZE - 2:pos + LAME_TAG_SIZE] = struct.pack(">H", tag_crc)
+    return bytes(frame)
+
+
+# Raises Mp3ConcatError if the files can't be joined without re-encoding (different sample rates etc.)
+def concatMp3Files(input_paths, output_path):
+    infos = [scanMp3File(path) for path in input_paths]
+    first_header = infos[0].first_header
+    for info in infos[1:]:
+        if not info.first_header.isCompatible(first_header):
+            raise Mp3ConcatError(f"{info.path} has a different MPEG version, layer, sample rate or channel count")
+    planGaplessJoins(infos)
+
+    with open(output_path, "wb") as out_f:
+        out_f.write(infos[0].id3v2) # sox copies the metadata of the first input file too
+        if first_header.layer == 1: # Xing header is only for layer III
+            out_f.write(buildXingFrame(infos))
+        for info in infos:
+            audio_start, audio_end = info.getKeptAudioRange()
+            with open(info.path, "rb") as in_f:
+                in_f.seek(audio_start)
+                bytes_left = audio_end - audio_start
+                while bytes_left > 0:
+                    buffer = in_f.read(min(COPY_BUFFER_SIZE, bytes_left))
+                    if not buffer:
+                        break
+                    out_f.write(buffer)
+                    bytes_left -= len(buffer)
+        out_f.write(infos[0].id3v1)
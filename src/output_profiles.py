@@ -0,0 +1,52 @@
+import shutil
+
+
+class OutputProfile():
+    """How converted files are encoded. mp3 is encoded by sox (mp3_compression is its -C: kbps for a fixed bitrate,
+    negative for VBR quality, e.g. -4.2 = V4), other codecs are rendered to flac and encoded by ffmpeg when the
+    file is saved."""
+
+    def __init__(self, name, description, channels, rate, codec="mp3", mp3_compression=None, ffmpeg_args=(), ffmpeg_format=None, extension=".mp3"):
+        self.name = name
+        self.description = description
+        self.channels = channels
+        self.rate = rate
+        self.codec = codec
+        self.mp3_compression = mp3_compression
+        self.ffmpeg_args = list(ffmpeg_args)
+        self.ffmpeg_format = ffmpeg_format
+        self.extension = extension
+
+    def isEncodedByFfmpeg(self):
+        return self.codec != "mp3"
+
+    # extension of the files sox renders that are saved as outputs (after merging)
+    def getRenderExtension(self):
+        return ".flac" if self.isEncodedByFfmpeg() else self.extension
+
+
+DEFAULT_PROFILE_NAME = "mp3_stereo"
+
+OUTPUT_PROFILES = {profile.name: profile for profile in [
+    # what Alice always did: sox's default mp3 settings
+    OutputProfile("mp3_stereo", "MP3, stereo, 44.1 kHz, 128 kbps", 2, 44100),
+    OutputProfile("mp3_stereo_vbr", "MP3, stereo, 44.1 kHz, VBR (V4)", 2, 44100, mp3_compression=-4.2),
+    # spoken word: half the channels and half the samples to encode
+    OutputProfile("mp3_speech", "MP3, mono, 22.05 kHz, VBR (V6)", 1, 22050, mp3_compression=-6.2),
+    OutputProfile("mp3_speech_cbr", "MP3, mono, 22.05 kHz, 48 kbps", 1, 22050, mp3_compression=48),
+    OutputProfile("opus_speech", "Opus, mono, 32 kbps", 1, 22050, codec="opus",
+        ffmpeg_args=["-c:a", "libopus", "-b:a", "32k"], ffmpeg_format="ogg", extension=".opus"),
+    OutputProfile("m4b_speech", "AAC audiobook (M4B), mono, 22.05 kHz, 48 kbps", 1, 22050, codec="aac",
+        ffmpeg_args=["-c:a", "aac", "-b:a", "48k"], ffmpeg_format="ipod", extension=".m4b"),
+    OutputProfile("m4b_stereo", "AAC audiobook (M4B), stereo, 44.1 kHz, 96 kbps", 2, 44100, codec="aac",
+        ffmpeg_args=["-c:a", "aac", "-b:a", "96k"], ffmpeg_format="ipod", extension=".m4b"),
+]}
+
+
+# unknown names (e.g. from newer settings) get the default profile
+def getOutputProfile(name):
+    return OUTPUT_PROFILES.get(name, OUTPUT_PROFILES[DEFAULT_PROFILE_NAME])
+
+
+def findFfmpeg():
+    return shutil.which("ffmpeg")
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import json
+import os
+import tempfile
+import threading
+
+# one cache object per file in a process, so workers converting at the same time (alice_watch) share the entries
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def getFileKey(path):
+    # path + size + modification time, changes whenever the file gets replaced or edited
+    stat_result = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat_result.st_size}|{stat_result.st_mtime_ns}"
+
+
+# Writes data as JSON to a temp file next to file_path and replaces file_path with it,
+# temp names are unique so concurrent saves (other processes too) don't write into the same temp file
+def saveJsonFile(file_path, data):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(file_path)}.", suffix=".tmp", dir=os.path.dirname(file_path))
+    try:
+        with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# the process' cache for file_path (created on first use), max_entries is the latest caller's
+def openSharedCache(file_path, max_entries=1000):
+    with _shared_caches_lock:
+        cache = _shared_caches.get(file_path)
+        if cache is None:
+            cache = PersistentLRUCache(file_path, max_entries)
+            _shared_caches[file_path] = cache
+        cache.max_entries = max_entries
+        return cache
+
+
+class PersistentLRUCache():
+    """JSON file backed dict that keeps the max_entries most recently used entries."""
+
+    def __init__(self, file_path, max_entries=1000):
+        self.file_path = file_path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock() # saves one at a time, so an older snapshot can't replace a newer one
+
+        self.hits = 0
+        self.misses = 0
+
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                self.entries = OrderedDict(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Failed to load cache {self.file_path}: {type(e)} ({e})")
+
+    def save(self):
+        try:
+            with self.save_lock:
+                with self.lock:
+                    entries = list(self.entries.items())
+                saveJsonFile(self.file_path, entries)
+        except Exception as e:
+            print(f"Failed to save cache {self.file_path}: {type(e)} ({e})")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    # doesn't count as a use of the entry
+    def contains(self, key):
+        with self.lock:
+            return key in self.entries
+
+    # save=False when putting many entries at once, call save() after
+    def put(self, key, value, save=True):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False) # least recently used
+        if save:
+            self.save()
+
+    def getStatsText(self):
+        return f"{self.hits} hits, {self.misses} misses, {len(self.entries)}/{self.max_entries} entries"
@@ -0,0 +1,316 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from scratch_space import setUpScratchDir
+from alice_settings import AliceSettings
+from conversion import ConversionWorker
+from throughput_model import ThroughputModel
+
+# Converts synthesized audiobooks with different settings and reports how fast every stage was, e.g.
+#   python src/pipeline_benchmark.py --suite quick --save-baseline
+#   python src/pipeline_benchmark.py --suite quick --variants default numpy
+# Results are printed and saved as JSON. When a baseline exists, runs that got more than --threshold slower fail.
+# Every run is its own process, so peak memory and the worker's global state (temp dir, caches) aren't shared.
+
+# bumped when a fixture recipe changes, so old fixture files aren't reused
+FIXTURE_VERSION = 1
+
+
+class Fixture():
+    """num_files synthesized files of duration seconds each (sox -R, so they are the same on every run)."""
+
+    def __init__(self, name, duration, kind, num_files=1):
+        self.name = name
+        self.duration = duration
+        self.kind = kind # "speech", "silence" or "dc_offset"
+        self.num_files = num_files
+
+    def getPaths(self, fixture_dir):
+        return [os.path.join(fixture_dir, f"{self.name}_v{FIXTURE_VERSION}_{file_idx:03}.mp3") for file_idx in range(self.num_files)]
+
+    def getSynthCommand(self, path, file_idx):
+        synth_command = [ConversionWorker.SOX_PATH, '-R', '-n', '-r', '44100', '-c', '2', path]
+        # every small file sweeps a little differently
+        low_freq = 150 + 10 * file_idx
+        if self.kind == "silence":
+            # 2 sec of speech-like sound, then 8 sec of silence
+            num_periods = math.ceil(self.duration / 10)
+            synth_command.extend(['synth', '2', 'sine', f"{low_freq}-600", 'sine', '300-700',
+                'tremolo', '3', '80', 'vol', '0.5', 'pad', '0', '8', 'repeat', str(num_periods - 1),
+                'trim', '0', str(self.duration)])
+        else:
+            # slowly sweeping tones with syllable-rate tremolo and pauses
+            synth_command.extend(['synth', str(self.duration), 'sine', f"{low_freq}-900", 'sine', '220-440',
+                'tremolo', '3', '60', 'tremolo', '0.3', '90', 'vol', '0.6'])
+            if self.kind == "dc_offset":
+                synth_command.extend(['dcshift', '0.05'])
+        return synth_command
+
+    # synthesizes the files that aren't in fixture_dir yet, returns their paths
+    def ensure(self, fixture_dir):
+        os.makedirs(fixture_dir, exist_ok=True)
+        paths = self.getPaths(fixture_dir)
+        for file_idx, path in enumerate(paths):
+            if os.path.isfile(path):
+                continue
+            print(f"Synthesizing {os.path.basename(path)} ({self.duration} sec)", file=sys.stderr)
+            partial_path = f"{path}.partial.mp3"
+            subprocess.run(self.getSynthCommand(partial_path, file_idx), check=True)
+            os.replace(partial_path, path)
+        return paths
+
+
+FIXTURES = {fixture.name: fixture for fixture in [
+    Fixture("speech_1min", 60, "speech"),
+    Fixture("silence_1min", 60, "silence"),
+    Fixture("dc_offset_1min", 60, "dc_offset"),
+    Fixture("small_files", 30, "speech", num_files=40),
+    Fixture("speech_1h", 3600, "speech"),
+    Fixture("silence_1h", 3600, "silence"),
+    Fixture("dc_offset_1h", 3600, "dc_offset"),
+    Fixture("speech_10h", 36000, "speech"),
+]}
+
+SUITES = {
+    "quick": ["speech_1min", "silence_1min", "dc_offset_1min", "small_files"],
+    "standard": ["speech_1min", "silence_1min", "dc_offset_1min", "small_files", "speech_1h", "silence_1h", "dc_offset_1h"],
+    "full": list(FIXTURES),
+}
+
+# AliceSettings changed from the defaults, per variant
+VARIANTS = {
+    "default": {},
+    "one_job": {"max_parallel_jobs": 1},
+    "multi_pass": {"single_pass": False},
+    "numpy": {"dsp_engine": "numpy"},
+    "sampled_analysis": {"analysis_mode": "sampled"},
+    "no_analysis": {"analysis_mode": "none"},
+    "no_chunks": {"save_as_60_min_chunks": False},
+    "streaming": {"streaming_chunks": True},
+    "speech_profile": {"output_profile": "mp3_speech"},
+}
+
+DEFAULT_THRESHOLD = 0.15
+
+
+class ScratchSampler():
+    """Polls the size of the worker's scratch dir on its own thread and keeps the largest."""
+
+    INTERVAL_SEC = 0.25
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.peak_bytes = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.INTERVAL_SEC):
+            self.peak_bytes = max(self.peak_bytes, getDirBytes(self.worker.scratch_dir))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def getDirBytes(path):
+    dir_bytes = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                dir_bytes += os.path.getsize(os.path.join(dir_path, file_name))
+            except OSError:
+                pass # deleted while walking
+    return dir_bytes
+
+
+# ru_maxrss of this process and of its largest child (sox), None where resource doesn't exist (Windows)
+def getPeakRss():
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+    # kilobytes on Linux, bytes on macOS
+    unit = 1 if platform.system() == "Darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+# Runs in the benchmark's child process: converts input_files once and returns the result
+def runConversion(input_files, variant, work_dir):
+    setUpScratchDir(os.path.join(work_dir, "scratch"))
+    output_folder = os.path.join(work_dir, "output")
+    os.makedirs(output_folder, exist_ok=True)
+    # no caches or journals from earlier runs, nothing kept for later ones
+    settings_values = {"output_folder": output_folder, "analysis_cache_size": 0, "resumable_batches": False}
+    settings_values.update(VARIANTS[variant])
+    worker = ConversionWorker(input_files, AliceSettings(**settings_values))
+    worker.throughput_model = ThroughputModel(os.path.join(work_dir, "throughput_model.json"))
+
+    start_time = time.time()
+    with ScratchSampler(worker) as scratch_sampler:
+        worker.convertFiles()
+    wall_sec = time.time() - start_time
+
+    audio_sec = sum(worker.file_durations)
+    stages = {}
+    for stage_key, stage_samples in worker.throughput_model.samples.items():
+        stage_audio_sec = sum(sample_audio_sec for sample_audio_sec, _ in stage_samples)
+        stage_wall_sec = sum(sample_wall_sec for _, sample_wall_sec in stage_samples)
+        stages[stage_key] = {
+            "audio_sec": stage_audio_sec,
+            "wall_sec": stage_wall_sec,
+            "realtime_factor": stage_audio_sec / stage_wall_sec if stage_wall_sec > 0 else None,
+        }
+    return {
+        "failed": worker.stopped or worker.error_message is not None,
+        "audio_sec": audio_sec,
+        "wall_sec": wall_sec,
+        "realtime_factor": audio_sec / wall_sec if wall_sec > 0 else None,
+        "stages": stages,
+        "peak_rss_bytes": getPeakRss(),
+        "scratch_peak_bytes": scratch_sampler.peak_bytes,
+        "intermediate_peak_bytes": worker.scratch_bytes_peak,
+        "output_bytes": getDirBytes(output_folder),
+    }
+
+
+# Starts a child process for one fixture + variant, returns its result
+def runBenchmark(fixture, variant, fixture_dir, work_root):
+    work_dir = tempfile.mkdtemp(prefix=f"{fixture.name}_{variant}_", dir=work_root)
+    result_path = os.path.join(work_dir, "result.json")
+    run_command = [sys.executable, os.path.abspath(__file__), "--run-one", fixture.name, variant, fixture_dir, work_dir, result_path]
+    try:
+        process = subprocess.run(run_command, stdout=subprocess.DEVNULL)
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = {"failed": True, "exit_code": process.returncode}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result.update({"fixture": fixture.name, "variant": variant})
+    return result
+
+
+# runs in baseline that got slower than threshold (0.15 = 15% lower realtime factor), as printable lines
+def findRegressions(report, baseline, threshold):
+    baseline_results = {(result["fixture"], result["variant"]): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        baseline_result = baseline_results.get((result["fixture"], result["variant"]))
+        if baseline_result is None or baseline_result.get("failed") or not baseline_result.get("realtime_factor"):
+            continue
+        if result.get("failed"):
+            regressions.append(f"{result['fixture']}/{result['variant']}: failed")
+            continue
+        slowdown = 1 - result["realtime_factor"] / baseline_result["realtime_factor"]
+        if slowdown > threshold:
+            regressions.append(f"{result['fixture']}/{result['variant']}: {result['realtime_factor']:.1f}x realtime, "
+                f"was {baseline_result['realtime_factor']:.1f}x ({slowdown * 100:.0f}% slower)")
+    return regressions
+
+
+def getMachineInfo():
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def printResult(result):
+    if result.get("failed"):
+        print(f"{result['fixture']:>16} {result['variant']:<18} failed")
+        return
+    rss_bytes = result["peak_rss_bytes"]["children"]
+    rss_text = f"{rss_bytes / 1e6:.0f} MB" if rss_bytes is not None else "?"
+    print(f"{result['fixture']:>16} {result['variant']:<18} {result['wall_sec']:8.1f} sec {result['realtime_factor']:7.1f}x realtime, "
+        f"sox peak RSS {rss_text}, scratch peak {result['scratch_peak_bytes'] / 1e6:.0f} MB")
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(prog="pipeline-benchmark", description="Benchmark Alice's conversion pipeline.")
+    parser.add_argument("--suite", choices=list(SUITES), default="quick", help="fixtures to convert (default quick)")
+    parser.add_argument("--fixtures", nargs="+", choices=list(FIXTURES), help="convert these fixtures instead of a suite")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS), help="settings to run with (default all)")
+    parser.add_argument("--fixture-dir", default=os.path.join(AliceSettings.getCacheDir(), "benchmark_fixtures"),
+        help="where synthesized fixtures are kept between runs")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON report")
+    parser.add_argument("--baseline", default=os.path.join(AliceSettings.getCacheDir(), "benchmark_baseline.json"),
+        help="report to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="save this report as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help=f"fail if a run's realtime factor is this much lower than the baseline's (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--run-one", nargs=5, metavar=("FIXTURE", "VARIANT", "FIXTURE_DIR", "WORK_DIR", "RESULT_PATH"),
+        help=argparse.SUPPRESS) # used by the child processes
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    if args.run_one is not None:
+        fixture_name, variant, fixture_dir, work_dir, result_path = args.run_one
+        result = runConversion(FIXTURES[fixture_name].getPaths(fixture_dir), variant, work_dir)
+        with open(result_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    fixture_names = args.fixtures or SUITES[args.suite]
+    work_root = tempfile.mkdtemp(prefix="pipeline_benchmark_", dir=".")
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": getMachineInfo(),
+        "results": [],
+    }
+    try:
+        for fixture_name in fixture_names:
+            fixture = FIXTURES[fixture_name]
+            fixture.ensure(args.fixture_dir)
+            for variant in args.variants:
+                result = runBenchmark(fixture, variant, args.fixture_dir, work_root)
+                report["results"].append(result)
+                printResult(result)
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.output}")
+
+    exit_code = 0
+    if os.path.isfile(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print("The baseline was made on a different machine, comparing anyway", file=sys.stderr)
+        regressions = findRegressions(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Slower than the baseline: {regression}", file=sys.stderr)
+        if len(regressions) > 0:
+            exit_code = 1
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Saved as the baseline: {args.baseline}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
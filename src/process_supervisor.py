@@ -0,0 +1,201 @@
+import os
+import platform
+import re
+import subprocess
+import threading
+
+LINE_END_PATTERN = re.compile(rb"[\r\n]")
+
+
+class SupervisedProcess():
+    """A subprocess with a waiter thread (and a stderr reader thread if on_stderr_line is given).
+    Nothing polls: wait() returns as soon as the process exits and callbacks run from the helper threads.
+    resource_usage is set (see getResourceUsage) before wait() returns."""
+
+    def __init__(self, command, on_exit=None, on_stderr_line=None, capture_stderr=False, startupinfo=None, **popen_kwargs):
+        self.command = command
+        self.on_exit = on_exit
+        self.on_stderr_line = on_stderr_line
+        self.capture_stderr = capture_stderr
+        self.stderr_lines = []
+        self.returncode = None
+        self.resource_usage = None
+        self.done = threading.Event()
+
+        self.stderr_thread = None
+        if on_stderr_line is not None or capture_stderr:
+            popen_kwargs["stderr"] = subprocess.PIPE # read as bytes, see readStderr
+
+        self.popen = subprocess.Popen(command, startupinfo=startupinfo, **popen_kwargs)
+        self.pid = self.popen.pid
+        self.stdin = self.popen.stdin
+        self.stdout = self.popen.stdout
+
+        if self.popen.stderr is not None:
+            self.stderr_thread = threading.Thread(target=self.readStderr, daemon=True)
+            self.stderr_thread.start()
+        self.waiter_thread = threading.Thread(target=self.waitForExit, daemon=True)
+        self.waiter_thread.start()
+
+    # Splits stderr on both \r and \n: sox -S rewrites its status line with \r and only ends it with \n when done
+    def readStderr(self):
+        pending = b""
+        try:
+            while True:
+                chunk = self.popen.stderr.read1(4096) # returns whatever is available instead of waiting for a full line
+                if not chunk:
+                    break
+                *stderr_lines, pending = LINE_END_PATTERN.split(pending + chunk)
+                for stderr_line in stderr_lines:
+                    self.handleStderrLine(stderr_line)
+            self.handleStderrLine(pending)
+        except Exception as e:
+            print(f"Failed reading stderr: {type(e)} ({e})")
+
+    def handleStderrLine(self, stderr_line):
+        if not stderr_line:
+            return
+        stderr_line = stderr_line.decode("utf-8", errors="replace")
+        if self.capture_stderr:
+            self.stderr_lines.append(stderr_line)
+        if self.on_stderr_line is not None:
+            self.on_stderr_line(stderr_line)
+
+    def waitForExit(self):
+        returncode = self.reap()
+        if self.stderr_thread is not None:
+            self.stderr_thread.join() # so stderr_lines is complete when done is set
+        self.returncode = returncode
+        self.done.set()
+        if self.on_exit is not None:
+            try:
+                self.on_exit(self)
+            except Exception as e:
+                print(f"Failed on_exit callback: {type(e)} ({e})")
+
+    # Waits for the process and reads its resource usage: wait4 where it exists, otherwise (Windows) the process
+    # handle is asked before Popen closes it. Returns the exit code like Popen.wait.
+    def reap(self):
+        if hasattr(os, "wait4"):
+            try:
+                _, wait_status, rusage = os.wait4(self.pid, 0)
+            except ChildProcessError:
+                return self.popen.wait() # already reaped
+            # Popen didn't see the exit, tell it so it doesn't wait again
+            self.popen.returncode = os.waitstatus_to_exitcode(wait_status)
+            self.resource_usage = getResourceUsage(rusage)
+            return self.popen.returncode
+        returncode = self.popen.wait()
+        if platform.system() == "Windows":
+            self.resource_usage = getWindowsResourceUsage(self.popen)
+        return returncode
+
+    # returns True if the process has exited
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def poll(self):
+        return self.returncode
+
+    # doesn't wait for the process to exit, the waiter thread reaps it
+    def terminate(self):
+        if not self.done.is_set():
+            try:
+                self.popen.terminate()
+            except OSError:
+                pass # already exited
+
+
+class ProcessSupervisor():
+    """Keeps track of every running process so they can all be stopped at once."""
+
+    def __init__(self, startupinfo=None):
+        self.startupinfo = startupinfo
+        self.processes = set()
+        self.lock = threading.Lock()
+        self.closed = False
+
+    # returns None if the supervisor was closed (conversion stopped)
+    def start(self, command, on_exit=None, **kwargs):
+        def onExit(process):
+            with self.lock:
+                self.processes.discard(process)
+            if on_exit is not None:
+                on_exit(process)
+
+        with self.lock:
+            if self.closed:
+                return None
+            process = SupervisedProcess(command, on_exit=onExit, startupinfo=self.startupinfo, **kwargs)
+            # onExit needs the lock, so it can't remove the process before it's added
+            self.processes.add(process)
+        return process
+
+    # stops all processes and refuses to start new ones, doesn't block
+    def terminateAll(self):
+        with self.lock:
+            self.closed = True
+            processes = list(self.processes)
+        for process in processes:
+            process.terminate()
+
+    def waitForAll(self, timeout=None):
+        with self.lock:
+            processes = list(self.processes)
+        for process in processes:
+            process.wait(timeout)
+
+
+# user_cpu_sec, system_cpu_sec, max_rss_bytes, read_bytes, written_bytes of a process (and the children it waited for)
+def getResourceUsage(rusage):
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS, ru_inblock/ru_oublock count 512 byte blocks
+    # (only what really went to or came from the disk, not the page cache)
+    rss_unit = 1 if platform.system() == "Darwin" else 1024
+    return {
+        "user_cpu_sec": rusage.ru_utime,
+        "system_cpu_sec": rusage.ru_stime,
+        "max_rss_bytes": rusage.ru_maxrss * rss_unit,
+        "read_bytes": rusage.ru_inblock * 512,
+        "written_bytes": rusage.ru_oublock * 512,
+    }
+
+
+# same as getResourceUsage from the process handle, None if the handle can't be read
+def getWindowsResourceUsage(popen):
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class IO_COUNTERS(ctypes.Structure):
+            _fields_ = [(name, ctypes.c_ulonglong) for name in ("ReadOperationCount", "WriteOperationCount",
+                "OtherOperationCount", "ReadTransferCount", "WriteTransferCount", "OtherTransferCount")]
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [(name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        handle = wintypes.HANDLE(int(popen._handle))
+        kernel32 = ctypes.windll.kernel32
+        creation_time, exit_time, kernel_time, user_time = (wintypes.FILETIME() for _ in range(4))
+        io_counters = IO_COUNTERS()
+        memory_counters = PROCESS_MEMORY_COUNTERS()
+        memory_counters.cb = ctypes.sizeof(memory_counters)
+        if not (kernel32.GetProcessTimes(handle, ctypes.byref(creation_time), ctypes.byref(exit_time),
+            ctypes.byref(kernel_time), ctypes.byref(user_time))
+        and kernel32.GetProcessIoCounters(handle, ctypes.byref(io_counters))
+        and kernel32.K32GetProcessMemoryInfo(handle, ctypes.byref(memory_counters), memory_counters.cb)):
+            return None
+        def toSeconds(file_time): # 100 ns units
+            return ((file_time.dwHighDateTime << 32) | file_time.dwLowDateTime) / 1e7
+        # the io counters include reads from the page cache (there are no block counters)
+        return {
+            "user_cpu_sec": toSeconds(user_time),
+            "system_cpu_sec": toSeconds(kernel_time),
+            "max_rss_bytes": memory_counters.PeakWorkingSetSize,
+            "read_bytes": io_counters.ReadTransferCount,
+            "written_bytes": io_counters.WriteTransferCount,
+        }
+    except Exception as e:
+        print(f"Failed to read the resource usage of a process: {type(e)} ({e})")
+        return None
@@ -0,0 +1,23 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from conversion import ConversionWorker
+
+
+class ConversionSignalBridge(QObject):
+    """Re-emits the signals of a ConversionWorker as Qt signals.
+    The worker emits from its own threads, Qt queues the signals to the GUI thread."""
+
+    finished = pyqtSignal()
+    curr_file_progress_updated = pyqtSignal(int)
+    total_progress_updated = pyqtSignal(str)
+    current_task_updated = pyqtSignal(str)
+    time_remaining_updated = pyqtSignal(int)
+    span_finished = pyqtSignal(dict)
+
+    def __init__(self, worker: ConversionWorker):
+        super().__init__()
+        worker.finished.connect(self.finished.emit)
+        worker.curr_file_progress_updated.connect(self.curr_file_progress_updated.emit)
+        worker.total_progress_updated.connect(self.total_progress_updated.emit)
+        worker.current_task_updated.connect(self.current_task_updated.emit)
+        worker.time_remaining_updated.connect(self.time_remaining_updated.emit)
+        worker.span_finished.connect(self.span_finished.emit)
@@ -0,0 +1,53 @@
+import math
+import statistics
+
+# Estimates of DC offset and volume from "stat" of short windows spread over a file (analysis_mode "sampled").
+# The estimate is only used when the windows agree, otherwise the whole file is analysed like before.
+
+# the DC offset gets fixed when it rounds to 0.01 or more (ConversionWorker.hasSignificantDCOffset)
+DC_THRESHOLD = 0.005
+# how many standard errors the DC estimate has to be away from DC_THRESHOLD
+DC_CONFIDENCE_Z = 3.0
+# the loudest window may be this much louder than the median window, more means the peaks are too sporadic
+# to trust that the loudest part of the file was in a window
+MAX_PEAK_SPREAD_DB = 6.0
+# volume is turned up this much less than the windows allow, for peaks between the windows
+PEAK_HEADROOM_DB = 1.0
+# a window that peaks this close to full scale means the file is already as loud as it gets
+FULL_SCALE_PEAK = 0.999
+
+
+# num_windows windows of window_samples spread evenly over total_samples as (start, length),
+# None if the windows would cover so much of the file that the full analysis isn't much slower
+def planAnalysisWindows(total_samples, num_windows, window_samples):
+    if num_windows < 2 or window_samples <= 0 or total_samples <= 2 * num_windows * window_samples:
+        return None
+    spacing = (total_samples - window_samples) / (num_windows - 1)
+    return [(round(window_idx * spacing), window_samples) for window_idx in range(num_windows)]
+
+
+# window_stats: [(dc offset, volume multiplier)] of every window, returns (dc offset, volume multiplier)
+# or None if the windows don't agree enough for an estimate
+def estimateFromWindows(window_stats):
+    if len(window_stats) < 2:
+        return None
+    dc_offsets = [dc_offset for dc_offset, _ in window_stats]
+    # "Volume adjustment" is 1 / peak, silent windows (inf) don't count
+    peaks = [1 / vol_multi for _, vol_multi in window_stats if 0 < vol_multi < math.inf]
+
+    dc_offset = statistics.fmean(dc_offsets)
+    dc_error = statistics.stdev(dc_offsets) / math.sqrt(len(dc_offsets))
+    # would the whole file be on the other side of the threshold?
+    if abs(abs(dc_offset) - DC_THRESHOLD) < DC_CONFIDENCE_Z * dc_error:
+        return None
+
+    if len(peaks) == 0:
+        return None
+    max_peak = max(peaks)
+    if max_peak >= FULL_SCALE_PEAK:
+        return dc_offset, 1.0
+    median_peak = statistics.median(peaks)
+    if median_peak <= 0 or 20 * math.log10(max_peak / median_peak) > MAX_PEAK_SPREAD_DB:
+        return None
+    vol_multi = max(1.0, 1 / (max_peak * 10 ** (PEAK_HEADROOM_DB / 20)))
+    return dc_offset, vol_multi
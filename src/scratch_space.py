@@ -0,0 +1,174 @@
+import atexit
+import os
+import platform
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+# Temp files of every run of Alice go in their own dir in the alice_temp folder of the scratch root, with a pid file,
+# so a later run can tell which dirs belong to runs that crashed (atexit never ran) and delete them.
+# The scratch root can be any folder (--scratch-dir), only what Alice made inside its alice_temp folder is ever deleted.
+
+# sox can't handle non-ANSI characters in paths, so the default root is the working directory
+DEFAULT_ROOT_DIR = "."
+ALICE_DIR_NAME = "alice_temp"
+# tmpfs that small batches can use instead (see getRamScratchDir)
+RAM_DISK_DIR = "/dev/shm"
+RUN_DIR_PREFIX = "run_"
+PID_FILE_NAME = "alice.pid"
+# conversion journals (resumable batches) are kept next to the run dirs, they have to outlive a run
+JOURNALS_DIR_NAME = "journals"
+# dirs without a readable pid file and loose temp files (of older versions) are deleted after this long
+ORPHAN_AGE_SEC = 60 * 60
+# tempfile.mkstemp's prefix, the only loose files in alice_temp that are Alice's
+TEMP_FILE_PREFIX = "tmp"
+# space left free on the scratch drive for everything else
+RESERVE_BYTES = 1e9
+
+_ram_scratch_dir = None
+_ram_scratch_lock = threading.Lock()
+
+
+# Creates this run's scratch dir in root_dir's alice_temp folder (after deleting the dirs of dead runs),
+# makes it the default temp dir and deletes it on exit. Returns its path.
+def setUpScratchDir(root_dir=None):
+    run_dir = createRunDir(os.path.join(root_dir or DEFAULT_ROOT_DIR, ALICE_DIR_NAME))
+    tempfile.tempdir = run_dir
+    return run_dir
+
+
+# Scratch dir of this run on the RAM disk, None if there is no RAM disk (created when it's first needed)
+def getRamScratchDir():
+    global _ram_scratch_dir
+    with _ram_scratch_lock:
+        if _ram_scratch_dir is None and os.path.isdir(RAM_DISK_DIR):
+            try:
+                _ram_scratch_dir = createRunDir(os.path.join(RAM_DISK_DIR, ALICE_DIR_NAME))
+            except OSError as e:
+                print(f"Can't use the RAM disk for temp files: {type(e)} ({e})")
+        return _ram_scratch_dir
+
+
+# Where the journals of batches go, run_dir is the run's dir on disk (not the RAM disk, journals have to survive
+# a reboot): on the same drive, so rendered files are moved into a journal with a rename.
+# Stays relative like the run dir (sox and non-ANSI paths).
+def getJournalRootDir(run_dir):
+    parent_dir, run_dir_name = os.path.split(os.path.normpath(run_dir))
+    if run_dir_name.startswith(RUN_DIR_PREFIX):
+        return os.path.join(parent_dir, JOURNALS_DIR_NAME)
+    return os.path.join(run_dir, f"alice_{JOURNALS_DIR_NAME}") # not a run dir (setUpScratchDir wasn't called)
+
+
+# alice_dir is an alice_temp folder, nothing else in it is expected to be the user's
+def createRunDir(alice_dir):
+    os.makedirs(alice_dir, exist_ok=True)
+    scavengeDeadRuns(alice_dir)
+    run_dir = tempfile.mkdtemp(prefix=f"{RUN_DIR_PREFIX}{os.getpid()}_", dir=alice_dir)
+    with open(os.path.join(run_dir, PID_FILE_NAME), "w", encoding="utf-8") as f:
+        f.write(f"{socket.gethostname()}\n{os.getpid()}\n")
+    atexit.register(shutil.rmtree, run_dir, ignore_errors=True)
+    return run_dir
+
+
+# Deletes the run dirs in alice_dir whose process is gone, and old loose temp files (tmp* from mkstemp)
+def scavengeDeadRuns(alice_dir):
+    try:
+        dir_entries = list(os.scandir(alice_dir))
+    except OSError:
+        return
+    oldest_orphan_time = time.time() - ORPHAN_AGE_SEC
+    for dir_entry in dir_entries:
+        try:
+            if dir_entry.is_dir(follow_symlinks=False):
+                if not dir_entry.name.startswith(RUN_DIR_PREFIX):
+                    continue
+                owner = readPidFile(os.path.join(dir_entry.path, PID_FILE_NAME))
+                if owner is None:
+                    is_dead = dir_entry.stat().st_mtime < oldest_orphan_time
+                else:
+                    hostname, pid = owner
+                    # a run on another computer (shared drive) can't be checked
+                    is_dead = hostname == socket.gethostname() and pid != os.getpid() and not isProcessAlive(pid)
+                if is_dead:
+                    print(f"Removing temp files of a run that didn't exit cleanly: {dir_entry.path}")
+                    shutil.rmtree(dir_entry.path, ignore_errors=True)
+            elif (dir_entry.is_file(follow_symlinks=False) and dir_entry.name.startswith(TEMP_FILE_PREFIX)
+            and dir_entry.stat().st_mtime < oldest_orphan_time):
+                os.remove(dir_entry.path)
+        except OSError:
+            pass
+
+
+# (hostname, pid) or None
+def readPidFile(pid_path):
+    try:
+        with open(pid_path, "r", encoding="utf-8") as f:
+            hostname, pid = f.read().split()
+        return hostname, int(pid)
+    except (OSError, ValueError):
+        return None
+
+
+def isProcessAlive(pid):
+    if platform.system() == "Windows":
+        # os.kill would terminate the process on Windows
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        ERROR_ACCESS_DENIED = 5
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # someone else's process
+    return True
+
+
+def getFreeBytes(path):
+    return shutil.disk_usage(path).free - RESERVE_BYTES
+
+
+class ScratchAdmission():
+    """Holds jobs back until the scratch drive has room for what they are estimated to write.
+    Space reserved by running jobs counts as used even when they have written part of it already,
+    so it errs on the side of waiting. A job is always let in when no other job holds space,
+    so a batch can't get stuck on an estimate that is bigger than the drive."""
+
+    POLL_INTERVAL_SEC = 1.0 # free space is checked again this often (other programs free space too)
+
+    def __init__(self, scratch_dir):
+        self.scratch_dir = scratch_dir
+        self.reserved_bytes = 0
+        self.condition = threading.Condition()
+
+    # blocks until num_bytes are reserved, or returns False if is_stopped() turns true first
+    def reserve(self, num_bytes, is_stopped):
+        with self.condition:
+            announced = False
+            while not is_stopped():
+                if self.reserved_bytes == 0 or self.reserved_bytes + num_bytes <= getFreeBytes(self.scratch_dir):
+                    self.reserved_bytes += num_bytes
+                    return True
+                if not announced:
+                    print(f"Waiting for {num_bytes / 1e9:.1f} GB of scratch space")
+                    announced = True
+                self.condition.wait(self.POLL_INTERVAL_SEC)
+            return False
+
+    def release(self, num_bytes):
+        with self.condition:
+            self.reserved_bytes = max(0, self.reserved_bytes - num_bytes)
+            self.condition.notify_all()
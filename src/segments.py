@@ -0,0 +1,94 @@
+import math
+
+
+class TimeSegment():
+    """A time range of an input file that gets rendered on its own.
+    Positions are in input samples, out_* positions are in output samples (after sox resamples to out_rate).
+    The segment is read with some padding on both sides so the resampler and compressor have settled
+    by the time the kept part starts, the padding is trimmed off again after the effects."""
+
+    def __init__(self, number, start, length, pre_roll, post_roll, rate, out_rate):
+        self.number = number # 1, 2, 3, ... like the files sox writes with newfile
+        self.start = start
+        self.length = length
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+
+        self.out_start = round(start * out_rate / rate)
+        self.out_length = round((start + length) * out_rate / rate) - self.out_start
+        self.out_pre_roll = round(pre_roll * out_rate / rate)
+        self.out_rate = out_rate
+
+    def getReadStart(self):
+        return self.start - self.pre_roll
+
+    def getReadLength(self):
+        return self.pre_roll + self.length + self.post_roll
+
+    def getOutStartSec(self):
+        return self.out_start / self.out_rate
+
+    def getDuration(self):
+        return self.out_length / self.out_rate
+
+    def __repr__(self):
+        return f"TimeSegment({self.number}, {self.start}+{self.length}, -{self.pre_roll}/+{self.post_roll})"
+
+
+# Cuts total_samples into segments of segment_sec (the last one is shorter), boundaries are exact input samples
+def planTimeSegments(total_samples, rate, segment_sec, out_rate, padding_sec):
+    segment_samples = max(1, round(segment_sec * rate))
+    padding_samples = round(padding_sec * rate)
+    segments = []
+    for number, start in enumerate(range(0, total_samples, segment_samples), start=1):
+        length = min(segment_samples, total_samples - start)
+        pre_roll = min(padding_samples, start)
+        post_roll = min(padding_samples, total_samples - start - length)
+        segments.append(TimeSegment(number, start, length, pre_roll, post_roll, rate, out_rate))
+    return segments
+
+
+# Phase (in % of a cycle) that makes "synth sine fmod" continue a tremolo that started at 0 sec.
+# "tremolo F D" is "synth sine fmod F (100 - D/2) 25", so the phase at start_sec is 25% + F * start_sec cycles
+def getTremoloPhase(frequency, start_sec):
+    return (25.0 + math.fmod(frequency * start_sec, 1.0) * 100.0) % 100.0
+
+
+# DC offset and volume of the whole file from the "stat" results of its segments:
+# the mean is weighted by segment length and the file can only be made as loud as its loudest segment allows
+def combineSegmentStats(segment_stats):
+    total_length = sum(length for length, _, _ in segment_stats)
+    if total_length <= 0:
+        return 0, 1
+    dc_offset = sum(length * segment_dc_offset for length, segment_dc_offset, _ in segment_stats) / total_length
+    vol_multi = min(segment_vol_multi for _, _, segment_vol_multi in segment_stats)
+    return dc_offset, vol_multi
+
+
+class SegmentedRender():
+    """An input file that is being rendered in segments: analysed per segment, rendered per segment, then put together."""
+
+    def __init__(self, index, in_tmp_file_path, audio_info, segments):
+        self.index = index
+        self.in_tmp_file_path = in_tmp_file_path
+        self.audio_info = audio_info
+        self.segments = segments
+        self.cache_key = None
+        self.dc_offset = None # None until the whole file is analysed
+        self.vol_multi = None
+        self.segment_stats = {} # segment number -> (length, dc offset, volume multiplier)
+        self.segment_outputs = {} # segment number -> temp file it gets rendered to
+        self.rendered_segments = set()
+        self.out_tmp_file_path = None # base name of the outputs, or the stitched file
+
+    def isAnalysed(self):
+        return len(self.segment_stats) == len(self.segments)
+
+    def isRendered(self):
+        return len(self.rendered_segments) == len(self.segments)
+
+    def getSegmentOutputs(self):
+        return [self.segment_outputs[segment.number] for segment in self.segments]
+
+    def getTempFiles(self):
+        return [self.in_tmp_file_path, self.out_tmp_file_path] + list(self.segment_outputs.values())
@@ -0,0 +1,66 @@
+import re
+import time
+
+# sox -S status line, e.g. "In:12.34% 00:01:23.45 [00:10:00.00] Out:3.66M [ -====|====- ] Hd:0.0 Clip:0"
+# the percentage and time remaining are missing when sox doesn't know the input length
+STATUS_PATTERN = re.compile(
+    r"In:\s*(?:(?P<percent>[\d.]+)%)?\s+(?P<elapsed>[\d:.]+)"
+    r"(?:\s+\[(?P<remaining>[-\d:.]+)\])?"
+    r"(?:\s+Out:\s*(?P<out>[\d.]+)(?P<out_unit>[kMG]?))?"
+)
+OUT_UNITS = {"": 1, "k": 1e3, "M": 1e6, "G": 1e9}
+
+
+class SoxProgress():
+    def __init__(self, percent, elapsed_sec, remaining_sec, out_samples):
+        self.percent = percent # None if unknown
+        self.elapsed_sec = elapsed_sec # position in the input audio
+        self.remaining_sec = remaining_sec # audio left to read, None if unknown
+        self.out_samples = out_samples # samples written so far, None if unknown
+
+    def __repr__(self):
+        return f"SoxProgress({self.percent}%, {self.elapsed_sec}s, {self.remaining_sec}s left, {self.out_samples} out)"
+
+
+def parseTimestamp(timestamp):
+    seconds = 0.0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parseSoxStatus(status_line):
+    match = STATUS_PATTERN.search(status_line)
+    if match is None:
+        return None
+    try:
+        percent = float(match.group("percent")) if match.group("percent") else None
+        elapsed_sec = parseTimestamp(match.group("elapsed"))
+        remaining_sec = None
+        if match.group("remaining") and not match.group("remaining").startswith("-"):
+            remaining_sec = parseTimestamp(match.group("remaining"))
+        out_samples = None
+        if match.group("out"):
+            out_samples = int(float(match.group("out")) * OUT_UNITS[match.group("out_unit")])
+        return SoxProgress(percent, elapsed_sec, remaining_sec, out_samples)
+    except ValueError:
+        return None
+
+
+class ProgressRateLimiter():
+    """Lets a progress update through at most every min_interval seconds (GUI can't keep up with sox)."""
+
+    def __init__(self, min_interval=0.25):
+        self.min_interval = min_interval
+        self.last_time = 0.0
+        self.last_value = None
+
+    def shouldSend(self, value):
+        curr_time = time.monotonic()
+        if value == self.last_value:
+            return False
+        if curr_time - self.last_time < self.min_interval:
+            return False
+        self.last_time = curr_time
+        self.last_value = value
+        return True
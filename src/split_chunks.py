@@ -0,0 +1,22 @@
+import os
+
+
+class SplitChunkTracker():
+    """Keeps track of the files sox writes with 'newfile' (<out file name>001.mp3, <out file name>002.mp3, ...).
+    A chunk is complete once sox has started writing the next one, or once sox has exited."""
+
+    def __init__(self, out_tmp_file_path):
+        self.path_without_extension, self.extension = os.path.splitext(out_tmp_file_path)
+        self.next_chunk_number = 1
+
+    def getChunkPath(self, chunk_number):
+        return f"{self.path_without_extension}{chunk_number:03d}{self.extension}"
+
+    # returns the paths of chunks that were completed since the last call
+    def popReadyChunks(self, sox_finished=False):
+        ready_chunks = []
+        while (os.path.isfile(self.getChunkPath(self.next_chunk_number + 1))
+        or (sox_finished and os.path.isfile(self.getChunkPath(self.next_chunk_number)))):
+            ready_chunks.append(self.getChunkPath(self.next_chunk_number))
+            self.next_chunk_number += 1
+        return ready_chunks
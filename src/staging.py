@@ -0,0 +1,110 @@
+import os
+import shutil
+import platform
+import tempfile
+
+# from linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# when the kernel can't copy between the drives
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
+
+
+# Makes src available at dst (an ASCII-safe temp path sox can open) without copying the data when possible.
+# Tries hardlink -> reflink -> symlink -> kernel side copy -> normal copy, returns the name of the method used.
+def stageFile(src, dst):
+    # dst is usually an empty placeholder made by tempfile.mkstemp
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except (OSError, NotImplementedError, AttributeError):
+        pass
+
+    if reflinkFile(src, dst):
+        return "reflink"
+
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return "symlink"
+    except (OSError, NotImplementedError, AttributeError):
+        # windows needs admin rights or developer mode for symlinks
+        pass
+
+    if copyFileRange(src, dst):
+        return "copy_file_range"
+
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+# Moves src to dst: a rename on the same filesystem, otherwise a copy to a temp file next to dst that is renamed
+# to dst once it's complete (dst is never a partial file, even on a network share), then src is removed.
+# Returns the name of the method used.
+def moveFile(src, dst):
+    try:
+        os.replace(src, dst)
+        return "rename"
+    except OSError:
+        pass # another drive
+
+    partial_fd, partial_path = tempfile.mkstemp(prefix=".", suffix=".partial", dir=os.path.dirname(os.path.abspath(dst)))
+    os.close(partial_fd)
+    try:
+        transfer_method = "copy_file_range"
+        if not copyFileRange(src, partial_path):
+            transfer_method = "copy"
+            with open(src, "rb") as src_f, open(partial_path, "wb") as dst_f:
+                shutil.copyfileobj(src_f, dst_f, COPY_BUFFER_SIZE)
+        shutil.copymode(src, partial_path)
+        with open(partial_path, "rb+") as partial_f:
+            os.fsync(partial_f.fileno())
+        os.replace(partial_path, dst)
+    except BaseException:
+        removeQuietly(partial_path)
+        raise
+    removeQuietly(src)
+    return transfer_method
+
+
+# Copy-on-write clone (btrfs, xfs, ...), no data gets copied until one of the files is changed
+def reflinkFile(src, dst):
+    if platform.system() != "Linux":
+        return False
+    try:
+        import fcntl
+        with open(src, "rb") as src_f, open(dst, "wb") as dst_f:
+            fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+        return True
+    except Exception:
+        removeQuietly(dst)
+    return False
+
+
+# Copies inside the kernel (can be done server side on network shares)
+def copyFileRange(src, dst):
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(src, "rb") as src_f, open(dst, "wb") as dst_f:
+            bytes_left = os.fstat(src_f.fileno()).st_size
+            while bytes_left > 0:
+                bytes_copied = os.copy_file_range(src_f.fileno(), dst_f.fileno(), bytes_left)
+                if bytes_copied == 0:
+                    break
+                bytes_left -= bytes_copied
+        if bytes_left == 0:
+            return True
+    except Exception:
+        pass
+    removeQuietly(dst)
+    return False
+
+
+def removeQuietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
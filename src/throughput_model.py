@@ -0,0 +1,97 @@
+import json
+import threading
+from persistent_cache import saveJsonFile
+
+_shared_models = {}
+_shared_models_lock = threading.Lock()
+
+
+class ThroughputModel():
+    """Measured processing time per stage (stat, render, merge, ...), saved as JSON so estimates improve across runs.
+    For every stage key it keeps the last MAX_SAMPLES (audio seconds, wall seconds) measurements
+    and fits wall = a * audio + b * audio^2 (long files get slower per audio second)."""
+
+    MAX_SAMPLES = 50
+
+    # durations must spread at least this much (max / min) before the curve gets a squared term
+    MIN_SPREAD_FOR_CURVE = 1.5
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.samples = {} # stage key -> [[audio sec, wall sec], ...]
+        self.fits = {} # stage key -> (a, b), cleared when new samples come in
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.load()
+
+    # one model per file in a process, so workers running at the same time (alice_watch) don't drop each other's samples
+    @classmethod
+    def openShared(cls, file_path):
+        with _shared_models_lock:
+            if file_path not in _shared_models:
+                _shared_models[file_path] = cls(file_path)
+            return _shared_models[file_path]
+
+    def load(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                self.samples = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Failed to load throughput model {self.file_path}: {type(e)} ({e})")
+
+    def save(self):
+        try:
+            with self.save_lock:
+                with self.lock:
+                    samples = {stage_key: list(stage_samples) for stage_key, stage_samples in self.samples.items()}
+                saveJsonFile(self.file_path, samples)
+        except Exception as e:
+            print(f"Failed to save throughput model {self.file_path}: {type(e)} ({e})")
+
+    def record(self, stage_key, audio_sec, wall_sec):
+        if audio_sec <= 0 or wall_sec <= 0:
+            return
+        with self.lock:
+            stage_samples = self.samples.setdefault(stage_key, [])
+            stage_samples.append([audio_sec, wall_sec])
+            del stage_samples[:-self.MAX_SAMPLES]
+            self.fits.pop(stage_key, None)
+
+    # estimated wall seconds for audio_sec of audio, None if the stage was never measured
+    def predict(self, stage_key, audio_sec):
+        with self.lock:
+            if stage_key not in self.fits:
+                if not self.samples.get(stage_key):
+                    return None
+                self.fits[stage_key] = self.fit(self.samples[stage_key])
+            a, b = self.fits[stage_key]
+        return a * audio_sec + b * audio_sec * audio_sec
+
+    # least squares fit of wall / audio = a + b * audio, weighted by audio so long files count more
+    def fit(self, stage_samples):
+        total_audio = sum(audio_sec for audio_sec, _ in stage_samples)
+        total_wall = sum(wall_sec for _, wall_sec in stage_samples)
+        proportional_fit = (total_wall / total_audio, 0.0)
+
+        min_audio = min(audio_sec for audio_sec, _ in stage_samples)
+        max_audio = max(audio_sec for audio_sec, _ in stage_samples)
+        if len(stage_samples) < 3 or max_audio < min_audio * self.MIN_SPREAD_FOR_CURVE:
+            return proportional_fit
+
+        # normal equations with weights w = audio, x = audio, y = wall / audio
+        sum_w = total_audio
+        sum_wx = sum(audio_sec * audio_sec for audio_sec, _ in stage_samples)
+        sum_wxx = sum(audio_sec ** 3 for audio_sec, _ in stage_samples)
+        sum_wy = total_wall
+        sum_wxy = sum(audio_sec * wall_sec for audio_sec, wall_sec in stage_samples)
+        determinant = sum_w * sum_wxx - sum_wx * sum_wx
+        if determinant <= 0:
+            return proportional_fit
+        b = (sum_w * sum_wxy - sum_wx * sum_wy) / determinant
+        a = (sum_wy - b * sum_wx) / sum_w
+        if a <= 0 or b < 0:
+            # noise in the measurements, a straight line is safer
+            return proportional_fit
+        return a, b
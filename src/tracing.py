@@ -0,0 +1,177 @@
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import threading
+import time
+from worker_signals import Signal
+
+
+class Span():
+    """One stage of a conversion: when it ran, how much audio it processed, the bytes it read and wrote
+    and the exit code of its process. Unknown values stay None.
+    The resource usage of the processes started during the span (attachProcess) is added up when it ends."""
+
+    def __init__(self, span_id, parent_id, name, attributes):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.end_time = None
+        self.audio_sec = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.exit_code = None
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.processes = []
+        self.lock = threading.Lock()
+
+    # process has a resource_usage dict (process_supervisor.SupervisedProcess) once it was waited for
+    def attachProcess(self, process):
+        with self.lock:
+            self.processes.append(process)
+
+    # sums of the processes' resource usage (max of max_rss_bytes), None if no process was waited for
+    def getProcessUsage(self):
+        with self.lock:
+            usages = [process.resource_usage for process in self.processes if process.resource_usage is not None]
+        if len(usages) == 0:
+            return None
+        process_usage = {"processes": len(usages)}
+        for key in usages[0]:
+            values = [usage[key] for usage in usages]
+            process_usage[key] = max(values) if key == "max_rss_bytes" else sum(values)
+        return process_usage
+
+    def toRecord(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "end": self.end_time,
+            "wall_sec": self.end_time - self.start_time if self.end_time is not None else None,
+            "audio_sec": self.audio_sec,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "exit_code": self.exit_code,
+            "error": self.error,
+            "thread": self.thread,
+            "process_usage": self.getProcessUsage(),
+            "attributes": self.attributes,
+        }
+
+
+class Tracer():
+    """Times the stages of a conversion as spans. Finished spans are appended to trace_path as JSON lines
+    (when given) and emitted with span_finished (the span's record). Spans opened while another span is open
+    on the same thread are its children, spans on other threads are children of the first span (the batch).
+    The root span is kept as an object too, processes started outside of any span on their thread count for it."""
+
+    # traces of older conversions that are kept in the trace dir
+    MAX_TRACE_FILES = 50
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.span_finished = Signal() # dict
+        self.trace_file = None
+        self.span_ids = itertools.count(1)
+        self.root_span = None
+        self.thread_spans = threading.local() # stack of the spans open on each thread
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        span = self.start(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.end(span)
+
+    # for spans that don't fit in a with block, end() has to be called on the same thread
+    def start(self, name, **attributes):
+        open_spans = self.getOpenSpans()
+        with self.lock:
+            parent = open_spans[-1] if open_spans else self.root_span
+            span = Span(next(self.span_ids), parent.span_id if parent is not None else None, name, attributes)
+            if self.root_span is None:
+                self.root_span = span
+        open_spans.append(span)
+        return span
+
+    def end(self, span):
+        span.end_time = time.time()
+        open_spans = self.getOpenSpans()
+        if span in open_spans:
+            open_spans.remove(span)
+        record = span.toRecord()
+        with self.lock:
+            if span is self.root_span:
+                self.root_span = None
+            self.writeRecord(record)
+        self.span_finished.emit(record)
+
+    def getOpenSpans(self):
+        if not hasattr(self.thread_spans, "spans"):
+            self.thread_spans.spans = []
+        return self.thread_spans.spans
+
+    # innermost span open on this thread, else the root span (None if no span is open)
+    def getCurrentSpan(self):
+        open_spans = self.getOpenSpans()
+        if open_spans:
+            return open_spans[-1]
+        with self.lock:
+            return self.root_span
+
+    def writeRecord(self, record):
+        if self.trace_path is None:
+            return
+        try:
+            if self.trace_file is None:
+                os.makedirs(os.path.dirname(self.trace_path), exist_ok=True)
+                self.trace_file = open(self.trace_path, "a", encoding="utf-8")
+            self.trace_file.write(json.dumps(record) + "\n")
+            self.trace_file.flush()
+        except Exception as e:
+            print(f"Failed to write trace {self.trace_path}: {type(e)} ({e})")
+            self.trace_path = None
+
+    def close(self):
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.close()
+                self.trace_file = None
+
+    # a new trace file in trace_dir for a conversion starting now (the oldest ones are deleted)
+    @classmethod
+    def getNewTracePath(cls, trace_dir):
+        removeOldTraces(trace_dir, cls.MAX_TRACE_FILES - 1)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(trace_dir, f"trace_{timestamp}_{os.getpid()}.jsonl")
+
+
+def removeOldTraces(trace_dir, max_trace_files):
+    try:
+        trace_paths = sorted(os.path.join(trace_dir, trace_name) for trace_name in os.listdir(trace_dir) if trace_name.endswith(".jsonl"))
+    except OSError:
+        return
+    for trace_path in trace_paths[:max(0, len(trace_paths) - max_trace_files)]:
+        try:
+            os.remove(trace_path)
+        except OSError:
+            pass
+
+
+# size of path, None if it doesn't exist (yet)
+def getFileBytes(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
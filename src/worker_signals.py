@@ -0,0 +1,30 @@
+import threading
+
+
+class Signal():
+    """Plain Python stand-in for pyqtSignal so the conversion engine runs without Qt.
+    Callbacks run on the thread that emits (the GUI bridges them to Qt signals, see qt_bridge.py)."""
+
+    def __init__(self):
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def connect(self, callback):
+        with self.lock:
+            self.callbacks.append(callback)
+
+    def disconnect(self, callback=None):
+        with self.lock:
+            if callback is None:
+                self.callbacks = []
+            elif callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def emit(self, *args):
+        with self.lock:
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Failed signal callback: {type(e)} ({e})")
@@ -0,0 +1,54 @@
+import struct
+
+# Synthetic MPEG1 layer III files: 44.1 kHz, 128 kbps, stereo, no CRC -> 417 byte frames of 1152 samples.
+# The side info is all zeros (main_data_begin 0) and the rest of every frame is filled with a marker byte,
+# so a test can tell which frames ended up in a joined file.
+
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_SIZE = 417
+SAMPLES_PER_FRAME = 1152
+SAMPLE_RATE = 44100
+SIDE_INFO_SIZE = 32
+XING_OFFSET = 4 + SIDE_INFO_SIZE
+
+
+def buildAudioFrame(marker):
+    return FRAME_HEADER + bytes(SIDE_INFO_SIZE) + bytes([marker]) * (FRAME_SIZE - 4 - SIDE_INFO_SIZE)
+
+
+def getFrameMarker(frame):
+    return frame[4 + SIDE_INFO_SIZE]
+
+
+# Info frame with a frame count and a LAME tag holding encoder delay and padding
+def buildInfoFrame(num_frames, encoder_delay, encoder_padding):
+    frame = bytearray(FRAME_SIZE)
+    frame[0:4] = FRAME_HEADER
+    frame[XING_OFFSET:XING_OFFSET + 4] = b"Info"
+    frame[XING_OFFSET + 4:XING_OFFSET + 8] = struct.pack(">I", 1) # frames present
+    frame[XING_OFFSET + 8:XING_OFFSET + 12] = struct.pack(">I", num_frames)
+    lame_pos = XING_OFFSET + 12
+    frame[lame_pos:lame_pos + 9] = b"LAME3.100"
+    frame[lame_pos + 21:lame_pos + 24] = ((encoder_delay << 12) | encoder_padding).to_bytes(3, "big")
+    return bytes(frame)
+
+
+def buildId3v2Tag(payload_size):
+    syncsafe_size = bytes([(payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3\x04\x00\x00" + syncsafe_size + bytes(payload_size)
+
+
+# markers: one audio frame per marker, encoder_delay None -> no Info/LAME frame
+def buildMp3(markers, encoder_delay=None, encoder_padding=0, id3v2_size=0):
+    data = b""
+    if id3v2_size:
+        data += buildId3v2Tag(id3v2_size)
+    if encoder_delay is not None:
+        data += buildInfoFrame(len(markers), encoder_delay, encoder_padding)
+    return data + b"".join(buildAudioFrame(marker) for marker in markers)
+
+
+def writeMp3(path, markers, **kwargs):
+    with open(path, "wb") as f:
+        f.write(buildMp3(markers, **kwargs))
+    return str(path)
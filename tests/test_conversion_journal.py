@@ -0,0 +1,102 @@
+import os
+from conversion_journal import ConversionJournal, getBatchKey
+
+
+def makeFile(path, content=b"audio"):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_records_are_loaded_back(tmp_path):
+    output = makeFile(tmp_path / "out.mp3")
+    tmp = makeFile(tmp_path / "tmp.wav")
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    assert not journal.hasProgress()
+    journal.recordRendered(0, False, [output])
+    journal.recordFinishedFile(1, tmp, "book.mp3", "/out/book.mp3")
+    journal.recordGroupDone(2)
+
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    assert journal.hasProgress()
+    assert journal.rendered == {0: (False, [output])}
+    assert journal.finished_files == {1: (tmp, "book.mp3", "/out/book.mp3")}
+    assert journal.done_groups == {2}
+
+
+def test_records_of_missing_files_are_ignored(tmp_path):
+    output = makeFile(tmp_path / "out.mp3")
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    journal.recordRendered(0, True, [output, str(tmp_path / "missing.mp3")])
+    journal.recordFinishedFile(1, str(tmp_path / "missing.wav"), "book.mp3", "/out/book.mp3")
+
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    assert journal.rendered == {}
+    assert journal.finished_files == {}
+
+
+def test_torn_last_record_is_cut_off(tmp_path):
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    journal.recordGroupDone(0)
+    journal.recordGroupDone(1)
+    with open(journal.journal_path, "rb") as f:
+        good_size = len(f.readline())
+    # crashed in the middle of appending the second record
+    with open(journal.journal_path, "rb+") as f:
+        f.truncate(good_size + 10)
+
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    assert journal.done_groups == {0}
+    assert os.path.getsize(journal.journal_path) == good_size
+    journal.recordGroupDone(2) # goes on its own line, not after the broken one
+
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    assert journal.done_groups == {0, 2}
+
+
+def test_garbage_record_stops_loading(tmp_path):
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    journal.recordGroupDone(0)
+    with open(journal.journal_path, "ab") as f:
+        f.write(b"\xff\xfe not json\n")
+        f.write(b'{"type": "group_done", "group": 1}\n')
+
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    assert journal.done_groups == {0}
+
+
+def test_kept_files_are_moved_into_the_journal_dir(tmp_path):
+    output = makeFile(tmp_path / "out.mp3", b"123")
+    journal = ConversionJournal(str(tmp_path / "journal"))
+    kept_paths = journal.keepFiles([output])
+    assert kept_paths == [os.path.join(journal.journal_dir, "out.mp3")]
+    assert not os.path.exists(output)
+    assert journal.isKeptFile(kept_paths[0])
+    assert journal.keepFiles(kept_paths) == kept_paths # already there
+    with open(kept_paths[0], "rb") as f:
+        assert f.read() == b"123"
+
+
+def test_batch_key_depends_on_files_and_settings(tmp_path):
+    first = makeFile(tmp_path / "1.mp3")
+    second = makeFile(tmp_path / "2.mp3")
+    batch_key = getBatchKey([first, second], {"bitrate": 64})
+    assert getBatchKey([first, second], {"bitrate": 64}) == batch_key
+    assert getBatchKey([second, first], {"bitrate": 64}) != batch_key
+    assert getBatchKey([first, second], {"bitrate": 96}) != batch_key
+    makeFile(tmp_path / "1.mp3", b"changed audio")
+    assert getBatchKey([first, second], {"bitrate": 64}) != batch_key
+
+
+def test_open_for_batch_removes_stale_journals(tmp_path):
+    root_dir = tmp_path / "journals"
+    stale_dir = root_dir / "stale"
+    stale_dir.mkdir(parents=True)
+    old_time = os.path.getmtime(stale_dir) - (ConversionJournal.MAX_AGE_DAYS + 1) * 24 * 60 * 60
+    os.utime(stale_dir, (old_time, old_time))
+
+    input_file = makeFile(tmp_path / "1.mp3")
+    journal = ConversionJournal.openForBatch(str(root_dir), [input_file], {})
+    assert sorted(os.listdir(root_dir)) == [getBatchKey([input_file], {})]
+
+    journal.remove()
+    assert not os.path.exists(root_dir) # no other journals left
@@ -0,0 +1,87 @@
+import struct
+import wave
+import pytest
+from duration_probe import HEAD_SIZE, AudioProbeError, probeDuration
+from mp3_fixtures import SAMPLE_RATE, SAMPLES_PER_FRAME, buildAudioFrame, writeMp3
+
+
+def writeWav(path, num_frames, sample_rate=8000):
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(bytes(num_frames * 4))
+    return str(path)
+
+
+def writeFlac(path, sample_rate, total_samples):
+    packed = (sample_rate << 44) | (1 << 41) | (15 << 36) | total_samples
+    stream_info = bytes(10) + packed.to_bytes(8, "big") + bytes(16)
+    path.write_bytes(b"fLaC" + bytes([0x80, 0, 0, 34]) + stream_info)
+    return str(path)
+
+
+def test_wav(tmp_path):
+    assert probeDuration(writeWav(tmp_path / "a.wav", 12000)) == pytest.approx(1.5)
+
+
+def test_wav_shorter_than_its_header_says(tmp_path, capsys):
+    path = writeWav(tmp_path / "a.wav", 8000)
+    with open(path, "rb+") as f:
+        f.truncate(44 + 4 * 4000)
+    assert probeDuration(path) == pytest.approx(0.5)
+    assert "shorter than its header says" in capsys.readouterr().out
+
+
+def test_wav_without_data_chunk(tmp_path):
+    path = tmp_path / "a.wav"
+    fmt = struct.pack("<HHIIHH", 1, 2, 8000, 32000, 4, 16)
+    path.write_bytes(b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt)) + b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+    with pytest.raises(AudioProbeError):
+        probeDuration(str(path))
+
+
+def test_flac(tmp_path):
+    assert probeDuration(writeFlac(tmp_path / "a.flac", 44100, 441000)) == pytest.approx(10.0)
+    assert probeDuration(writeFlac(tmp_path / "b.flac", 44100, 0)) is None # length unknown
+
+
+def test_mp3_with_info_frame(tmp_path):
+    path = writeMp3(tmp_path / "a.mp3", [1] * 20, encoder_delay=576, encoder_padding=0)
+    assert probeDuration(path) == pytest.approx(20 * SAMPLES_PER_FRAME / SAMPLE_RATE)
+
+
+def test_mp3_without_info_frame_counts_frames(tmp_path):
+    path = writeMp3(tmp_path / "a.mp3", [1] * 10)
+    assert probeDuration(path) == pytest.approx(10 * SAMPLES_PER_FRAME / SAMPLE_RATE)
+
+
+def test_mp3_with_few_frames(tmp_path):
+    path = writeMp3(tmp_path / "a.mp3", [1, 2])
+    assert probeDuration(path) == pytest.approx(2 * SAMPLES_PER_FRAME / SAMPLE_RATE)
+
+
+def test_mp3_behind_id3v2_tag_bigger_than_the_head(tmp_path):
+    path = writeMp3(tmp_path / "a.mp3", [1] * 10, encoder_delay=576, encoder_padding=0, id3v2_size=HEAD_SIZE + 1000)
+    assert probeDuration(path) == pytest.approx(10 * SAMPLES_PER_FRAME / SAMPLE_RATE)
+
+
+def test_data_with_a_stray_frame_sync_is_not_mp3(tmp_path):
+    # one frame header followed by junk: random data has false syncs like this
+    path = tmp_path / "a.mp3"
+    path.write_bytes(buildAudioFrame(1)[:100] + b"\x00" * 5000)
+    with pytest.raises(AudioProbeError):
+        probeDuration(str(path))
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"")
+    with pytest.raises(AudioProbeError):
+        probeDuration(str(path))
+
+
+def test_unknown_format(tmp_path):
+    path = tmp_path / "a.xyz"
+    path.write_bytes(b"something else entirely" * 10)
+    assert probeDuration(str(path)) is None
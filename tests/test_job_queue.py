@@ -0,0 +1,72 @@
+import sqlite3
+import pytest
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    job_queue = JobQueue(str(tmp_path / "queue" / "jobs.sqlite"))
+    yield job_queue
+    job_queue.close()
+
+
+def test_batches_are_claimed_oldest_first_with_files_in_order(job_queue):
+    first_id = job_queue.addBatch("/in/a", [("/in/a/2.mp3", 20, 2), ("/in/a/1.mp3", 10, 1)])
+    second_id = job_queue.addBatch("/in/b", [("/in/b/1.mp3", 30, 3)])
+
+    assert job_queue.claimNextBatch() == (first_id, "/in/a", ["/in/a/2.mp3", "/in/a/1.mp3"])
+    assert job_queue.claimNextBatch() == (second_id, "/in/b", ["/in/b/1.mp3"])
+    assert job_queue.claimNextBatch() is None
+    assert job_queue.getStateCounts() == {RUNNING: 2}
+
+
+def test_known_files_are_matched_by_path_size_and_mtime(job_queue):
+    job_queue.addBatch("/in", [("/in/1.mp3", 10, 1)])
+    assert job_queue.isKnownFile("/in/1.mp3", 10, 1)
+    assert not job_queue.isKnownFile("/in/1.mp3", 10, 2) # replaced file
+    assert not job_queue.isKnownFile("/in/2.mp3", 10, 1)
+
+
+def test_finished_batches(job_queue):
+    done_id = job_queue.addBatch("/in/a", [("/in/a/1.mp3", 10, 1)])
+    failed_id = job_queue.addBatch("/in/b", [("/in/b/1.mp3", 10, 1)])
+    job_queue.claimNextBatch()
+    job_queue.claimNextBatch()
+    job_queue.finishBatch(done_id)
+    job_queue.finishBatch(failed_id, "sox failed")
+    assert job_queue.getStateCounts() == {DONE: 1, FAILED: 1}
+    assert job_queue.claimNextBatch() is None
+
+
+def test_requeued_batch_is_claimed_again(job_queue):
+    batch_id = job_queue.addBatch("/in", [("/in/1.mp3", 10, 1)])
+    job_queue.claimNextBatch()
+    job_queue.requeueBatch(batch_id)
+    assert job_queue.getStateCounts() == {QUEUED: 1}
+    assert job_queue.claimNextBatch()[0] == batch_id
+
+    job_queue.finishBatch(batch_id)
+    job_queue.requeueBatch(batch_id) # only running batches go back
+    assert job_queue.getStateCounts() == {DONE: 1}
+
+
+def test_running_batches_are_requeued_after_a_crash(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite")
+    job_queue = JobQueue(db_path)
+    batch_id = job_queue.addBatch("/in", [("/in/1.mp3", 10, 1)])
+    job_queue.addBatch("/in2", [("/in2/1.mp3", 10, 1)])
+    job_queue.claimNextBatch()
+    job_queue.close()
+
+    job_queue = JobQueue(db_path)
+    assert job_queue.requeueInterrupted() == 1
+    assert job_queue.getStateCounts() == {QUEUED: 2}
+    assert job_queue.claimNextBatch()[0] == batch_id
+    job_queue.close()
+
+
+def test_failed_transaction_adds_nothing(job_queue):
+    with pytest.raises(sqlite3.IntegrityError):
+        job_queue.addBatch("/in", [("/in/1.mp3", 10, 1), ("/in/2.mp3", None, 1)]) # size is NOT NULL
+    assert job_queue.getStateCounts() == {}
+    assert not job_queue.isKnownFile("/in/1.mp3", 10, 1)
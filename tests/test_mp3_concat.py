@@ -0,0 +1,96 @@
+import struct
+import pytest
+from mp3_concat import LAME_CRC_RANGE, LAME_TAG_SIZE, XING_TAG_SIZE, Mp3ConcatError, concatMp3Files, crc16, scanMp3File
+from mp3_fixtures import FRAME_SIZE, SAMPLES_PER_FRAME, XING_OFFSET, buildAudioFrame, getFrameMarker, writeMp3
+
+
+def readAudioMarkers(path):
+    info = scanMp3File(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    markers = []
+    pos = info.audio_start
+    for frame_size in info.frame_sizes:
+        markers.append(getFrameMarker(data[pos:pos + frame_size]))
+        pos += frame_size
+    return markers
+
+
+def test_crc16_is_crc16_arc():
+    assert crc16(b"123456789") == 0xBB3D
+
+
+def test_scan_reads_lame_tag_and_skips_id3v2(tmp_path):
+    path = writeMp3(tmp_path / "a.mp3", [1, 2, 3], encoder_delay=576, encoder_padding=1000, id3v2_size=300)
+    info = scanMp3File(path)
+    assert len(info.frame_sizes) == 3
+    assert info.encoder_delay == 576
+    assert info.encoder_padding == 1000
+    assert len(info.id3v2) == 310
+    assert info.audio_start == 310 + FRAME_SIZE
+
+
+def test_scan_resyncs_after_garbage(tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(buildAudioFrame(1) + b"\x00\x12\x34" + buildAudioFrame(2) + buildAudioFrame(3)[:100])
+    info = scanMp3File(str(path))
+    assert info.frame_sizes == [FRAME_SIZE, FRAME_SIZE] # truncated last frame is left out
+
+
+def test_scan_rejects_empty_and_non_mpeg_files(tmp_path):
+    empty_path = tmp_path / "empty.mp3"
+    empty_path.write_bytes(b"")
+    text_path = tmp_path / "text.mp3"
+    text_path.write_bytes(b"not audio" * 100)
+    with pytest.raises(Mp3ConcatError):
+        scanMp3File(str(empty_path))
+    with pytest.raises(Mp3ConcatError):
+        scanMp3File(str(text_path))
+
+
+def test_concat_drops_whole_delay_and_padding_frames_at_the_joins(tmp_path):
+    first = writeMp3(tmp_path / "1.mp3", [1, 2, 3, 4], encoder_delay=SAMPLES_PER_FRAME, encoder_padding=SAMPLES_PER_FRAME)
+    second = writeMp3(tmp_path / "2.mp3", [5, 6, 7, 8], encoder_delay=SAMPLES_PER_FRAME, encoder_padding=2 * SAMPLES_PER_FRAME)
+    out_path = str(tmp_path / "out.mp3")
+    concatMp3Files([first, second], out_path)
+
+    # the first file keeps its delay frame, the last one its padding frames
+    assert readAudioMarkers(out_path) == [1, 2, 3, 6, 7, 8]
+    info = scanMp3File(out_path)
+    assert info.encoder_delay == SAMPLES_PER_FRAME
+    assert info.encoder_padding == 2 * SAMPLES_PER_FRAME
+
+
+def test_concat_writes_frame_count_and_valid_lame_crc(tmp_path):
+    first = writeMp3(tmp_path / "1.mp3", [1, 2, 3], encoder_delay=0, encoder_padding=0)
+    second = writeMp3(tmp_path / "2.mp3", [4, 5], encoder_delay=0, encoder_padding=0)
+    out_path = tmp_path / "out.mp3"
+    concatMp3Files([first, second], str(out_path))
+
+    frame = out_path.read_bytes()
+    assert frame[XING_OFFSET:XING_OFFSET + 4] == b"Info"
+    assert struct.unpack(">I", frame[XING_OFFSET + 8:XING_OFFSET + 12])[0] == 5
+    crc_pos = XING_OFFSET + XING_TAG_SIZE + LAME_TAG_SIZE - 2
+    assert struct.unpack(">H", frame[crc_pos:crc_pos + 2])[0] == crc16(frame[:LAME_CRC_RANGE])
+
+
+def test_concat_refuses_lame_delay_that_is_not_whole_frames(tmp_path):
+    # LAME's own 576 sample delay: dropping frames can't remove it, keeping it would be a gap
+    first = writeMp3(tmp_path / "1.mp3", [1, 2, 3], encoder_delay=576, encoder_padding=SAMPLES_PER_FRAME)
+    second = writeMp3(tmp_path / "2.mp3", [4, 5, 6], encoder_delay=576, encoder_padding=0)
+    with pytest.raises(Mp3ConcatError):
+        concatMp3Files([first, second], str(tmp_path / "out.mp3"))
+
+
+def test_concat_refuses_files_without_lame_tag(tmp_path):
+    first = writeMp3(tmp_path / "1.mp3", [1, 2, 3])
+    second = writeMp3(tmp_path / "2.mp3", [4, 5, 6])
+    with pytest.raises(Mp3ConcatError):
+        concatMp3Files([first, second], str(tmp_path / "out.mp3"))
+
+
+def test_concat_refuses_file_that_is_only_delay(tmp_path):
+    first = writeMp3(tmp_path / "1.mp3", [1, 2], encoder_delay=0, encoder_padding=0)
+    second = writeMp3(tmp_path / "2.mp3", [3], encoder_delay=SAMPLES_PER_FRAME, encoder_padding=0)
+    with pytest.raises(Mp3ConcatError):
+        concatMp3Files([first, second], str(tmp_path / "out.mp3"))
@@ -0,0 +1,43 @@
+import math
+import pytest
+from sampled_analysis import PEAK_HEADROOM_DB, estimateFromWindows, planAnalysisWindows
+
+
+def test_windows_are_spread_from_start_to_end():
+    assert planAnalysisWindows(10000, 5, 100) == [(0, 100), (2475, 100), (4950, 100), (7425, 100), (9900, 100)]
+
+
+def test_no_windows_when_they_would_cover_too_much():
+    assert planAnalysisWindows(1000, 5, 100) is None
+    assert planAnalysisWindows(10000, 1, 100) is None
+    assert planAnalysisWindows(10000, 5, 0) is None
+
+
+def test_estimate_from_windows_that_agree():
+    dc_offset, vol_multi = estimateFromWindows([(0.02, 2.0), (0.021, 2.1), (0.019, 2.2), (0.02, 2.0)])
+    assert dc_offset == pytest.approx(0.02)
+    # the loudest window (peak 0.5) decides, minus the headroom for peaks between the windows
+    assert vol_multi == pytest.approx(2.0 / 10 ** (PEAK_HEADROOM_DB / 20))
+
+
+def test_volume_is_never_turned_down():
+    _, vol_multi = estimateFromWindows([(0.0, 1.05), (0.0, 1.1), (0.0, 1.08)])
+    assert vol_multi == 1.0
+
+
+def test_window_at_full_scale():
+    assert estimateFromWindows([(0.0, 1.0), (0.0, 3.0), (0.0, 2.0)]) == (0.0, 1.0)
+
+
+def test_no_estimate_when_dc_offset_is_too_close_to_the_threshold():
+    assert estimateFromWindows([(0.004, 2.0), (0.006, 2.0), (0.003, 2.0), (0.007, 2.0)]) is None
+
+
+def test_no_estimate_when_peaks_are_sporadic():
+    assert estimateFromWindows([(0.0, 10.0), (0.0, 10.0), (0.0, 10.0), (0.0, 1.1)]) is None
+
+
+def test_no_estimate_for_silent_or_too_few_windows():
+    assert estimateFromWindows([(0.0, math.inf), (0.0, math.inf)]) is None
+    assert estimateFromWindows([(0.02, 2.0)]) is None
+    assert estimateFromWindows([]) is None
@@ -0,0 +1,44 @@
+import pytest
+from segments import combineSegmentStats, getTremoloPhase, planTimeSegments
+
+
+def test_segments_cover_the_file_exactly():
+    segments = planTimeSegments(1000, 100, 3, 100, 1)
+    assert [(segment.start, segment.length) for segment in segments] == [(0, 300), (300, 300), (600, 300), (900, 100)]
+    assert [segment.number for segment in segments] == [1, 2, 3, 4]
+
+
+def test_padding_is_clamped_at_the_file_edges():
+    segments = planTimeSegments(1000, 100, 3, 100, 1)
+    assert (segments[0].pre_roll, segments[0].post_roll) == (0, 100)
+    assert (segments[1].pre_roll, segments[1].post_roll) == (100, 100)
+    assert (segments[-1].pre_roll, segments[-1].post_roll) == (100, 0)
+    assert segments[1].getReadStart() == 200
+    assert segments[1].getReadLength() == 500
+
+
+def test_output_positions_add_up_after_resampling():
+    # 44.1 kHz -> 48 kHz doesn't divide evenly, rounding must not leave gaps or overlaps between segments
+    segments = planTimeSegments(44100 * 10 + 7, 44100, 3, 48000, 0.5)
+    for prev_segment, segment in zip(segments, segments[1:]):
+        assert prev_segment.out_start + prev_segment.out_length == segment.out_start
+    assert sum(segment.out_length for segment in segments) == round((44100 * 10 + 7) * 48000 / 44100)
+    assert segments[1].getOutStartSec() == pytest.approx(3.0)
+
+
+def test_tremolo_phase():
+    assert getTremoloPhase(2.0, 0.0) == pytest.approx(25.0)
+    assert getTremoloPhase(2.0, 0.25) == pytest.approx(75.0) # half a cycle later
+    assert getTremoloPhase(2.0, 0.5) == pytest.approx(25.0)
+    assert getTremoloPhase(1.0, 0.8) == pytest.approx(5.0) # wraps around
+
+
+def test_combined_dc_offset_is_weighted_by_length_and_volume_by_loudest_segment():
+    dc_offset, vol_multi = combineSegmentStats([(300, 0.01, 2.0), (100, -0.01, 1.5), (600, 0.0, 3.0)])
+    assert dc_offset == pytest.approx((300 * 0.01 - 100 * 0.01) / 1000)
+    assert vol_multi == 1.5
+
+
+def test_combined_stats_of_nothing():
+    assert combineSegmentStats([]) == (0, 1)
+    assert combineSegmentStats([(0, 0.5, 2.0)]) == (0, 1)
@@ -0,0 +1,54 @@
+import pytest
+from sox_progress import ProgressRateLimiter, parseSoxStatus, parseTimestamp
+
+
+def test_parse_timestamp():
+    assert parseTimestamp("00:01:23.45") == pytest.approx(83.45)
+    assert parseTimestamp("01:00:00.00") == 3600
+    assert parseTimestamp("12.5") == 12.5
+
+
+def test_parse_full_status_line():
+    progress = parseSoxStatus("In:12.34% 00:01:23.45 [00:10:00.00] Out:3.66M [ -====|====- ] Hd:0.0 Clip:0")
+    assert progress.percent == pytest.approx(12.34)
+    assert progress.elapsed_sec == pytest.approx(83.45)
+    assert progress.remaining_sec == 600
+    assert progress.out_samples == 3660000
+
+
+def test_parse_status_line_with_unknown_length():
+    # no percentage and a dashed time remaining when sox can't tell how long the input is
+    progress = parseSoxStatus("In:0.00% 00:00:05.02 [-:--:--.--] Out:221k  [      |      ]        Clip:0")
+    assert progress.elapsed_sec == pytest.approx(5.02)
+    assert progress.remaining_sec is None
+    assert progress.out_samples == 221000
+
+    progress = parseSoxStatus("In: 00:00:05.02 Out:221k")
+    assert progress.percent is None
+    assert progress.elapsed_sec == pytest.approx(5.02)
+
+
+def test_parse_status_line_without_output_count():
+    progress = parseSoxStatus("In:50.00% 00:00:30.00 [00:00:30.00]")
+    assert progress.percent == 50
+    assert progress.out_samples is None
+
+
+def test_parse_ignores_other_lines():
+    assert parseSoxStatus("sox WARN rate: rate clipped 12 samples; decrease volume?") is None
+    assert parseSoxStatus("") is None
+    assert parseSoxStatus("Input File     : 'in.wav'") is None
+
+
+def test_rate_limiter_drops_repeats_and_too_frequent_updates(monkeypatch):
+    curr_time = [100.0]
+    monkeypatch.setattr("sox_progress.time.monotonic", lambda: curr_time[0])
+    rate_limiter = ProgressRateLimiter(min_interval=0.25)
+
+    assert rate_limiter.shouldSend(1)
+    curr_time[0] += 0.1
+    assert not rate_limiter.shouldSend(2) # too soon
+    curr_time[0] += 0.2
+    assert rate_limiter.shouldSend(2)
+    curr_time[0] += 1.0
+    assert not rate_limiter.shouldSend(2) # same value
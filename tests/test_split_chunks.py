@@ -0,0 +1,34 @@
+from split_chunks import SplitChunkTracker
+
+
+def test_chunk_paths_are_numbered_like_sox_newfile(tmp_path):
+    tracker = SplitChunkTracker(str(tmp_path / "out.mp3"))
+    assert tracker.getChunkPath(1) == str(tmp_path / "out001.mp3")
+    assert tracker.getChunkPath(12) == str(tmp_path / "out012.mp3")
+
+
+def test_chunk_is_ready_once_the_next_one_exists(tmp_path):
+    tracker = SplitChunkTracker(str(tmp_path / "out.mp3"))
+    assert tracker.popReadyChunks() == []
+
+    (tmp_path / "out001.mp3").write_bytes(b"1")
+    assert tracker.popReadyChunks() == [] # sox may still be writing it
+
+    (tmp_path / "out002.mp3").write_bytes(b"2")
+    (tmp_path / "out003.mp3").write_bytes(b"3")
+    assert tracker.popReadyChunks() == [tracker.getChunkPath(1), tracker.getChunkPath(2)]
+    assert tracker.popReadyChunks() == []
+
+
+def test_last_chunk_is_ready_when_sox_finished(tmp_path):
+    tracker = SplitChunkTracker(str(tmp_path / "out.mp3"))
+    (tmp_path / "out001.mp3").write_bytes(b"1")
+    (tmp_path / "out002.mp3").write_bytes(b"2")
+    assert tracker.popReadyChunks() == [tracker.getChunkPath(1)]
+    assert tracker.popReadyChunks(sox_finished=True) == [tracker.getChunkPath(2)]
+    assert tracker.popReadyChunks(sox_finished=True) == []
+
+
+def test_no_chunks_when_sox_wrote_nothing(tmp_path):
+    tracker = SplitChunkTracker(str(tmp_path / "out.mp3"))
+    assert tracker.popReadyChunks(sox_finished=True) == []
@@ -0,0 +1,65 @@
+import os
+import pytest
+from throughput_model import ThroughputModel
+
+
+def test_unknown_stage_has_no_estimate(tmp_path):
+    model = ThroughputModel(str(tmp_path / "model.json"))
+    assert model.predict("render", 60) is None
+
+
+def test_proportional_fit_for_few_or_similar_samples(tmp_path):
+    model = ThroughputModel(str(tmp_path / "model.json"))
+    model.record("stat", 100, 2)
+    model.record("stat", 110, 2.2)
+    assert model.predict("stat", 50) == pytest.approx(1.0)
+
+
+def test_curve_fit_for_files_that_get_slower_per_second(tmp_path):
+    model = ThroughputModel(str(tmp_path / "model.json"))
+    for audio_sec in (60, 300, 1200, 3600):
+        model.record("render", audio_sec, 0.01 * audio_sec + 1e-5 * audio_sec ** 2)
+    assert model.predict("render", 1800) == pytest.approx(0.01 * 1800 + 1e-5 * 1800 ** 2)
+
+
+def test_noisy_samples_fall_back_to_a_straight_line(tmp_path):
+    model = ThroughputModel(str(tmp_path / "model.json"))
+    # faster per second for long files would need a negative squared term
+    for audio_sec, wall_sec in ((60, 6), (600, 30), (3600, 90)):
+        model.record("merge", audio_sec, wall_sec)
+    assert model.predict("merge", 1000) == pytest.approx(1000 * 126 / 4260)
+
+
+def test_invalid_measurements_are_ignored_and_old_ones_dropped(tmp_path):
+    model = ThroughputModel(str(tmp_path / "model.json"))
+    model.record("stat", 0, 1)
+    model.record("stat", 10, 0)
+    assert model.predict("stat", 10) is None
+    for sample_idx in range(ThroughputModel.MAX_SAMPLES + 10):
+        model.record("stat", 10, sample_idx + 1)
+    assert len(model.samples["stat"]) == ThroughputModel.MAX_SAMPLES
+    assert model.samples["stat"][0] == [10, 11]
+
+
+def test_samples_survive_save_and_load(tmp_path):
+    file_path = str(tmp_path / "model.json")
+    model = ThroughputModel(file_path)
+    model.record("stat", 100, 2)
+    model.save()
+    assert os.listdir(tmp_path) == ["model.json"] # no temp files left behind
+    assert ThroughputModel(file_path).predict("stat", 100) == pytest.approx(2)
+
+
+def test_broken_file_starts_empty(tmp_path, capsys):
+    file_path = tmp_path / "model.json"
+    file_path.write_text("{not json")
+    model = ThroughputModel(str(file_path))
+    assert model.samples == {}
+    assert "Failed to load throughput model" in capsys.readouterr().out
+
+
+def test_shared_model_is_one_per_file(tmp_path):
+    file_path = str(tmp_path / "model.json")
+    model = ThroughputModel.openShared(file_path)
+    assert ThroughputModel.openShared(file_path) is model
+    assert ThroughputModel.openShared(str(tmp_path / "other.json")) is not model